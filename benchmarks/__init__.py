@@ -0,0 +1 @@
+"""Offline benchmarks and local stand-ins for the upstreams the checker talks to."""
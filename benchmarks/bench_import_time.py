@@ -0,0 +1,88 @@
+"""
+Benchmark of application import time.
+Imports a module (src.main by default) in fresh interpreters with -X importtime and prints
+a JSON report: median total import time, the slowest modules by cumulative time, and
+whether heavy optional stacks (WeasyPrint, Playwright, NumPy) were loaded at import.
+With --max-ms the exit status is 1 when the median exceeds the budget, so the check can
+guard worker spawn time in CI.
+
+Usage:
+    python benchmarks/bench_import_time.py [--module src.main] [--repeat 5] [--top 15] [--max-ms 500]
+"""
+
+import os
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+from typing import Dict, List, Any, Tuple
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Packages that should only be imported when a feature first needs them
+DEFERRED_PACKAGES = ('weasyprint', 'playwright', 'numpy')
+
+
+def import_times(module: str) -> List[Tuple[str, int, int]]:
+    """Import a module in a fresh interpreter; return (module, self us, cumulative us) per import."""
+    completed = subprocess.run([sys.executable, '-X', 'importtime', '-c', f"import {module}"],
+                               cwd=ROOT, capture_output=True, text=True)
+    if completed.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{completed.stderr[-2000:]}")
+    times = []
+    for line in completed.stderr.splitlines():
+        # "import time: self [us] | cumulative | imported package"
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        times.append((name.strip(), int(self_us), int(cumulative_us)))
+    return times
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--module', default='src.main', help='Module to import')
+    parser.add_argument('--repeat', type=int, default=5, help='Fresh interpreters to run')
+    parser.add_argument('--top', type=int, default=15, help='Slowest modules to report')
+    parser.add_argument('--max-ms', type=float, help='Fail when the median import time exceeds this budget')
+    args = parser.parse_args()
+
+    runs = [import_times(args.module) for _ in range(args.repeat)]
+    totals = [next(cumulative for name, _, cumulative in run if name == args.module) / 1000 for run in runs]
+
+    # Slowest modules by median cumulative time across runs
+    cumulative: Dict[str, List[int]] = {}
+    for run in runs:
+        for name, _, cumulative_us in run:
+            cumulative.setdefault(name, []).append(cumulative_us)
+    slowest = sorted(((name, statistics.median(values)) for name, values in cumulative.items()),
+                     key=lambda item: item[1], reverse=True)[:args.top]
+
+    loaded = {name.split('.')[0] for name in cumulative}
+    median_ms = statistics.median(totals)
+    report: Dict[str, Any] = {
+        'module': args.module,
+        'python': sys.version.split()[0],
+        'repeat': args.repeat,
+        'import_ms': {
+            'median': round(median_ms, 1),
+            'min': round(min(totals), 1),
+            'max': round(max(totals), 1),
+        },
+        'modules_imported': len(cumulative),
+        'slowest_ms': [{'module': name, 'cumulative_ms': round(us / 1000, 1)} for name, us in slowest],
+        'deferred_packages_loaded': {package: package in loaded for package in DEFERRED_PACKAGES},
+    }
+    if args.max_ms is not None:
+        report['budget_ms'] = args.max_ms
+        report['within_budget'] = median_ms <= args.max_ms
+
+    json.dump(report, sys.stdout, indent=2)
+    sys.stdout.write('\n')
+    if args.max_ms is not None and median_ms > args.max_ms:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
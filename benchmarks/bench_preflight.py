@@ -0,0 +1,120 @@
+"""
+Benchmark of the pre-flight stage on large brand lists.
+Generates a list of brand names (ASCII, accented, non-Latin and deliberately invalid ones,
+with repeats as in real uploads), then times building the deduplicated batch plan, which
+normalizes every brand (IDNA, transliteration) and validates every planned domain before any
+check, and validating the plan's domains again from scratch as a stream without a plan does.
+It also times the previous normalization (uncompiled regex, accents stripped) for comparison
+and prints a JSON report.
+
+Usage:
+    python benchmarks/bench_preflight.py [--names 1000000] [--tlds .com,.io,.com.br] [--repeat 3]
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import random
+import string
+import argparse
+import statistics
+from typing import Dict, List, Any
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.batch_checker import BatchPlan  # noqa: E402
+from src.preflight import Preflight, IDNA_AVAILABLE  # noqa: E402
+
+ACCENTED = 'áàâäãåçéèêëíìîïñóòôöõøúùûüýÿßæœł'
+NON_LATIN = '北京東京서울москваαθήναקפהمقهى'
+
+
+def generate_names(count: int, seed: int = 7) -> List[str]:
+    """Brand names in the mix of a real upload: mostly ASCII, some accented, a few non-Latin or invalid."""
+    rng = random.Random(seed)
+    unique = max(1, int(count * 0.8))
+    names = []
+    for _ in range(unique):
+        kind = rng.random()
+        length = rng.randint(3, 14)
+        if kind < 0.75:
+            name = ''.join(rng.choice(string.ascii_letters + string.digits + ' -') for _ in range(length))
+        elif kind < 0.9:
+            name = ''.join(rng.choice(string.ascii_lowercase + ACCENTED) for _ in range(length))
+        elif kind < 0.95:
+            name = ''.join(rng.choice(NON_LATIN) for _ in range(rng.randint(2, 6)))
+        elif kind < 0.98:
+            # Longer than any TLD allows
+            name = ''.join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(64, 80)))
+        else:
+            # Two characters: too short for .io and .ai
+            name = ''.join(rng.choice(string.ascii_lowercase) for _ in range(2))
+        names.append(name)
+    # Repeated lines, as in lists merged from several sources
+    names.extend(rng.choice(names) for _ in range(count - unique))
+    return names
+
+
+def legacy_normalize(brand: str) -> str:
+    """Brand normalization before the pre-flight stage."""
+    normalized = brand.lower()
+    return re.sub(r'[^a-z0-9]', '', normalized)
+
+
+def timed(function, repeat: int) -> Dict[str, float]:
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - started)
+    return {'median_s': round(statistics.median(times), 3), 'min_s': round(min(times), 3)}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--names', type=int, default=1_000_000, help='Brand names in the list')
+    parser.add_argument('--tlds', default='.com,.io,.com.br', help='Comma-separated TLDs')
+    parser.add_argument('--repeat', type=int, default=3, help='Timed runs per stage')
+    args = parser.parse_args()
+
+    tlds = [tld.strip() for tld in args.tlds.split(',') if tld.strip()]
+    names = generate_names(args.names)
+
+    # A fresh Preflight per run, as BatchChecker uses one per plan
+    # IDN conversion on, as the costlier configuration
+    plan_timing = timed(lambda: BatchPlan(names, tlds, Preflight(idn=True)), args.repeat)
+    plan = BatchPlan(names, tlds, Preflight(idn=True))
+    validate_timing = timed(lambda: Preflight().reject(plan.domains), args.repeat)
+    rejected = plan.rejected
+    legacy_timing = timed(lambda: [legacy_normalize(name) for name in names], args.repeat)
+
+    reasons: Dict[str, int] = {}
+    for reason in rejected.values():
+        # "Label 'x' is longer than ..." -> "is longer than"
+        key = re.sub(r"'[^']*'", '', reason).split(' characters')[0].replace('Label  ', '').strip()
+        reasons[key] = reasons.get(key, 0) + 1
+
+    total = plan_timing['median_s']
+    report: Dict[str, Any] = {
+        'python': sys.version.split()[0],
+        'idna_package': IDNA_AVAILABLE,
+        'names': len(names),
+        'tlds': tlds,
+        'slots': plan.total_checks,
+        'unique_domains': plan.unique_checks,
+        'idn_domains': sum(1 for domain in plan.domains if domain.startswith('xn--')),
+        'rejected': len(rejected),
+        'rejected_by_reason': dict(sorted(reasons.items(), key=lambda item: -item[1])),
+        'plan': plan_timing,
+        'validate': validate_timing,
+        'names_per_s': round(len(names) / total) if total else None,
+        'legacy_normalize': legacy_timing,
+    }
+    json.dump(report, sys.stdout, indent=2)
+    sys.stdout.write('\n')
+
+
+if __name__ == '__main__':
+    main()
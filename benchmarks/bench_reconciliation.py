@@ -0,0 +1,154 @@
+"""
+Benchmark of result reconciliation.
+Generates source results for many domains (agreeing and conflicting answers, errors, missing
+availabilities, weights of real and unknown sources), reconciles them with the per-domain
+loop DomainChecker used before the vectorized engine and with the engine, one domain at a
+time and as one batch, checks that every result is identical to the loop's under the
+registrar-priority policy and that both engine paths agree under every policy, and prints a
+JSON report with the timings of each policy.
+
+Usage:
+    python benchmarks/bench_reconciliation.py [--domains 100000] [--repeat 3]
+"""
+
+import os
+import sys
+import json
+import time
+import logging
+import random
+import argparse
+import statistics
+from typing import Dict, List, Any
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.results import Status, SourceResult, DomainResult  # noqa: E402
+from src.reconciliation import Reconciler, POLICIES  # noqa: E402
+
+WEIGHTS = {'WHOIS': 0.6, 'GoDaddy': 0.9, 'GoDaddy Browser': 0.8}
+REGISTRARS = {'WHOIS': False, 'GoDaddy': True, 'GoDaddy Browser': True}
+# Source lists of the domains, as provider subsets in provider order
+SOURCE_SETS = [('WHOIS', 'GoDaddy'), ('WHOIS', 'GoDaddy', 'GoDaddy Browser'), ('WHOIS',), ('GoDaddy',),
+               ('WHOIS', 'Namecheap'), ()]
+
+
+def generate_rows(count: int, seed: int = 11) -> List[List[SourceResult]]:
+    rng = random.Random(seed)
+    rows = []
+    for index in range(count):
+        domain = f"brand{index}.com"
+        results = []
+        for source in rng.choice(SOURCE_SETS):
+            kind = rng.random()
+            if kind < 0.1:
+                results.append(SourceResult(domain, source, None, 0.0, error='timeout'))
+            elif kind < 0.12:
+                results.append(SourceResult(domain, source, None, rng.choice((0.0, 0.3))))
+            else:
+                results.append(SourceResult(domain, source, rng.random() < 0.6, rng.choice((0.7, 0.8, 0.9, 0.55))))
+        rows.append(results)
+    return rows
+
+
+def legacy_reconcile(results: List[SourceResult]) -> DomainResult:
+    """DomainChecker._reconcile_results before the vectorized engine."""
+    def weight(source: str) -> float:
+        return WEIGHTS.get(source, 0.5)
+
+    reconciled = DomainResult(sources_checked=len(results))
+    errors = [r for r in results if r.error is not None]
+    reconciled.sources_with_errors = len(errors)
+    if len(errors) == len(results):
+        reconciled.available = None
+        reconciled.confidence = 0.0
+        reconciled.status = Status.UNKNOWN
+        return reconciled
+    valid_results = [r for r in results if r.error is None]
+    availabilities = [r.available for r in valid_results]
+    if all(a == availabilities[0] for a in availabilities):
+        reconciled.available = availabilities[0]
+        total_weight = sum(weight(r.source) for r in valid_results)
+        weighted_confidence = sum(r.confidence * weight(r.source) for r in valid_results)
+        reconciled.confidence = weighted_confidence / total_weight if total_weight > 0 else 0.5
+        reconciled.status = Status.of(reconciled.available)
+    else:
+        reconciled.conflicting_results = True
+        registrar_results = [r for r in valid_results if r.source != 'WHOIS']
+        whois_results = [r for r in valid_results if r.source == 'WHOIS']
+        if registrar_results:
+            weighted_votes: Dict[Any, float] = {}
+            for r in registrar_results:
+                weighted_votes[r.available] = weighted_votes.get(r.available, 0) + weight(r.source)
+            reconciled.available = max(weighted_votes.items(), key=lambda x: x[1])[0]
+            reconciled.confidence = 0.7
+            reconciled.status = Status.of(reconciled.available, '_conflicted')
+        else:
+            true_votes = sum(1 for r in whois_results if r.available)
+            false_votes = len(whois_results) - true_votes
+            reconciled.available = true_votes > false_votes
+            reconciled.confidence = 0.5
+            reconciled.status = Status.of(reconciled.available, '_uncertain')
+    return reconciled
+
+
+def fields(result: DomainResult) -> tuple:
+    return (result.available, result.confidence, result.status, result.sources_checked,
+            result.sources_with_errors, result.conflicting_results)
+
+
+def timed(function, repeat: int) -> Dict[str, float]:
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - started)
+    return {'median_s': round(statistics.median(times), 4), 'min_s': round(min(times), 4)}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--domains', type=int, default=100_000, help='Domains to reconcile')
+    parser.add_argument('--repeat', type=int, default=3, help='Timed runs per variant')
+    args = parser.parse_args()
+
+    # Domains whose sources all failed are logged; keep the report readable
+    logging.getLogger('src.reconciliation').setLevel(logging.ERROR)
+    rows = generate_rows(args.domains)
+    reconciler = Reconciler(WEIGHTS, REGISTRARS, POLICIES['registrar_priority']())
+    expected = [fields(legacy_reconcile(results)) for results in rows]
+    batch = [fields(result) for result in reconciler.reconcile_many(rows)]
+    single = [fields(reconciler.reconcile(results)) for results in rows]
+    mismatches = sum(1 for a, b in zip(expected, batch) if a != b)
+    mismatches += sum(1 for a, b in zip(expected, single) if a != b)
+    for policy in POLICIES.values():
+        engine = Reconciler(WEIGHTS, REGISTRARS, policy())
+        mismatches += sum(1 for results, result in zip(rows, engine.reconcile_many(rows))
+                          if fields(engine.reconcile(results)) != fields(result))
+
+    report: Dict[str, Any] = {
+        'python': sys.version.split()[0],
+        'domains': len(rows),
+        'identical_to_legacy': mismatches == 0,
+        'mismatches': mismatches,
+        'legacy_per_domain': timed(lambda: [legacy_reconcile(results) for results in rows], args.repeat),
+        'engine_per_domain': timed(lambda: [reconciler.reconcile(results) for results in rows], args.repeat),
+        'policies': {},
+    }
+    for name, policy in POLICIES.items():
+        engine = Reconciler(WEIGHTS, REGISTRARS, policy())
+        statuses: Dict[str, int] = {}
+        for result in engine.reconcile_many(rows):
+            statuses[result.status.value] = statuses.get(result.status.value, 0) + 1
+        report['policies'][name] = {'per_domain': timed(lambda: [engine.reconcile(results) for results in rows],
+                                                        args.repeat),
+                                    'batch': timed(lambda: engine.reconcile_many(rows), args.repeat),
+                                    'statuses': dict(sorted(statuses.items()))}
+    json.dump(report, sys.stdout, indent=2)
+    sys.stdout.write('\n')
+    if mismatches:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,236 @@
+"""
+Benchmark of brand-list uploads.
+Starts the fake upstreams and a local instance wired to them, uploads generated CSV, TXT
+and XLSX brand lists of increasing size to /upload-check, and reports, per upload: time to
+the first result, how much of the file the server had read by then, the results received, and
+the server's RSS before and at its peak. A flat peak RSS across sizes shows the upload is
+not held in memory. It first checks in process that closing a feed stream early, as a client
+disconnecting does, returns promptly.
+
+Usage:
+    python benchmarks/bench_upload.py [--sizes 2000,20000] [--formats csv,txt,xlsx] [--tlds .com]
+        [--upload-rate 0] [--output report.json]
+"""
+
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import tempfile
+from typing import Dict, List, Any
+
+import aiohttp
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.load_test import start_server, wait_until_ready, read_rss  # noqa: E402
+from benchmarks.run_benchmarks import git_revision  # noqa: E402
+from src.batch_checker import BatchChecker, InFlightRegistry  # noqa: E402
+from src.results import DomainResult  # noqa: E402
+
+CONTENT_TYPES = {
+    'csv': 'text/csv',
+    'txt': 'text/plain',
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+}
+
+
+def brand_names(count: int) -> List[str]:
+    """Brands with some repeats (deduplicated by the server) and invalid names (rejected)."""
+    brands = []
+    for index in range(count):
+        if index % 50 == 49:
+            brands.append(brands[index // 2])
+        elif index % 100 == 98:
+            brands.append(f"bad_{index}!")
+        else:
+            brands.append(f"upload{index}brand")
+    return brands
+
+
+def write_file(fmt: str, brands: List[str], directory: str) -> str:
+    path = os.path.join(directory, f"brands_{len(brands)}.{fmt}")
+    if fmt == 'xlsx':
+        import openpyxl
+        workbook = openpyxl.Workbook(write_only=True)
+        sheet = workbook.create_sheet()
+        sheet.append(['Brand', 'Owner'])
+        for brand in brands:
+            sheet.append([brand, 'marketing'])
+        workbook.save(path)
+        return path
+    with open(path, 'w', encoding='utf-8') as f:
+        if fmt == 'csv':
+            f.write('brand,owner\n')
+            f.writelines(f'"{brand}",marketing\n' for brand in brands)
+        else:
+            f.writelines(f"{brand}\n" for brand in brands)
+    return path
+
+
+class SlowChecker:
+    """Stand-in DomainChecker whose checks take a few milliseconds each."""
+
+    tld_registry = None
+    history = None
+
+    async def check_domain(self, domain: str, *args: Any) -> DomainResult:
+        await asyncio.sleep(0.002)
+        return DomainResult(available=True)
+
+
+async def early_close(window: int = 10, count: int = 5000, timeout: float = 5.0) -> Dict[str, Any]:
+    """Stop reading a feed stream after a few results and time how long closing it takes."""
+    feed = iter([([f"early{index}.com" for index in range(count)], {})])
+    checker = BatchChecker(SlowChecker(), InFlightRegistry(), concurrency=5)
+    stream = checker.stream_feed(feed, window=window)
+    async for _ in stream:
+        break
+    start = time.perf_counter()
+    try:
+        await asyncio.wait_for(stream.aclose(), timeout)
+        closed = True
+    except asyncio.TimeoutError:
+        closed = False
+    return {'closed': closed, 'close_s': round(time.perf_counter() - start, 3)}
+
+
+async def upload(url: str, path: str, fmt: str, tlds: str, rate: float, server_pid: int) -> Dict[str, Any]:
+    size = os.path.getsize(path)
+    rss_peak = rss_before = read_rss(server_pid)
+
+    async def body():
+        with open(path, 'rb') as f:
+            while True:
+                chunk = f.read(16 * 1024)
+                if not chunk:
+                    return
+                yield chunk
+                if rate > 0:
+                    await asyncio.sleep(len(chunk) / rate)
+
+    async def sample_rss():
+        nonlocal rss_peak
+        while True:
+            rss = read_rss(server_pid)
+            if rss is not None and rss_peak is not None:
+                rss_peak = max(rss_peak, rss)
+            await asyncio.sleep(0.1)
+
+    sampler = asyncio.ensure_future(sample_rss())
+    start = time.perf_counter()
+    first = read_at_first = None
+    results = 0
+    completion: Dict[str, Any] = {}
+    errors: List[str] = []
+    try:
+        headers = {'Content-Type': CONTENT_TYPES[fmt], 'Content-Length': str(size)}
+        async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=3600)) as session:
+            async with session.post(f"{url}/upload-check", params={'tlds': tlds}, data=body(),
+                                    headers=headers) as response:
+                if response.status != 200:
+                    errors.append(f"HTTP {response.status}: {await response.text()}")
+                async for line in response.content:
+                    if not line.startswith(b'data: '):
+                        continue
+                    event = json.loads(line[len(b'data: '):])
+                    if 'result' in event:
+                        results += 1
+                        if first is None:
+                            first, read_at_first = time.perf_counter() - start, event['received']
+                    elif 'error' in event:
+                        errors.append(event['error'])
+                    elif event.get('status') == 'Completed':
+                        completion = event
+    finally:
+        sampler.cancel()
+    return {
+        'format': fmt,
+        'bytes': size,
+        'wall_s': round(time.perf_counter() - start, 3),
+        'first_result_s': round(first, 3) if first is not None else None,
+        'read_at_first_result': round(read_at_first / size, 3) if read_at_first is not None else None,
+        'results': results,
+        'brands': completion.get('brands'),
+        'duplicates': completion.get('duplicates'),
+        'counts': completion.get('counts'),
+        'errors': errors[:5],
+        'rss_before_mb': round(rss_before / 2 ** 20, 1) if rss_before else None,
+        'rss_peak_mb': round(rss_peak / 2 ** 20, 1) if rss_peak else None,
+    }
+
+
+async def run(args: argparse.Namespace, url: str, server_pid: int) -> List[Dict[str, Any]]:
+    await wait_until_ready(url)
+    runs = []
+    with tempfile.TemporaryDirectory() as directory:
+        for size in [int(s) for s in args.sizes.split(',')]:
+            brands = brand_names(size)
+            for fmt in args.formats.split(','):
+                path = write_file(fmt, brands, directory)
+                result = await upload(url, path, fmt, args.tlds, args.upload_rate, server_pid)
+                result['size'] = size
+                runs.append(result)
+                print(json.dumps(result), file=sys.stderr)
+    return runs
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--port', type=int, default=5056, help='Port of the instance started by the tool')
+    parser.add_argument('--sizes', default='2000,20000', help='Comma-separated numbers of brands per upload')
+    parser.add_argument('--formats', default='csv,txt,xlsx', help='Comma-separated upload formats')
+    parser.add_argument('--tlds', default='.com', help='TLDs each brand is checked on')
+    parser.add_argument('--upload-rate', type=float, default=0.0,
+                        help='Upload bytes per second (0 sends as fast as the server reads)')
+    parser.add_argument('--latency', type=float, default=0.005, help='Base fake upstream latency in seconds')
+    parser.add_argument('--jitter', type=float, default=0.005, help='Extra random fake upstream latency')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Share of fake upstream queries that fail')
+    parser.add_argument('--rate-limit', type=float, default=None, help='Fake upstream queries per second')
+    parser.add_argument('--client-rate', type=float, default=10000.0,
+                        help='WHOIS query rate the instance allows itself per upstream')
+    parser.add_argument('--output', help='Write the JSON report to this file instead of stdout')
+    parser.add_argument('--verbose', action='store_true', help='Show the logs of the started instance')
+    parser.add_argument('--workdir', default=os.environ.get('TMPDIR', '/tmp'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    closing = asyncio.run(early_close())
+    print(json.dumps({'early_close': closing}), file=sys.stderr)
+    if not closing['closed']:
+        sys.exit("Closing a feed stream early did not return")
+
+    # The instance checks with WHOIS and the GoDaddy API stand-in, like run_benchmarks.py
+    os.environ['DOMAIN_PROVIDERS'] = 'godaddy_api'
+    server, fakes, conn, overrides_path = start_server(args.port, args)
+    try:
+        runs = asyncio.run(run(args, f"http://127.0.0.1:{args.port}", server.pid))
+    finally:
+        server.terminate()
+        server.wait(10)
+        conn.send('stop')
+        conn.recv()
+        fakes.join(5)
+        os.remove(overrides_path)
+
+    report = {
+        'meta': {
+            'revision': git_revision(),
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+            'config': {k: v for k, v in vars(args).items() if k != 'workdir'},
+        },
+        'early_close': closing,
+        'uploads': runs,
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
+
+
+if __name__ == '__main__':
+    main()
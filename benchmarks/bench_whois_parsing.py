@@ -0,0 +1,115 @@
+"""
+Benchmark of WHOIS response parsing.
+Compares the native per-registry parsers with the python-whois path used before
+(WhoisEntry.load over the whole response, then str() of the entry for raw_response)
+on the recorded responses in benchmarks/corpus/whois, and prints a JSON report.
+
+Usage:
+    python benchmarks/bench_whois_parsing.py [--iterations N] [--no-details]
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+from typing import Dict, List, Any, Callable, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.tld_registry import get_tld_registry
+from src.whois_parsers import get_parser
+
+CORPUS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'corpus', 'whois')
+
+
+def load_corpus() -> List[Tuple[str, str, str]]:
+    """Load the recorded responses as (file name, domain, text) tuples."""
+    corpus = []
+    for name in sorted(os.listdir(CORPUS_DIR)):
+        if not name.endswith('.txt'):
+            continue
+        # File names are "<registry>_<registered|notfound>_<domain>.txt"
+        domain = name[:-len('.txt')].split('_')[-1]
+        with open(os.path.join(CORPUS_DIR, name), encoding='utf-8') as f:
+            corpus.append((name, domain, f.read()))
+    return corpus
+
+
+def native_parse(domain: str, text: str, details: bool) -> Any:
+    _, info = get_tld_registry().split(domain)
+    parsed = get_parser(info.whois_host, info.not_found_patterns).parse(text)
+    if details and parsed.available is False:
+        parsed.details()
+    return parsed.available
+
+
+def python_whois_parse(domain: str, text: str, details: bool) -> Any:
+    from whois.parser import WhoisEntry
+    try:
+        entry = WhoisEntry.load(domain, text)
+    except Exception:
+        # python-whois raises for "no match" answers
+        return True
+    str(entry)  # What WhoisProvider stored as raw_response
+    return entry.domain_name is None
+
+
+def measure(func: Callable[[str, str, bool], Any], domain: str, text: str,
+            details: bool, iterations: int) -> Dict[str, Any]:
+    """Time a parse function over one response."""
+    outcome = func(domain, text, details)
+    start = time.perf_counter()
+    for _ in range(iterations):
+        func(domain, text, details)
+    elapsed = time.perf_counter() - start
+    return {
+        'available': outcome,
+        'seconds': elapsed,
+        'ops_per_sec': iterations / elapsed if elapsed else None,
+        'us_per_op': elapsed / iterations * 1e6,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--iterations', type=int, default=2000, help='Parses per response and implementation')
+    parser.add_argument('--no-details', action='store_true', help='Only classify registered responses')
+    args = parser.parse_args()
+    details = not args.no_details
+
+    try:
+        import whois.parser  # noqa: F401
+        implementations = {'native': native_parse, 'python_whois': python_whois_parse}
+    except ImportError:
+        implementations = {'native': native_parse}
+
+    corpus = load_corpus()
+    report: Dict[str, Any] = {
+        'iterations': args.iterations,
+        'details': details,
+        'implementations': list(implementations),
+        'responses': [],
+        'totals': {},
+    }
+
+    totals = {name: 0.0 for name in implementations}
+    for file_name, domain, text in corpus:
+        entry = {'file': file_name, 'domain': domain, 'bytes': len(text)}
+        for name, func in implementations.items():
+            entry[name] = measure(func, domain, text, details, args.iterations)
+            totals[name] += entry[name]['seconds']
+        report['responses'].append(entry)
+
+    parses = args.iterations * len(corpus)
+    for name, seconds in totals.items():
+        report['totals'][name] = {'seconds': seconds, 'ops_per_sec': parses / seconds if seconds else None}
+    if 'python_whois' in totals and totals['native']:
+        report['totals']['speedup'] = totals['python_whois'] / totals['native']
+
+    json.dump(report, sys.stdout, indent=2)
+    sys.stdout.write('\n')
+
+
+if __name__ == '__main__':
+    main()
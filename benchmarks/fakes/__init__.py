@@ -0,0 +1,11 @@
+"""
+Local stand-ins for WHOIS servers, the GoDaddy availability API and the GoDaddy search page,
+and an HTTP proxy to route them through.
+Each fake has configurable latency, error rate and rate limit, and answers deterministically
+from the domain name, so runs are reproducible.
+"""
+
+from .common import FaultConfig, is_registered
+from .whois_server import FakeWhoisServer
+from .godaddy_server import FakeGoDaddyServer
+from .proxy_server import FakeProxyServer
@@ -0,0 +1,62 @@
+"""
+Behaviour shared by the fake upstreams: fault injection and deterministic availability.
+"""
+
+import time
+import random
+import hashlib
+import threading
+from dataclasses import dataclass
+from typing import Optional
+
+
+@dataclass
+class FaultConfig:
+    """Latency, error and rate-limit behaviour of a fake upstream."""
+    latency: float = 0.02           # Base response time in seconds
+    jitter: float = 0.01            # Extra uniform random delay in seconds
+    error_rate: float = 0.0         # Share of queries that fail
+    rate_limit: Optional[float] = None  # Queries per second before answering "rate limited"
+    burst: int = 10                 # Queries allowed back to back under the rate limit
+    registered_ratio: float = 0.3   # Share of domains reported as registered
+    stall_rate: float = 0.0         # Share of WHOIS queries that stall
+    stall: float = 10.0             # Seconds a stalled WHOIS query takes
+    consent_wall: bool = False      # Search page redirects to set a market, then asks for cookie consent
+    consent_delay: float = 0.3      # Seconds the consent page takes (its bot check)
+    consent_ttl: float = 3600.0     # Seconds an accepted consent stays valid
+    seed: int = 0
+
+    def delay(self, rng: random.Random) -> float:
+        return self.latency + (rng.uniform(0, self.jitter) if self.jitter else 0.0)
+
+    def stalled(self, rng: random.Random) -> bool:
+        return bool(self.stall_rate) and rng.random() < self.stall_rate
+
+
+def is_registered(domain: str, ratio: float) -> bool:
+    """Decide deterministically whether a fake upstream reports a domain as registered."""
+    digest = hashlib.blake2b(domain.lower().encode('utf-8'), digest_size=4).digest()
+    return int.from_bytes(digest, 'little') % 10000 < ratio * 10000
+
+
+class TokenBucket:
+    """Thread-safe token bucket used to emulate upstream rate limits."""
+
+    def __init__(self, rate: Optional[float], burst: int):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        if not self.rate:
+            return True
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(float(self.burst), self._tokens + (now - self._last) * self.rate)
+            self._last = now
+            if self._tokens >= 1.0:
+                self._tokens -= 1.0
+                return True
+            return False
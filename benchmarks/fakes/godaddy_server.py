@@ -0,0 +1,166 @@
+"""
+Fake GoDaddy HTTP server.
+Serves the domain availability API (/v1/domains/available) used by GoDaddyProvider, a
+static search page (/domainsearch/find) with the selectors GoDaddyBrowserProvider relies on,
+and a registry RDAP endpoint (/rdap/domain/<name>) WHOIS queries are hedged to.
+With consent_wall, a browser without cookies is first redirected to set its market, then
+shown a slow cookie-consent page until it accepts, as on the real site.
+"""
+
+import os
+import json
+import time
+import random
+import logging
+import threading
+from http.cookies import SimpleCookie
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from typing import Dict, Optional
+from urllib.parse import urlparse, parse_qs
+
+from .common import FaultConfig, TokenBucket, is_registered
+
+logger = logging.getLogger(__name__)
+
+FIXTURES = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'fixtures')
+SEARCH_PAGE = os.path.join(FIXTURES, 'godaddy_search.html')
+CONSENT_PAGE = os.path.join(FIXTURES, 'godaddy_consent.html')
+
+
+class FakeGoDaddyServer:
+    """Threaded HTTP server emulating the GoDaddy API and search page."""
+
+    def __init__(self, faults: Optional[FaultConfig] = None, host: str = '127.0.0.1', port: int = 0):
+        self.faults = faults or FaultConfig()
+        self.queries = 0
+        self.errors = 0
+        self.rate_limited = 0
+        self.rdap_queries = 0
+        self.page_views = 0
+        self.redirects = 0
+        self.consent_walls = 0
+        self._bucket = TokenBucket(self.faults.rate_limit, self.faults.burst)
+        self._rng = random.Random(self.faults.seed)
+        self._rng_lock = threading.Lock()
+        with open(SEARCH_PAGE, 'rb') as f:
+            self._page = f.read()
+        with open(CONSENT_PAGE, 'rb') as f:
+            self._consent_page = f.read()
+        self._httpd = ThreadingHTTPServer((host, port), self._handler_class())
+        self._httpd.daemon_threads = True
+        self.host, self.port = self._httpd.server_address[:2]
+
+    @property
+    def base_url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    @property
+    def search_url(self) -> str:
+        return f"{self.base_url}/domainsearch/find"
+
+    def start(self) -> int:
+        """Start serving on a background thread and return the bound port."""
+        threading.Thread(target=self._httpd.serve_forever, name='fake-godaddy', daemon=True).start()
+        return self.port
+
+    def stop(self) -> None:
+        self._httpd.shutdown()
+
+    def _availability(self, domain: str):
+        """Return (HTTP status, JSON body) for an availability query."""
+        with self._rng_lock:
+            delay = self.faults.delay(self._rng)
+            failed = self.faults.error_rate and self._rng.random() < self.faults.error_rate
+        self.queries += 1
+        time.sleep(delay)
+        if not self._bucket.allow():
+            self.rate_limited += 1
+            return 429, {'code': 'TOO_MANY_REQUESTS', 'message': 'Request was throttled'}
+        if failed:
+            self.errors += 1
+            return 500, {'code': 'INTERNAL_SERVER_ERROR', 'message': 'Unexpected error'}
+        available = not is_registered(domain, self.faults.registered_ratio)
+        return 200, {
+            'available': available,
+            'domain': domain,
+            'definitive': True,
+            'price': 11990000 if available else None,
+            'currency': 'USD',
+            'period': 1,
+        }
+
+    def _rdap(self, domain: str):
+        """Return (HTTP status, JSON body) for an RDAP domain lookup."""
+        with self._rng_lock:
+            delay = self.faults.delay(self._rng)
+        self.rdap_queries += 1
+        time.sleep(delay)
+        if is_registered(domain, self.faults.registered_ratio):
+            return 200, {
+                'objectClassName': 'domain',
+                'ldhName': domain.upper(),
+                'status': ['client transfer prohibited'],
+                'events': [{'eventAction': 'registration', 'eventDate': '2015-03-02T18:04:11Z'},
+                           {'eventAction': 'expiration', 'eventDate': '2027-03-02T18:04:11Z'}],
+                'entities': [{'objectClassName': 'entity', 'roles': ['registrar'],
+                              'vcardArray': ['vcard', [['version', {}, 'text', '4.0'],
+                                                       ['fn', {}, 'text', 'Benchmark Registrar, LLC']]]}],
+            }
+        return 404, {'errorCode': 404, 'title': 'Not Found'}
+
+    def _search_page(self, cookies: Dict[str, str]):
+        """Return (HTTP status, body, extra headers) of the search page for a browser's cookies."""
+        self.page_views += 1
+        if self.faults.consent_wall:
+            if 'market' not in cookies:
+                self.redirects += 1
+                return 302, b'', {'Location': '/domainsearch/find', 'Set-Cookie': 'market=en-US; Path=/'}
+            if cookies.get('consent') != 'accepted':
+                self.consent_walls += 1
+                time.sleep(self.faults.consent_delay)
+                return 200, self._consent_page, {}
+        return 200, self._page, {}
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_GET(self):
+                url = urlparse(self.path)
+                if url.path == '/v1/domains/available':
+                    domain = parse_qs(url.query).get('domain', [''])[0]
+                    status, body = server._availability(domain)
+                    self._send(status, json.dumps(body).encode('utf-8'), 'application/json')
+                elif url.path.startswith('/rdap/domain/'):
+                    status, body = server._rdap(url.path[len('/rdap/domain/'):])
+                    self._send(status, json.dumps(body).encode('utf-8'), 'application/rdap+json')
+                elif url.path == '/domainsearch/find':
+                    cookies = SimpleCookie(self.headers.get('Cookie', ''))
+                    status, body, headers = server._search_page({name: m.value for name, m in cookies.items()})
+                    self._send(status, body, 'text/html; charset=utf-8', headers)
+                else:
+                    self._send(404, b'{"code": "NOT_FOUND"}', 'application/json')
+
+            def do_POST(self):
+                if urlparse(self.path).path == '/consent':
+                    self.rfile.read(int(self.headers.get('Content-Length') or 0))
+                    cookie = f"consent=accepted; Max-Age={int(server.faults.consent_ttl)}; Path=/"
+                    self._send(204, b'', 'text/plain', {'Set-Cookie': cookie})
+                else:
+                    self._send(404, b'{"code": "NOT_FOUND"}', 'application/json')
+
+            def _send(self, status: int, body: bytes, content_type: str, headers: Optional[Dict[str, str]] = None):
+                self.send_response(status)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
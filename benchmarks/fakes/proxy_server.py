@@ -0,0 +1,109 @@
+"""
+Fake HTTP forward proxy.
+Tunnels CONNECT requests (WHOIS over port 43, HTTPS) and forwards absolute-URI requests
+(plain HTTP), so egress pools can be exercised against local proxy stand-ins. A proxy can
+refuse requests with 403 once its rate limit is exceeded or after it is switched to
+banned, emulating an address an upstream has blocked.
+"""
+
+import asyncio
+import logging
+import threading
+from typing import Optional
+from urllib.parse import urlsplit
+
+from .common import FaultConfig, TokenBucket
+
+logger = logging.getLogger(__name__)
+
+
+class FakeProxyServer:
+    """Asyncio HTTP proxy run on a background thread."""
+
+    def __init__(self, faults: Optional[FaultConfig] = None, host: str = '127.0.0.1', port: int = 0):
+        self.faults = faults or FaultConfig(latency=0.0, jitter=0.0)
+        self.host = host
+        self.port = port
+        self.banned = False
+        self.requests = 0
+        self.refused = 0
+        self._bucket = TokenBucket(self.faults.rate_limit, self.faults.burst)
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._server = None
+        self._ready = threading.Event()
+
+    @property
+    def url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        upstream_writer = None
+        try:
+            head = await reader.readuntil(b'\r\n\r\n')
+            request_line, *header_lines = head.decode('latin-1').split('\r\n')
+            method, target, version = request_line.split(' ', 2)
+            self.requests += 1
+            if self.banned or not self._bucket.allow():
+                self.refused += 1
+                writer.write(b'HTTP/1.1 403 Forbidden\r\nContent-Length: 0\r\nConnection: close\r\n\r\n')
+                await writer.drain()
+                return
+            if method == 'CONNECT':
+                host, _, port = target.rpartition(':')
+                upstream_reader, upstream_writer = await asyncio.open_connection(host, int(port))
+                writer.write(b'HTTP/1.1 200 Connection established\r\n\r\n')
+            else:
+                # Absolute-URI request: forward it in origin form, one request per connection
+                url = urlsplit(target)
+                upstream_reader, upstream_writer = await asyncio.open_connection(url.hostname, url.port or 80)
+                path = url.path + ('?' + url.query if url.query else '')
+                headers = [line for line in header_lines if line and not line.lower().startswith(
+                    ('proxy-', 'connection:', 'keep-alive:'))]
+                upstream_writer.write(f"{method} {path or '/'} {version}\r\n".encode('latin-1'))
+                upstream_writer.write(('\r\n'.join(headers + ['Connection: close']) + '\r\n\r\n').encode('latin-1'))
+            await writer.drain()
+            await asyncio.gather(self._pipe(reader, upstream_writer), self._pipe(upstream_reader, writer))
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            if upstream_writer is not None:
+                upstream_writer.close()
+            writer.close()
+
+    @staticmethod
+    async def _pipe(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                chunk = await reader.read(65536)
+                if not chunk:
+                    break
+                writer.write(chunk)
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            if writer.can_write_eof():
+                try:
+                    writer.write_eof()
+                except OSError:
+                    pass
+
+    def start(self) -> int:
+        """Start serving on a background thread and return the bound port."""
+        thread = threading.Thread(target=self._run, name='fake-proxy', daemon=True)
+        thread.start()
+        self._ready.wait()
+        return self.port
+
+    def _run(self) -> None:
+        self._loop = asyncio.new_event_loop()
+        self._server = self._loop.run_until_complete(
+            asyncio.start_server(self._handle, self.host, self.port, backlog=1024))
+        self.port = self._server.sockets[0].getsockname()[1]
+        self._ready.set()
+        self._loop.run_forever()
+
+    def stop(self) -> None:
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._server.close)
+            self._loop.call_soon_threadsafe(self._loop.stop)
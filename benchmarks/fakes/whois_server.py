@@ -0,0 +1,124 @@
+"""
+Fake port-43 WHOIS server.
+Answers with the recorded registry responses of benchmarks/corpus/whois, rewritten for the
+queried domain, so the checker's native parsers see realistic text.
+"""
+
+import os
+import random
+import asyncio
+import logging
+import threading
+from typing import Dict, Optional, Tuple
+
+from .common import FaultConfig, TokenBucket, is_registered
+
+logger = logging.getLogger(__name__)
+
+CORPUS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'corpus', 'whois')
+
+# Registry (and native parser) answering for each TLD; TLDs without recorded
+# responses borrow the Identity Digital ones
+REGISTRY_BY_TLD = {
+    '.com': 'verisign', '.net': 'verisign', '.org': 'pir', '.io': 'identity_digital',
+    '.ai': 'identity_digital', '.com.br': 'registro_br', '.co': 'identity_digital',
+    '.app': 'identity_digital', '.dev': 'identity_digital',
+}
+
+RATE_LIMITED_RESPONSE = "Your connection limit exceeded. Please slow down and try again later.\r\n"
+
+
+def _load_templates() -> Dict[Tuple[str, str], Tuple[str, str]]:
+    """Load recorded responses as {(registry, state): (recorded domain, text)}."""
+    templates = {}
+    for name in sorted(os.listdir(CORPUS_DIR)):
+        if not name.endswith('.txt'):
+            continue
+        stem = name[:-len('.txt')]
+        domain = stem.split('_')[-1]
+        registry, state = stem[:-len(domain) - 1].rsplit('_', 1)
+        if (registry, state) not in templates:
+            with open(os.path.join(CORPUS_DIR, name), encoding='utf-8') as f:
+                templates[(registry, state)] = (domain, f.read())
+    return templates
+
+
+class FakeWhoisServer:
+    """Asyncio TCP server emulating WHOIS registries, run on a background thread."""
+
+    def __init__(self, faults: Optional[FaultConfig] = None, host: str = '127.0.0.1', port: int = 0):
+        self.faults = faults or FaultConfig()
+        self.host = host
+        self.port = port
+        self.queries = 0
+        self.errors = 0
+        self.rate_limited = 0
+        self.stalled = 0
+        self._templates = _load_templates()
+        self._bucket = TokenBucket(self.faults.rate_limit, self.faults.burst)
+        self._rng = random.Random(self.faults.seed)
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._server = None
+        self._ready = threading.Event()
+
+    @staticmethod
+    def registry_for(tld: str) -> str:
+        """Return the registry whose responses are served for a TLD."""
+        return REGISTRY_BY_TLD.get(tld, 'identity_digital')
+
+    def response_for(self, domain: str) -> str:
+        """Build the response text for a domain."""
+        tld = next((t for t in sorted(REGISTRY_BY_TLD, key=len, reverse=True) if domain.endswith(t)),
+                   '.' + domain.rsplit('.', 1)[-1])
+        registry = self.registry_for(tld)
+        state = 'registered' if is_registered(domain, self.faults.registered_ratio) else 'notfound'
+        recorded, text = self._templates[(registry, state)]
+        return text.replace(recorded, domain).replace(recorded.upper(), domain.upper())
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            line = await reader.readline()
+            query = line.decode('utf-8', errors='replace').strip().lower()
+            # Verisign-style "domain <name>" queries
+            if query.startswith('domain '):
+                query = query[len('domain '):]
+            self.queries += 1
+
+            delay = self.faults.delay(self._rng)
+            if self.faults.stalled(self._rng):
+                self.stalled += 1
+                delay += self.faults.stall
+            await asyncio.sleep(delay)
+            if not self._bucket.allow():
+                self.rate_limited += 1
+                writer.write(RATE_LIMITED_RESPONSE.encode('utf-8'))
+            elif self.faults.error_rate and self._rng.random() < self.faults.error_rate:
+                # Registries under stress drop the connection without answering
+                self.errors += 1
+            else:
+                writer.write(self.response_for(query).encode('utf-8'))
+            await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    def start(self) -> int:
+        """Start serving on a background thread and return the bound port."""
+        thread = threading.Thread(target=self._run, name='fake-whois', daemon=True)
+        thread.start()
+        self._ready.wait()
+        return self.port
+
+    def _run(self) -> None:
+        self._loop = asyncio.new_event_loop()
+        self._server = self._loop.run_until_complete(
+            asyncio.start_server(self._handle, self.host, self.port, backlog=1024))
+        self.port = self._server.sockets[0].getsockname()[1]
+        self._ready.set()
+        self._loop.run_forever()
+
+    def stop(self) -> None:
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._server.close)
+            self._loop.call_soon_threadsafe(self._loop.stop)
@@ -0,0 +1,296 @@
+"""
+End-to-end load test of the web endpoints.
+Opens concurrent /stream-check SSE streams and /generate-pdf requests against a running
+instance, ramping the number of clients in steps, and reports per step: time to first
+event, event inter-arrival gaps, completion latency, server RSS and error rates.
+
+By default it starts the fake upstreams and a local instance wired to them; use --url
+to target an instance that is already running (pass --server-pid to sample its RSS).
+
+Usage:
+    python benchmarks/load_test.py [--steps 1,5,10,25] [--step-duration 30] [--pdf-ratio 0.2]
+        [--brands 5] [--url http://host:port] [--output report.json]
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+import subprocess
+from typing import Dict, List, Any, Optional
+
+import aiohttp
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.fakes import FaultConfig
+from benchmarks.run_benchmarks import start_fakes, write_overrides, percentiles, git_revision
+
+SERVER_SNIPPET = (
+    "import sys; sys.path.insert(0, {root!r}); from src.main import app; "
+    "app.run(host='127.0.0.1', port={port}, threaded=True)"
+)
+
+
+class StepStats:
+    """Measurements collected during one load step."""
+
+    def __init__(self):
+        self.ttfe: List[float] = []
+        self.gaps: List[float] = []
+        self.stream_latency: List[float] = []
+        self.pdf_latency: List[float] = []
+        self.streams = 0
+        self.stream_errors = 0
+        self.pdfs = 0
+        self.pdf_errors = 0
+        self.rss_samples: List[int] = []
+
+    def report(self, clients: int, duration: float) -> Dict[str, Any]:
+        rss = self.rss_samples
+        return {
+            'clients': clients,
+            'duration_seconds': round(duration, 2),
+            'streams': {
+                'completed': self.streams,
+                'errors': self.stream_errors,
+                'error_rate': round(self.stream_errors / max(1, self.streams + self.stream_errors), 4),
+                'per_sec': round(self.streams / duration, 3) if duration else None,
+                'time_to_first_event_ms': percentiles(self.ttfe),
+                'inter_arrival_gap_ms': percentiles(self.gaps),
+                'completion_ms': percentiles(self.stream_latency),
+            },
+            'pdfs': {
+                'completed': self.pdfs,
+                'errors': self.pdf_errors,
+                'error_rate': round(self.pdf_errors / max(1, self.pdfs + self.pdf_errors), 4),
+                'latency_ms': percentiles(self.pdf_latency),
+            },
+            'server_rss_mb': {
+                'max': round(max(rss) / (1024 * 1024), 1),
+                'mean': round(sum(rss) / len(rss) / (1024 * 1024), 1),
+            } if rss else None,
+        }
+
+
+def read_rss(pid: int) -> Optional[int]:
+    """Return the resident set size of a process in bytes (Linux only)."""
+    try:
+        with open(f"/proc/{pid}/status", encoding='ascii') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        return None
+    return None
+
+
+async def stream_check(session: aiohttp.ClientSession, url: str, brands: List[str], tlds: List[str],
+                       stats: StepStats) -> Optional[List[Dict[str, Any]]]:
+    """Run one /stream-check request and record its event timings; return the final results."""
+    start = time.perf_counter()
+    data = aiohttp.FormData()
+    data.add_field('brand_names', '\n'.join(brands))
+    for tld in tlds:
+        data.add_field('tlds', tld)
+    last = None
+    results = None
+    try:
+        async with session.post(f"{url}/stream-check", data=data) as response:
+            if response.status != 200:
+                stats.stream_errors += 1
+                return None
+            async for line in response.content:
+                if not line.startswith(b'data: '):
+                    continue
+                now = time.perf_counter()
+                if last is None:
+                    stats.ttfe.append(now - start)
+                else:
+                    stats.gaps.append(now - last)
+                last = now
+                event = json.loads(line[len(b'data: '):])
+                if 'results' in event:
+                    results = event['results']
+        if results is None:
+            stats.stream_errors += 1
+            return None
+        stats.streams += 1
+        stats.stream_latency.append(time.perf_counter() - start)
+        return results
+    except (aiohttp.ClientError, asyncio.TimeoutError, ValueError):
+        stats.stream_errors += 1
+        return None
+
+
+async def generate_pdf(session: aiohttp.ClientSession, url: str, results: List[Dict[str, Any]],
+                       stats: StepStats) -> None:
+    """Run one /generate-pdf request and record its latency."""
+    start = time.perf_counter()
+    try:
+        async with session.post(f"{url}/generate-pdf", json={'results': results}) as response:
+            await response.read()
+            if response.status != 200:
+                stats.pdf_errors += 1
+                return
+        stats.pdfs += 1
+        stats.pdf_latency.append(time.perf_counter() - start)
+    except (aiohttp.ClientError, asyncio.TimeoutError):
+        stats.pdf_errors += 1
+
+
+def synthetic_results(brands: List[str], tlds: List[str]) -> List[Dict[str, Any]]:
+    """Results payload for PDF requests sent before any stream has completed."""
+    return [{
+        'brand': brand,
+        'domains': [{'domain': f"{brand}{tld}", 'available': i % 3 != 0, 'confidence': 0.8,
+                     'status': 'available' if i % 3 else 'unavailable',
+                     'sources': [{'source': 'WHOIS', 'error': None}]} for i, tld in enumerate(tlds)],
+        'suggestions': [f"get{brand}.com", f"{brand}app.io"],
+    } for brand in brands]
+
+
+async def client_loop(session, url: str, args: argparse.Namespace, stats: StepStats, deadline: float,
+                      rng: random.Random, client_id: int, shared: Dict[str, Any]) -> None:
+    """Issue requests back to back until the step ends."""
+    request = 0
+    while time.perf_counter() < deadline:
+        if rng.random() < args.pdf_ratio:
+            await generate_pdf(session, url, shared['results'], stats)
+        else:
+            # Fresh brand names per request, so the server cannot coalesce the whole load
+            brands = [f"load{client_id:03d}x{request:04d}b{i}" for i in range(args.brands)]
+            results = await stream_check(session, url, brands, args.tlds.split(','), stats)
+            if results:
+                shared['results'] = results
+        request += 1
+
+
+async def run_step(url: str, clients: int, args: argparse.Namespace, server_pid: Optional[int],
+                   shared: Dict[str, Any]) -> Dict[str, Any]:
+    stats = StepStats()
+    start = time.perf_counter()
+    deadline = start + args.step_duration
+    timeout = aiohttp.ClientTimeout(total=args.request_timeout)
+
+    async def sample_rss():
+        while True:
+            rss = read_rss(server_pid) if server_pid else None
+            if rss is not None:
+                stats.rss_samples.append(rss)
+            await asyncio.sleep(0.5)
+
+    sampler = asyncio.ensure_future(sample_rss())
+    connector = aiohttp.TCPConnector(limit=0)
+    async with aiohttp.ClientSession(timeout=timeout, connector=connector) as session:
+        await asyncio.gather(*(client_loop(session, url, args, stats, deadline, random.Random(i), i, shared)
+                               for i in range(clients)))
+    sampler.cancel()
+    return stats.report(clients, time.perf_counter() - start)
+
+
+def start_server(port: int, args: argparse.Namespace):
+    """Start the fakes and a local instance wired to them; return (server, fakes process, fakes pipe, overrides)."""
+    faults = FaultConfig(latency=args.latency, jitter=args.jitter, error_rate=args.error_rate,
+                         rate_limit=args.rate_limit)
+    fakes, conn, whois_port, http_port, _ = start_fakes(faults)
+    overrides_path = os.path.join(args.workdir, f"load_test_overrides_{os.getpid()}.json")
+    write_overrides(whois_port, args.client_rate, overrides_path)
+    env = dict(os.environ,
+               TLD_REGISTRY_OVERRIDES=overrides_path,
+               GODADDY_API_KEY='benchmark', GODADDY_API_SECRET='benchmark',
+               GODADDY_API_BASE_URL=f"http://127.0.0.1:{http_port}",
+               GODADDY_SEARCH_URL=f"http://127.0.0.1:{http_port}/domainsearch/find")
+    server = subprocess.Popen([sys.executable, '-c', SERVER_SNIPPET.format(root=ROOT, port=port)], env=env,
+                              stdout=subprocess.DEVNULL, stderr=None if args.verbose else subprocess.DEVNULL)
+    return server, fakes, conn, overrides_path
+
+
+async def wait_until_ready(url: str, timeout: float = 60.0) -> None:
+    deadline = time.monotonic() + timeout
+    async with aiohttp.ClientSession() as session:
+        while time.monotonic() < deadline:
+            try:
+                async with session.get(f"{url}/") as response:
+                    if response.status == 200:
+                        return
+            except aiohttp.ClientError:
+                pass
+            await asyncio.sleep(0.5)
+    raise RuntimeError(f"{url} did not become ready within {timeout:.0f}s")
+
+
+async def run(args: argparse.Namespace, url: str, server_pid: Optional[int]) -> List[Dict[str, Any]]:
+    await wait_until_ready(url)
+    shared = {'results': synthetic_results([f"pdfbrand{i}" for i in range(args.brands)], args.tlds.split(','))}
+    steps = []
+    for clients in (int(s) for s in args.steps.split(',')):
+        step = await run_step(url, clients, args, server_pid, shared)
+        print(f"{clients} clients: {step['streams']['completed']} streams, "
+              f"p95 completion {step['streams']['completion_ms'].get('p95')} ms, "
+              f"{step['streams']['errors'] + step['pdfs']['errors']} errors", file=sys.stderr)
+        steps.append(step)
+    return steps
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--url', help='Base URL of a running instance (default: start one with fake upstreams)')
+    parser.add_argument('--server-pid', type=int, help='PID of the --url instance, to sample its RSS')
+    parser.add_argument('--port', type=int, default=5055, help='Port of the instance started by the tool')
+    parser.add_argument('--steps', default='1,5,10,25', help='Comma-separated numbers of concurrent clients')
+    parser.add_argument('--step-duration', type=float, default=30.0, help='Seconds per step')
+    parser.add_argument('--pdf-ratio', type=float, default=0.2, help='Share of requests that are PDF reports')
+    parser.add_argument('--brands', type=int, default=5, help='Brand names per stream request')
+    parser.add_argument('--tlds', default='.com,.net,.org', help='TLDs per stream request')
+    parser.add_argument('--request-timeout', type=float, default=300.0, help='Timeout of a single request')
+    parser.add_argument('--latency', type=float, default=0.02, help='Base fake upstream latency in seconds')
+    parser.add_argument('--jitter', type=float, default=0.01, help='Extra random fake upstream latency')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Share of fake upstream queries that fail')
+    parser.add_argument('--rate-limit', type=float, default=None, help='Fake upstream queries per second')
+    parser.add_argument('--client-rate', type=float, default=1000.0,
+                        help='WHOIS query rate the instance allows itself per upstream')
+    parser.add_argument('--output', help='Write the JSON report to this file instead of stdout')
+    parser.add_argument('--verbose', action='store_true', help='Show the logs of the started instance')
+    parser.add_argument('--workdir', default=os.environ.get('TMPDIR', '/tmp'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    server = fakes = conn = overrides_path = None
+    url, server_pid = args.url, args.server_pid
+    if url is None:
+        server, fakes, conn, overrides_path = start_server(args.port, args)
+        url, server_pid = f"http://127.0.0.1:{args.port}", server.pid
+    try:
+        steps = asyncio.run(run(args, url.rstrip('/'), server_pid))
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait(10)
+            conn.send('stop')
+            conn.recv()
+            fakes.join(5)
+            os.remove(overrides_path)
+
+    report = {
+        'meta': {
+            'revision': git_revision(),
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+            'url': url,
+            'config': {k: v for k, v in vars(args).items() if k != 'workdir'},
+        },
+        'steps': steps,
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,362 @@
+"""
+Offline benchmark suite for the domain checker.
+Starts local stand-ins for the WHOIS registries and GoDaddy (in a separate process, so they
+do not skew the measurements), points the checker at them and runs scenarios of 1, 100 and
+10,000 domains against DomainChecker (through the batch pipeline) and the /stream-check
+endpoint. Each scenario runs in its own process so peak RSS and CPU are per scenario.
+The report is JSON, so runs can be compared between commits.
+
+Usage:
+    python benchmarks/run_benchmarks.py [--sizes 1,100,10000] [--targets checker,stream]
+        [--providers whois,api] [--latency 0.02] [--jitter 0.01] [--error-rate 0]
+        [--rate-limit QPS] [--stall-rate 0] [--consent-wall] [--proxies N] [--output report.json]
+"""
+
+import os
+import sys
+import json
+import time
+import math
+import asyncio
+import argparse
+import platform
+import resource
+import subprocess
+import multiprocessing
+from typing import Dict, List, Any, Optional, Tuple
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.fakes import FaultConfig, FakeWhoisServer, FakeGoDaddyServer, FakeProxyServer
+
+DEFAULT_SIZES = '1,100,10000'
+DEFAULT_TARGETS = 'checker,stream'
+
+
+def _serve_fakes(faults: Dict[str, Any], proxies: int, conn) -> None:
+    """Run the fake upstreams (and proxies) until asked to stop, then report their counters."""
+    config = FaultConfig(**faults)
+    if proxies:
+        # Each proxy stands for a source address, so the upstream rate limit applies per proxy
+        proxy_config = FaultConfig(latency=0.0, jitter=0.0, rate_limit=config.rate_limit, burst=config.burst)
+        config = FaultConfig(**{**faults, 'rate_limit': None})
+    whois_server = FakeWhoisServer(config)
+    godaddy_server = FakeGoDaddyServer(config)
+    proxy_servers = [FakeProxyServer(proxy_config) for _ in range(proxies)]
+    conn.send((whois_server.start(), godaddy_server.start(), [proxy.start() for proxy in proxy_servers]))
+    conn.recv()
+    counters = {
+        'whois': {'queries': whois_server.queries, 'errors': whois_server.errors,
+                  'rate_limited': whois_server.rate_limited, 'stalled': whois_server.stalled},
+        'godaddy': {'queries': godaddy_server.queries, 'errors': godaddy_server.errors,
+                    'rate_limited': godaddy_server.rate_limited},
+        'rdap': {'queries': godaddy_server.rdap_queries},
+        'search_page': {'views': godaddy_server.page_views, 'redirects': godaddy_server.redirects,
+                        'consent_walls': godaddy_server.consent_walls},
+    }
+    if proxy_servers:
+        counters['proxies'] = [{'requests': proxy.requests, 'refused': proxy.refused} for proxy in proxy_servers]
+    conn.send(counters)
+    whois_server.stop()
+    godaddy_server.stop()
+    for proxy in proxy_servers:
+        proxy.stop()
+
+
+def start_fakes(faults: FaultConfig, proxies: int = 0):
+    """
+    Start the fakes in a child process and return (process, connection, WHOIS port, HTTP port, proxy ports).
+    With proxies, the upstream rate limit is enforced by each proxy instead of the upstreams.
+    """
+    parent_conn, child_conn = multiprocessing.Pipe()
+    process = multiprocessing.Process(target=_serve_fakes, args=(vars(faults), proxies, child_conn), daemon=True)
+    process.start()
+    whois_port, http_port, proxy_ports = parent_conn.recv()
+    return process, parent_conn, whois_port, http_port, proxy_ports
+
+
+def write_overrides(whois_port: int, client_rate: float, path: str, rdap_port: Optional[int] = None) -> None:
+    """Point every TLD's WHOIS host (and RDAP endpoint) at the fake servers, with the matching native parser."""
+    from src.tld_registry import load_tld_registry
+    overrides = {}
+    for tld in load_tld_registry().tlds():
+        overrides[tld] = {
+            'whois_hosts': [f"127.0.0.1:{whois_port}"],
+            'whois_parser': FakeWhoisServer.registry_for(tld),
+            'query_rate': client_rate,
+            'burst': max(1, int(client_rate)),
+        }
+        if rdap_port is not None:
+            overrides[tld]['rdap_base_url'] = f"http://127.0.0.1:{rdap_port}/rdap/"
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(overrides, f)
+
+
+def scenario_inputs(size: int, tlds: List[str]) -> Tuple[List[str], List[str]]:
+    """Return (brands, TLDs) whose product is exactly `size` domains."""
+    tlds = tlds[:max(1, min(size, len(tlds)))]
+    while size % len(tlds):
+        tlds = tlds[:-1]
+    brands = [f"benchbrand{i:05d}" for i in range(size // len(tlds))]
+    return brands, tlds
+
+
+def percentiles(values: List[float]) -> Dict[str, Any]:
+    """Summarize latencies in milliseconds."""
+    if not values:
+        return {}
+    ordered = sorted(values)
+
+    def pick(q: float) -> float:
+        return round(ordered[min(len(ordered) - 1, max(0, math.ceil(q * len(ordered)) - 1))] * 1000, 2)
+
+    return {
+        'p50': pick(0.50), 'p95': pick(0.95), 'p99': pick(0.99),
+        'mean': round(sum(ordered) / len(ordered) * 1000, 2), 'max': round(ordered[-1] * 1000, 2),
+    }
+
+
+async def run_checker(brands: List[str], tlds: List[str], providers: List[str]) -> Dict[str, Any]:
+    """Check every domain through BatchChecker and DomainChecker, timing each check."""
+    from src.domain_checker import DomainChecker
+    from src.batch_checker import BatchChecker
+    from src.async_runtime import LoopLagMonitor
+
+    class TimedDomainChecker(DomainChecker):
+        def __init__(self):
+            super().__init__()
+            self.latencies = []
+
+        async def check_domain(self, domain, *args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return await super().check_domain(domain, *args, **kwargs)
+            finally:
+                self.latencies.append(time.perf_counter() - start)
+
+    checker = TimedDomainChecker()
+    if 'whois' not in providers:
+        checker.providers = []
+    if 'api' in providers:
+        from src.registrar_apis import create_godaddy_provider
+        checker.add_provider(create_godaddy_provider())
+    if 'browser' in providers:
+        from src.browser_providers import create_godaddy_browser_provider
+        checker.add_provider(create_godaddy_browser_provider(headless=True, timeout=30))
+
+    # How long ready callbacks wait on the loop while the scenario runs
+    loop_lag = LoopLagMonitor(0.01)
+    monitor = asyncio.ensure_future(loop_lag.run())
+
+    batch_checker = BatchChecker(checker)
+    plan = batch_checker.plan(brands, tlds)
+    statuses: Dict[str, int] = {}
+    errors = 0
+    start = time.perf_counter()
+    async for domain, result, error in batch_checker.stream(list(plan.domains), rejected=plan.rejected):
+        if error is not None:
+            errors += 1
+            statuses['error'] = statuses.get('error', 0) + 1
+        else:
+            statuses[result.status.value] = statuses.get(result.status.value, 0) + 1
+    wall = time.perf_counter() - start
+    monitor.cancel()
+
+    return {
+        'providers': [p.source_name for p in checker.providers],
+        'wall_seconds': round(wall, 3),
+        'throughput_per_sec': round(plan.unique_checks / wall, 2) if wall else None,
+        'latency_ms': percentiles(checker.latencies),
+        'loop_lag_ms': loop_lag.stats(),
+        'statuses': statuses,
+        'errors': errors,
+    }
+
+
+def run_stream(brands: List[str], tlds: List[str]) -> Dict[str, Any]:
+    """POST the scenario to /stream-check and time the server-sent events."""
+    from src.main import app, get_services
+    from src.async_runtime import loop_lag
+
+    client = app.test_client()
+    start = time.perf_counter()
+    response = client.post('/stream-check', data={'brand_names': '\n'.join(brands), 'tlds': tlds},
+                           buffered=False)
+    first_event = None
+    arrivals = []
+    final = None
+    errors = 0
+    buffer = b''
+    for chunk in response.response:
+        buffer += chunk if isinstance(chunk, bytes) else chunk.encode('utf-8')
+        while b'\n\n' in buffer:
+            raw, buffer = buffer.split(b'\n\n', 1)
+            if not raw.startswith(b'data: '):
+                continue
+            now = time.perf_counter() - start
+            first_event = first_event if first_event is not None else now
+            event = json.loads(raw[len(b'data: '):])
+            if event.get('error'):
+                errors += 1
+            if str(event.get('status', '')).startswith('Checked domain'):
+                arrivals.append(now)
+            if 'results' in event:
+                final = event
+    wall = time.perf_counter() - start
+
+    statuses: Dict[str, int] = {}
+    for brand in (final or {}).get('results', []):
+        for domain in brand['domains']:
+            statuses[domain['status']] = statuses.get(domain['status'], 0) + 1
+
+    return {
+        'providers': [p.source_name for p in get_services()[0].providers],
+        'wall_seconds': round(wall, 3),
+        'throughput_per_sec': round(len(arrivals) / wall, 2) if wall else None,
+        'time_to_first_event_ms': round(first_event * 1000, 2) if first_event is not None else None,
+        # Time from the request to each domain's result event
+        'latency_ms': percentiles(arrivals),
+        'loop_lag_ms': loop_lag.stats(),
+        'statuses': statuses,
+        'errors': errors,
+        'completed': final is not None,
+    }
+
+
+def run_single(args: argparse.Namespace) -> Dict[str, Any]:
+    """Run one scenario in this process and return its measurements."""
+    faults = FaultConfig(latency=args.latency, jitter=args.jitter, error_rate=args.error_rate,
+                         rate_limit=args.rate_limit, registered_ratio=args.registered_ratio,
+                         stall_rate=args.stall_rate, stall=args.stall, consent_wall=args.consent_wall)
+    process, conn, whois_port, http_port, proxy_ports = start_fakes(faults, args.proxies)
+
+    overrides_path = os.path.join(args.workdir, f"tld_overrides_{os.getpid()}.json")
+    write_overrides(whois_port, args.client_rate, overrides_path, http_port)
+    os.environ['TLD_REGISTRY_OVERRIDES'] = overrides_path
+    os.environ['GODADDY_API_KEY'] = os.environ['GODADDY_API_SECRET'] = 'benchmark'
+    os.environ['GODADDY_API_BASE_URL'] = f"http://127.0.0.1:{http_port}"
+    os.environ['GODADDY_SEARCH_URL'] = f"http://127.0.0.1:{http_port}/domainsearch/find"
+    if proxy_ports:
+        # Each proxy is paced just under the rate limit it enforces
+        pacing = f";rate={args.rate_limit * 0.9};burst={faults.burst}" if args.rate_limit else ''
+        os.environ['EGRESS_POOL'] = ','.join(f"http://127.0.0.1:{port}{pacing}" for port in proxy_ports)
+    # The web app always includes WHOIS and builds the other providers from DOMAIN_PROVIDERS
+    provider_names = {'api': 'godaddy_api', 'browser': 'godaddy_browser'}
+    os.environ['DOMAIN_PROVIDERS'] = ','.join(provider_names[p] for p in args.providers.split(',')
+                                              if p in provider_names)
+
+    # Log as the web app does (LOG_LEVEL, LOG_SAMPLE_RATE, ...), so logging cost is part of the measurement
+    from src.logging_config import configure_logging
+    configure_logging()
+
+    from src.tld_registry import get_tld_registry
+    brands, tlds = scenario_inputs(args.domains, get_tld_registry().default_tlds())
+
+    result: Dict[str, Any] = {'target': args.target, 'domains': len(brands) * len(tlds),
+                              'brands': len(brands), 'tlds': tlds}
+    usage_before = resource.getrusage(resource.RUSAGE_SELF)
+    started = time.perf_counter()
+    try:
+        if args.target == 'checker':
+            result.update(asyncio.run(run_checker(brands, tlds, args.providers.split(','))))
+        else:
+            result.update(run_stream(brands, tlds))
+    except Exception as e:
+        result['failed'] = f"{type(e).__name__}: {str(e)}"
+    elapsed = time.perf_counter() - started
+    usage_after = resource.getrusage(resource.RUSAGE_SELF)
+
+    cpu = (usage_after.ru_utime - usage_before.ru_utime) + (usage_after.ru_stime - usage_before.ru_stime)
+    result['cpu_seconds'] = round(cpu, 3)
+    result['cpu_percent'] = round(cpu / elapsed * 100, 1) if elapsed else None
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    scale = 1 if sys.platform == 'darwin' else 1024
+    result['peak_rss_mb'] = round(usage_after.ru_maxrss * scale / (1024 * 1024), 1)
+
+    conn.send('stop')
+    result['upstreams'] = conn.recv()
+    process.join(5)
+    os.remove(overrides_path)
+    return result
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', default=DEFAULT_SIZES, help='Comma-separated scenario sizes (domains)')
+    parser.add_argument('--targets', default=DEFAULT_TARGETS, help='Comma-separated targets: checker, stream')
+    parser.add_argument('--providers', default='whois,api',
+                        help='Providers of the checker target: whois, api, browser')
+    parser.add_argument('--latency', type=float, default=0.02, help='Base upstream latency in seconds')
+    parser.add_argument('--jitter', type=float, default=0.01, help='Extra random upstream latency in seconds')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Share of upstream queries that fail')
+    parser.add_argument('--rate-limit', type=float, default=None, help='Upstream queries per second allowed')
+    parser.add_argument('--stall-rate', type=float, default=0.0, help='Share of WHOIS queries that stall')
+    parser.add_argument('--stall', type=float, default=10.0, help='Seconds a stalled WHOIS query takes')
+    parser.add_argument('--consent-wall', action='store_true',
+                        help='Redirect and show a consent wall to browsers without cookies on the search page')
+    parser.add_argument('--registered-ratio', type=float, default=0.3, help='Share of registered domains')
+    parser.add_argument('--client-rate', type=float, default=1000.0,
+                        help='WHOIS query rate the checker allows itself per upstream')
+    parser.add_argument('--proxies', type=int, default=0,
+                        help='Route provider traffic through this many local proxies, each with its own rate limit')
+    parser.add_argument('--output', help='Write the JSON report to this file instead of stdout')
+    parser.add_argument('--verbose', action='store_true', help='Show the application logs of each scenario')
+    parser.add_argument('--workdir', default=os.environ.get('TMPDIR', '/tmp'), help=argparse.SUPPRESS)
+    parser.add_argument('--single', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--target', help=argparse.SUPPRESS)
+    parser.add_argument('--domains', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.single:
+        print(json.dumps(run_single(args)))
+        return
+
+    passthrough = [arg for arg in sys.argv[1:] if not arg.startswith('--output')]
+    if args.output:
+        passthrough = [a for a in passthrough if a != args.output]
+    results = []
+    for target in args.targets.split(','):
+        for size in (int(s) for s in args.sizes.split(',')):
+            command = [sys.executable, os.path.abspath(__file__), *passthrough,
+                       '--single', '--target', target, '--domains', str(size)]
+            completed = subprocess.run(command, stdout=subprocess.PIPE, text=True,
+                                       stderr=None if args.verbose else subprocess.DEVNULL)
+            lines = completed.stdout.strip().splitlines()
+            try:
+                results.append(json.loads(lines[-1]))
+            except (IndexError, ValueError):
+                results.append({'target': target, 'domains': size,
+                                'failed': f"scenario exited with status {completed.returncode}"})
+            print(f"{target} x {size}: {results[-1].get('throughput_per_sec', results[-1].get('failed'))}",
+                  file=sys.stderr)
+
+    report = {
+        'meta': {
+            'revision': git_revision(),
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'config': {k: v for k, v in vars(args).items() if k not in ('single', 'target', 'domains', 'workdir')},
+        },
+        'results': results,
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,268 @@
+"""
+Adaptive concurrency limits per provider upstream.
+A fixed number of concurrent queries is too low when an upstream is fast and too high when
+it slows down or starts throttling. Each provider upstream (a WHOIS server, the GoDaddy API
+or website) gets an in-flight limit adjusted by additive increase / multiplicative decrease:
+- while answers come back healthy and the limit is actually used, it grows by about one
+  per round of `limit` queries
+- a timeout, a throttling answer (429, rate limit, refused egress), a connection failure or
+  a latency spike (smoothed latency well above the upstream's baseline) cuts it sharply,
+  at most once per round of queries
+The current limits and the reasons they changed are exported as metrics and kept in a
+short history per upstream.
+"""
+
+import os
+import re
+import time
+import asyncio
+import logging
+import threading
+from collections import deque
+from typing import Dict, List, Any, Optional, Tuple
+
+from .metrics import ADAPTIVE_LIMIT, ADAPTIVE_LIMIT_CHANGES, ADAPTIVE_IN_FLIGHT
+
+logger = logging.getLogger(__name__)
+
+# Set to false to only count in-flight queries, without limiting them
+ADAPTIVE_LIMITS = os.environ.get('ADAPTIVE_LIMITS', 'true').lower() == 'true'
+# In-flight limit of an upstream before anything is known about it, and its bounds
+ADAPTIVE_INITIAL_LIMIT = float(os.environ.get('ADAPTIVE_INITIAL_LIMIT', '16'))
+ADAPTIVE_MIN_LIMIT = float(os.environ.get('ADAPTIVE_MIN_LIMIT', '1'))
+ADAPTIVE_MAX_LIMIT = float(os.environ.get('ADAPTIVE_MAX_LIMIT', '64'))
+# Factor applied to the limit on a timeout, throttling answer or latency spike
+ADAPTIVE_BACKOFF = float(os.environ.get('ADAPTIVE_BACKOFF', '0.5'))
+# Smoothed latency above this multiple of the baseline is a spike
+ADAPTIVE_LATENCY_TOLERANCE = float(os.environ.get('ADAPTIVE_LATENCY_TOLERANCE', '2.0'))
+# Latencies under this many seconds are never spikes, however low the baseline
+ADAPTIVE_MIN_SPIKE = float(os.environ.get('ADAPTIVE_MIN_SPIKE', '0.05'))
+
+# Weight of a new latency sample in the smoothed latency
+_SMOOTHING = 0.2
+# Weight of the smoothed latency when the baseline drifts up
+_BASELINE_DRIFT = 0.01
+# Changes kept per upstream
+_HISTORY = 20
+
+# Outcomes that cut the limit, and those that leave it alone
+TIMEOUT, THROTTLED, CONNECTION, LATENCY = 'timeout', 'throttled', 'connection', 'latency'
+OK, ERROR = 'ok', 'error'
+
+_TIMEOUT_RE = re.compile(r'timeout|timed out', re.IGNORECASE)
+_THROTTLED_RE = re.compile(r'rate limit|limit exceeded|too many|\b429\b|refused|banned', re.IGNORECASE)
+_CONNECTION_RE = re.compile(r'connection (?:reset|refused|error|closed|aborted)|disconnected', re.IGNORECASE)
+
+
+def classify_error(error: Optional[str]) -> str:
+    """Outcome of a provider answer from its error message (OK when there is none)."""
+    if not error:
+        return OK
+    if _TIMEOUT_RE.search(error):
+        return TIMEOUT
+    if _THROTTLED_RE.search(error):
+        return THROTTLED
+    if _CONNECTION_RE.search(error):
+        return CONNECTION
+    return ERROR
+
+
+class _Waiter:
+    """A query waiting for room under the limit."""
+
+    __slots__ = ('loop', 'future', 'granted', 'cancelled')
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, future: asyncio.Future):
+        self.loop = loop
+        self.future = future
+        self.granted = False
+        self.cancelled = False
+
+
+class AdaptiveLimiter:
+    """
+    AIMD in-flight limit of one provider upstream.
+
+    The limiter is thread-safe and can be used from several event loops.
+    """
+
+    def __init__(self, provider: str, upstream: str, initial: float = ADAPTIVE_INITIAL_LIMIT,
+                 minimum: float = ADAPTIVE_MIN_LIMIT, maximum: float = ADAPTIVE_MAX_LIMIT,
+                 backoff: float = ADAPTIVE_BACKOFF, tolerance: float = ADAPTIVE_LATENCY_TOLERANCE,
+                 enforce: bool = ADAPTIVE_LIMITS):
+        """
+        Args:
+            provider: Source name of the provider
+            upstream: Server of the provider this limit applies to
+            initial: Starting in-flight limit
+            minimum: Lowest limit
+            maximum: Highest limit
+            backoff: Factor applied to the limit when the upstream shows distress
+            tolerance: Multiple of the baseline latency above which latency is a spike
+            enforce: Whether queries wait for room under the limit (otherwise it is only tracked)
+        """
+        self.provider = provider
+        self.upstream = upstream
+        self.minimum = max(1.0, minimum)
+        self.maximum = max(self.minimum, maximum)
+        self.limit = min(self.maximum, max(self.minimum, initial))
+        self.backoff = backoff
+        self.tolerance = tolerance
+        self.enforce = enforce
+        self.in_flight = 0
+        self.latency: Optional[float] = None
+        self.baseline: Optional[float] = None
+        self.changes: deque = deque(maxlen=_HISTORY)
+        self._last_decrease = 0.0
+        self._lock = threading.Lock()
+        self._waiters: deque = deque()
+        self._limit_gauge = ADAPTIVE_LIMIT.labels(provider, upstream)
+        self._in_flight_gauge = ADAPTIVE_IN_FLIGHT.labels(provider, upstream)
+        self._limit_gauge.set(self.limit)
+
+    async def acquire(self) -> float:
+        """Wait for room under the limit; return the start time to pass to release."""
+        with self._lock:
+            if not self.enforce or (not self._waiters and self.in_flight < int(self.limit)):
+                self.in_flight += 1
+                self._in_flight_gauge.set(self.in_flight)
+                return time.monotonic()
+            loop = asyncio.get_running_loop()
+            waiter = _Waiter(loop, loop.create_future())
+            self._waiters.append(waiter)
+
+        try:
+            await waiter.future
+        except asyncio.CancelledError:
+            with self._lock:
+                if not waiter.granted:
+                    waiter.cancelled = True
+                    raise
+            # Room was granted while we were being cancelled: hand it back
+            self.release(None, OK)
+            raise
+        return time.monotonic()
+
+    def release(self, started: Optional[float], outcome: str, latency: Optional[float] = None) -> None:
+        """
+        Free a query's room and adapt the limit to its outcome.
+
+        Args:
+            started: Time returned by acquire (None to only free the room)
+            outcome: OK, ERROR, TIMEOUT, THROTTLED or CONNECTION (see classify_error)
+            latency: Seconds the upstream took to answer
+        """
+        with self._lock:
+            saturated = self.in_flight >= int(self.limit)
+            self.in_flight -= 1
+            change = None
+            if started is not None:
+                if outcome == OK and latency is not None:
+                    outcome = self._observe(latency)
+                change = self._adapt(started, outcome, saturated)
+            self._dispatch()
+            in_flight, limit = self.in_flight, self.limit
+        self._in_flight_gauge.set(in_flight)
+        if change is not None:
+            old, reason = change
+            self._limit_gauge.set(limit)
+            ADAPTIVE_LIMIT_CHANGES.labels(self.provider, self.upstream, reason).inc()
+            if reason != 'healthy':
+                # Cuts are routine; only throttling by the upstream is worth a warning
+                logger.log(logging.WARNING if reason == THROTTLED else logging.INFO,
+                           "Concurrency limit of %s (%s) cut from %d to %d: %s", self.provider, self.upstream,
+                           old, limit, reason)
+
+    def _observe(self, latency: float) -> str:
+        """Fold a latency sample into the smoothed latency and baseline; LATENCY if it is a spike."""
+        self.latency = latency if self.latency is None else self.latency + _SMOOTHING * (latency - self.latency)
+        if self.baseline is None or self.latency < self.baseline:
+            self.baseline = self.latency
+        else:
+            self.baseline += _BASELINE_DRIFT * (self.latency - self.baseline)
+        if self.latency > max(ADAPTIVE_MIN_SPIKE, self.baseline * self.tolerance):
+            return LATENCY
+        return OK
+
+    def _adapt(self, started: float, outcome: str, saturated: bool) -> Optional[Tuple[int, str]]:
+        """Apply AIMD; return (previous limit, reason) when the whole-number limit changed."""
+        old = int(self.limit)
+        if outcome in (TIMEOUT, THROTTLED, CONNECTION, LATENCY):
+            # Queries sent before the last cut reflect the old limit: one cut per round
+            if started < self._last_decrease:
+                return None
+            self.limit = max(self.minimum, self.limit * self.backoff)
+            self._last_decrease = time.monotonic()
+            # The spike is handled; judge the next ones against the new limit
+            self.latency = self.baseline
+            reason = outcome
+        elif outcome == OK and saturated:
+            # Only grow a limit that is actually reached, so idle upstreams keep a meaningful one
+            self.limit = min(self.maximum, self.limit + 1.0 / self.limit)
+            reason = 'healthy'
+        else:
+            return None
+        if int(self.limit) == old:
+            return None
+        self.changes.append((time.time(), old, int(self.limit), reason))
+        return old, reason
+
+    def _dispatch(self) -> None:
+        """Grant room to waiters while the limit allows."""
+        while self._waiters and (not self.enforce or self.in_flight < int(self.limit)):
+            waiter = self._waiters.popleft()
+            if waiter.cancelled:
+                continue
+            self.in_flight += 1
+            waiter.granted = True
+            waiter.loop.call_soon_threadsafe(_resolve, waiter.future)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'provider': self.provider,
+                'upstream': self.upstream,
+                'limit': int(self.limit),
+                'in_flight': self.in_flight,
+                'queued': sum(1 for waiter in self._waiters if not waiter.cancelled),
+                'latency_ms': round(self.latency * 1000, 1) if self.latency is not None else None,
+                'baseline_ms': round(self.baseline * 1000, 1) if self.baseline is not None else None,
+                'changes': [{'at': at, 'from': old, 'to': new, 'reason': reason}
+                            for at, old, new, reason in self.changes],
+            }
+
+
+def _resolve(future: asyncio.Future) -> None:
+    if not future.done():
+        future.set_result(None)
+
+
+class AdaptiveLimits:
+    """Adaptive limiters by (provider, upstream), created on first use."""
+
+    def __init__(self, **options):
+        """
+        Args:
+            options: AdaptiveLimiter settings shared by every limiter
+        """
+        self._options = options
+        self._limiters: Dict[Tuple[str, str], AdaptiveLimiter] = {}
+        self._lock = threading.Lock()
+
+    def get(self, provider: str, upstream: str) -> AdaptiveLimiter:
+        key = (provider, upstream)
+        limiter = self._limiters.get(key)
+        if limiter is None:
+            with self._lock:
+                limiter = self._limiters.get(key)
+                if limiter is None:
+                    limiter = self._limiters[key] = AdaptiveLimiter(provider, upstream, **self._options)
+        return limiter
+
+    def stats(self) -> List[Dict[str, Any]]:
+        """State of every limiter: current limit, load, latency and recent changes."""
+        return [limiter.stats() for limiter in list(self._limiters.values())]
+
+
+# Shared by every DomainChecker in the process
+adaptive_limits = AdaptiveLimits()
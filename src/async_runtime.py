@@ -0,0 +1,119 @@
+"""
+Shared asyncio runtime for the web application.
+Flask handlers are synchronous, so all domain checks are submitted to a single
+background event loop. Keeping one loop for the whole process lets providers
+reuse loop-bound resources (browser sessions, in-flight futures) across requests.
+The loop's lag (how late it runs a timer) is measured continuously: CPU-bound work on the
+loop thread, or holding the GIL elsewhere, shows up as lag before it shows up as latency.
+"""
+
+import os
+import asyncio
+import logging
+import threading
+import concurrent.futures
+from collections import deque
+from typing import Any, AsyncIterator, Awaitable, Dict, Iterator, Optional
+
+from .metrics import EVENT_LOOP_LAG
+
+logger = logging.getLogger(__name__)
+
+# Seconds between event loop lag measurements (0 disables them)
+LOOP_LAG_INTERVAL = float(os.environ.get('LOOP_LAG_INTERVAL', '0.1'))
+
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_thread: Optional[threading.Thread] = None
+_lock = threading.Lock()
+
+
+def get_event_loop() -> asyncio.AbstractEventLoop:
+    """Return the shared background event loop, starting it on first use."""
+    global _loop, _thread
+    with _lock:
+        if _loop is None or _loop.is_closed():
+            _loop = asyncio.new_event_loop()
+            _thread = threading.Thread(target=_loop.run_forever, name="domain-checker-loop", daemon=True)
+            _thread.start()
+            logger.info("Started shared event loop thread")
+            if LOOP_LAG_INTERVAL > 0:
+                asyncio.run_coroutine_threadsafe(loop_lag.run(), _loop)
+        return _loop
+
+
+class LoopLagMonitor:
+    """Measures how late an event loop runs a timer, i.e. how long ready callbacks wait."""
+
+    def __init__(self, interval: float = LOOP_LAG_INTERVAL, keep: int = 1024):
+        self.interval = interval
+        self.samples: deque = deque(maxlen=keep)
+
+    async def run(self) -> None:
+        """Measure the running loop's lag until cancelled."""
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, loop.time() - expected)
+            self.samples.append(lag)
+            EVENT_LOOP_LAG.observe(lag)
+
+    def stats(self) -> Dict[str, Any]:
+        """Lag percentiles of the recent samples, in milliseconds."""
+        ordered = sorted(self.samples)
+        if not ordered:
+            return {'samples': 0}
+
+        def pick(q: float) -> float:
+            return round(ordered[min(len(ordered) - 1, int(len(ordered) * q))] * 1000, 2)
+
+        return {'samples': len(ordered), 'p50': pick(0.5), 'p99': pick(0.99), 'max': round(ordered[-1] * 1000, 2)}
+
+
+# Lag of the shared loop
+loop_lag = LoopLagMonitor()
+
+
+def run_coroutine(coro: Awaitable[Any], timeout: Optional[float] = None) -> Any:
+    """
+    Run a coroutine on the shared loop and block until it finishes.
+
+    Args:
+        coro: The coroutine to run
+        timeout: Maximum number of seconds to wait for the result
+
+    Returns:
+        The coroutine's return value
+    """
+    future = asyncio.run_coroutine_threadsafe(coro, get_event_loop())
+    return future.result(timeout)
+
+
+def submit_coroutine(coro: Awaitable[Any]) -> concurrent.futures.Future:
+    """Schedule a coroutine on the shared loop without waiting for it."""
+    return asyncio.run_coroutine_threadsafe(coro, get_event_loop())
+
+
+def iterate_async(agen: AsyncIterator[Any]) -> Iterator[Any]:
+    """
+    Consume an async generator from synchronous code (e.g. a streaming Flask response).
+
+    The generator runs on the shared loop; each item is fetched on demand, so a slow
+    client naturally applies backpressure. Closing the returned iterator (for example
+    when the client disconnects) closes the async generator as well.
+    """
+    loop = get_event_loop()
+    try:
+        while True:
+            try:
+                item = asyncio.run_coroutine_threadsafe(agen.__anext__(), loop).result()
+            except StopAsyncIteration:
+                return
+            yield item
+    finally:
+        aclose = getattr(agen, 'aclose', None)
+        if aclose is not None:
+            try:
+                asyncio.run_coroutine_threadsafe(aclose(), loop).result()
+            except Exception as e:
+                logger.warning(f"Error closing async generator: {str(e)}")
@@ -0,0 +1,357 @@
+"""
+Batch domain checking pipeline.
+This module deduplicates the domains of a batch, checks each unique domain once and
+coalesces identical checks running concurrently in other requests. Batches too large to
+hold in memory, such as uploaded files, are checked from a feed that is read only as fast
+as the checks and the consumer keep up.
+"""
+
+import os
+import asyncio
+import logging
+from typing import Dict, List, Optional, Tuple, AsyncIterator, Awaitable, Callable, FrozenSet, Iterator
+
+from .domain_checker import DomainChecker
+from .preflight import Preflight
+from .results import DomainResult, Status
+from .scheduler import Priority, SlotRequest, DEFAULT_TENANT
+from .metrics import CACHE_REQUESTS, CHECKS
+
+logger = logging.getLogger(__name__)
+
+# Number of unique domains checked concurrently within a single batch
+DEFAULT_CONCURRENCY = int(os.environ.get('DOMAIN_CHECK_CONCURRENCY', '5'))
+# Domains read ahead of the checks, and results held for the consumer, when checking from a feed
+FEED_WINDOW = int(os.environ.get('FEED_WINDOW', '1000'))
+
+
+class InFlightRegistry:
+    """
+    Process-wide registry of domain checks that are currently running.
+
+    The first caller for a domain starts the check as a task; every concurrent
+    caller for the same domain awaits that task instead of starting another one.
+    A caller more urgent than the check's class promotes its scheduler slot claim
+    while it is still queued. Waiters are shielded, so a cancelled request never
+    cancels a check that other requests are still waiting on.
+    """
+
+    def __init__(self):
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._requests: Dict[str, SlotRequest] = {}
+        self.started = 0
+        self.coalesced = 0
+
+    def __len__(self) -> int:
+        return len(self._tasks)
+
+    async def run(self, domain: str, factory: Callable[[], Awaitable[DomainResult]],
+                  request: Optional[SlotRequest] = None) -> DomainResult:
+        """
+        Run the check for a domain, or join the one already in flight.
+
+        Args:
+            domain: Normalized domain used as the coalescing key
+            factory: Callable returning the coroutine that performs the check
+            request: Slot claim of this caller; the factory's check must acquire its slot with it
+
+        Returns:
+            dict: The (shared) check result
+        """
+        loop = asyncio.get_running_loop()
+        task = self._tasks.get(domain)
+        if task is not None and task.get_loop() is loop:
+            self.coalesced += 1
+            CACHE_REQUESTS.labels('in_flight', 'hit').inc()
+            logger.debug("Joining in-flight check for %s", domain, extra={'domain': domain})
+            running = self._requests.get(domain)
+            if request is not None and running is not None and running.promote(request.priority):
+                logger.debug("Promoted in-flight check for %s to %s", domain, request.priority.name.lower(),
+                             extra={'domain': domain})
+        else:
+            task = loop.create_task(factory())
+            self._tasks[domain] = task
+            if request is not None:
+                self._requests[domain] = request
+            self.started += 1
+            CACHE_REQUESTS.labels('in_flight', 'miss').inc()
+            task.add_done_callback(lambda t, d=domain: self._finished(d, t))
+        return await asyncio.shield(task)
+
+    def _finished(self, domain: str, task: asyncio.Task) -> None:
+        if self._tasks.get(domain) is task:
+            del self._tasks[domain]
+            self._requests.pop(domain, None)
+        # Retrieve the exception so it is not reported as unhandled when every waiter was cancelled
+        if not task.cancelled():
+            task.exception()
+
+
+# Shared by every batch in the process
+in_flight_registry = InFlightRegistry()
+
+
+class BatchPlan:
+    """
+    Deduplicated view of a batch of brand names and TLDs.
+
+    Each input line keeps its own entry, while `domains` maps every unique
+    normalized domain to the first (brand index, TLD index) slot it answers,
+    packed into one integer; owners() returns all of them. Non-ASCII brands
+    are transliterated, or become IDNs on TLDs that accept them with BRAND_IDN
+    (see Preflight).
+    """
+
+    def __init__(self, brands: List[str], tlds: List[str], preflight: Optional[Preflight] = None):
+        self.brands = brands
+        self.tlds = tlds
+        preflight = preflight if preflight is not None else Preflight()
+        self.normalized_brands = [preflight.ascii_label(brand) for brand in brands]
+        # Plain ints keep million-line plans compact and out of the garbage collector's way
+        self.domains: Dict[str, int] = {}
+        # Further slots of domains answering more than one input line
+        self._shared: Dict[str, List[int]] = {}
+        # Invalid domains, answered without a check: {domain: reason}
+        self.rejected: Dict[str, str] = {}
+
+        slot = 0
+        domains = self.domains
+        for domain, reason in preflight.plan_domains(brands, tlds):
+            if domain in domains:
+                self._shared.setdefault(domain, []).append(slot)
+            else:
+                domains[domain] = slot
+                if reason is not None:
+                    self.rejected[domain] = reason
+            slot += 1
+
+    @property
+    def total_checks(self) -> int:
+        """Number of checks the batch would need without deduplication."""
+        return len(self.brands) * len(self.tlds)
+
+    @property
+    def unique_checks(self) -> int:
+        """Number of checks actually performed for the batch."""
+        return len(self.domains)
+
+    def owners(self, domain: str) -> List[Tuple[int, int]]:
+        """Return the (brand index, TLD index) slots answered by a domain."""
+        first = self.domains.get(domain)
+        if first is None:
+            return []
+        width = len(self.tlds)
+        return [divmod(slot, width) for slot in [first] + self._shared.get(domain, [])]
+
+
+class BatchChecker:
+    """Check batches of domains concurrently, once per unique domain."""
+
+    def __init__(self, checker: DomainChecker, registry: Optional[InFlightRegistry] = None,
+                 concurrency: int = DEFAULT_CONCURRENCY, priority: Priority = Priority.BATCH):
+        """
+        Initialize the batch checker.
+
+        Args:
+            checker: Domain checker used for the individual checks
+            registry: In-flight registry used to coalesce concurrent checks
+            concurrency: Maximum number of unique domains checked at once
+            priority: Default scheduling class of the batch's checks
+        """
+        self.checker = checker
+        self.registry = registry if registry is not None else in_flight_registry
+        self.concurrency = max(1, concurrency)
+        self.priority = priority
+        # Rejects invalid domains before they use any capacity
+        self.preflight = Preflight(checker.tld_registry)
+
+    def plan(self, brands: List[str], tlds: List[str]) -> BatchPlan:
+        """Build the deduplicated plan for a list of brand names and TLDs."""
+        # A Preflight per plan, so its label caches live only as long as the list
+        plan = BatchPlan(brands, tlds, Preflight(self.checker.tld_registry))
+        logger.info("Batch plan: %d checks collapsed to %d unique domains, %d rejected", plan.total_checks,
+                    plan.unique_checks, len(plan.rejected))
+        return plan
+
+    async def check(self, domain: str, priority: Optional[Priority] = None, tenant: str = DEFAULT_TENANT,
+                    sources: Optional[FrozenSet[str]] = None) -> DomainResult:
+        """Check a single domain, sharing the work with any identical check in flight."""
+        priority = self.priority if priority is None else priority
+        # Checks limited to some providers only share work with checks using the same ones
+        key = domain if sources is None else f"{domain}|{','.join(sorted(sources))}"
+        request = SlotRequest(priority)
+        return await self.registry.run(
+            key, lambda: self.checker.check_domain(domain, priority, tenant, sources, request), request)
+
+    def _fresh_results(self, domains: List[str], max_age: float) -> Dict[str, DomainResult]:
+        # Stored results are decided again in one pass, under the current policy and provider weights
+        return self.checker.reconcile_stored(self.checker.history.fresh_results(domains, max_age))
+
+    async def stream(self, domains: List[str], priority: Optional[Priority] = None,
+                     tenant: str = DEFAULT_TENANT, max_age: float = 0,
+                     rejected: Optional[Dict[str, str]] = None, sources: Optional[FrozenSet[str]] = None,
+                     deadline: Optional[float] = None) -> AsyncIterator[Tuple[str, Optional[DomainResult], Optional[str]]]:
+        """
+        Check domains concurrently and yield results in completion order.
+        Invalid domains are answered first, without a check.
+
+        Args:
+            domains: Unique domains to check
+            priority: Scheduling class of the checks (default: the batch checker's)
+            tenant: Client or tenant the checks are accounted to
+            max_age: Reuse results from the check history that are at most this many seconds old (0 = never)
+            rejected: Invalid domains with their reasons, when already known (BatchPlan.rejected)
+            sources: Lowercase source names of the providers to use (default: all)
+            deadline: Seconds after which the domains not yet checked are reported as errors
+
+        Yields:
+            tuple: (domain, result, error) where exactly one of result and error is set
+        """
+        loop = asyncio.get_running_loop()
+        expires = loop.time() + deadline if deadline is not None else None
+        if rejected is None:
+            rejected = self.preflight.reject(domains)
+        if rejected:
+            logger.info("Rejected %d of %d domains before checking", len(rejected), len(domains))
+            for domain, reason in rejected.items():
+                CHECKS.labels(Status.INVALID.value).inc()
+                yield domain, DomainResult.invalid(reason), None
+            domains = [domain for domain in domains if domain not in rejected]
+
+        history = self.checker.history
+        if max_age > 0 and history is not None and domains:
+            # Fresh results are answered from history without any network work
+            fresh = await loop.run_in_executor(None, self._fresh_results, domains, max_age)
+            CACHE_REQUESTS.labels('history', 'hit').inc(len(fresh))
+            CACHE_REQUESTS.labels('history', 'miss').inc(len(domains) - len(fresh))
+            if fresh:
+                logger.info("Reusing %d of %d results from history", len(fresh), len(domains))
+                for domain, result in fresh.items():
+                    yield domain, result, None
+                domains = [domain for domain in domains if domain not in fresh]
+
+        pending = iter(domains)
+        results: asyncio.Queue = asyncio.Queue()
+
+        async def worker():
+            for domain in pending:
+                try:
+                    result = await self.check(domain, priority, tenant, sources)
+                    await results.put((domain, result, None))
+                except Exception as e:
+                    logger.error("Batch check failed for %s: %s", domain, e, extra={'domain': domain})
+                    await results.put((domain, None, str(e)))
+
+        workers = [asyncio.ensure_future(worker()) for _ in range(min(self.concurrency, len(domains)))]
+        outstanding = set(domains) if expires is not None else None
+        try:
+            for _ in range(len(domains)):
+                if expires is None:
+                    yield await results.get()
+                    continue
+                try:
+                    item = await asyncio.wait_for(results.get(), max(0.0, expires - loop.time()))
+                except asyncio.TimeoutError:
+                    logger.warning("Deadline of %gs exceeded with %d domains unchecked", deadline, len(outstanding))
+                    for domain in domains:
+                        if domain in outstanding:
+                            yield domain, None, "Deadline exceeded"
+                    return
+                outstanding.discard(item[0])
+                yield item
+        finally:
+            for task in workers:
+                task.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+
+    async def stream_feed(self, feed: Iterator[Tuple[List[str], Dict[str, str]]], priority: Optional[Priority] = None,
+                          tenant: str = DEFAULT_TENANT, max_age: float = 0,
+                          window: int = FEED_WINDOW) -> AsyncIterator[Tuple[str, Optional[DomainResult], Optional[str]]]:
+        """
+        Check domains from a blocking feed, such as an upload being parsed, and yield results in
+        completion order while the feed is still being read.
+
+        The feed is advanced in a thread. At most `window` domains wait for a check and `window`
+        results wait for the consumer; when either is full the feed is not read further, so
+        memory stays bounded whatever the feed's length.
+
+        Args:
+            feed: Chunks of (domains not seen in earlier chunks, the invalid ones with their reasons)
+            priority: Scheduling class of the checks (default: the batch checker's)
+            tenant: Client or tenant the checks are accounted to
+            max_age: Reuse results from the check history that are at most this many seconds old (0 = never)
+            window: Domains read ahead of the checks, and results held for the consumer
+
+        Yields:
+            tuple: (domain, result, error) where exactly one of result and error is set
+
+        Raises:
+            Exception: What the feed raised, after the results of the domains it gave before
+        """
+        loop = asyncio.get_running_loop()
+        history = self.checker.history if max_age > 0 else None
+        pending: asyncio.Queue = asyncio.Queue(max(1, window))
+        results: asyncio.Queue = asyncio.Queue(max(1, window))
+        failure: List[Exception] = []
+
+        async def feeder():
+            try:
+                while True:
+                    chunk = await loop.run_in_executor(None, next, feed, None)
+                    if chunk is None:
+                        return
+                    domains, rejected = chunk
+                    for domain, reason in rejected.items():
+                        CHECKS.labels(Status.INVALID.value).inc()
+                        await results.put((domain, DomainResult.invalid(reason), None))
+                    domains = [domain for domain in domains if domain not in rejected] if rejected else domains
+                    if history is not None and domains:
+                        fresh = await loop.run_in_executor(None, history.fresh_results, domains, max_age)
+                        CACHE_REQUESTS.labels('history', 'hit').inc(len(fresh))
+                        CACHE_REQUESTS.labels('history', 'miss').inc(len(domains) - len(fresh))
+                        for domain, result in fresh.items():
+                            await results.put((domain, result, None))
+                        domains = [domain for domain in domains if domain not in fresh]
+                    for domain in domains:
+                        await pending.put(domain)
+            except Exception as e:
+                logger.warning("Batch feed failed: %s", e)
+                failure.append(e)
+            # Each worker stops at a sentinel once the domains ahead of it are checked. Not sent
+            # when cancelled: the workers are cancelled too, and nothing would drain the queue.
+            for _ in workers:
+                await pending.put(None)
+
+        async def worker():
+            while True:
+                domain = await pending.get()
+                if domain is None:
+                    return
+                try:
+                    result = await self.check(domain, priority, tenant)
+                    await results.put((domain, result, None))
+                except Exception as e:
+                    logger.error("Batch check failed for %s: %s", domain, e, extra={'domain': domain})
+                    await results.put((domain, None, str(e)))
+
+        async def finish():
+            await asyncio.gather(feeding, *workers)
+            await results.put(None)
+
+        workers = [asyncio.ensure_future(worker()) for _ in range(self.concurrency)]
+        feeding = asyncio.ensure_future(feeder())
+        finishing = asyncio.ensure_future(finish())
+        try:
+            while True:
+                item = await results.get()
+                if item is None:
+                    break
+                yield item
+            if failure:
+                raise failure[0]
+        finally:
+            # Workers first, so a feeder blocked on a full queue is not waiting on them
+            tasks = [*workers, feeding, finishing]
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
@@ -1,30 +1,62 @@
 """
 GoDaddy Browser Automation Provider for domain availability checking.
 This module provides a browser-based alternative to the GoDaddy API.
+A browser without cookies goes through the site's geo redirect and cookie-consent wall
+before it reaches the search form. Each context's storage state (cookies, localStorage) is
+therefore kept past them for the next checks, and with BROWSER_STATE_DIR set it is saved to
+disk and loaded into the next context for the same egress, including after a restart. A few
+pages per context are also kept at the search form, so a check does not wait for a
+navigation; these warm-up navigations lease their context's egress like checks do.
 """
 
 import os
 import re
 import json
+import time
 import asyncio
 import logging
-from typing import Dict, List, Any, Optional
-from playwright.async_api import async_playwright, Page, Browser, BrowserContext, TimeoutError as PlaywrightTimeoutError
+from urllib.parse import urlsplit
+from typing import Dict, List, Any, Optional, Set, TYPE_CHECKING
+
+# Playwright is imported when the first browser starts, not at import time
+if TYPE_CHECKING:
+    from playwright.async_api import Page, BrowserContext
 
 from .domain_checker import DomainSourceProvider
+from .egress import Egress, EgressPool, EgressBanned, get_egress_pool
+from .metrics import (BROWSER_PAGES, BROWSER_INSTANCES, BROWSER_READY_PAGES, BROWSER_CONSENT_WALLS,
+                      BROWSER_STATE_SAVES, PROVIDER_ERRORS, error_cause)
+from .tracing import span
 
-# Configure logging
-logging.basicConfig(level=logging.INFO, 
-                   format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# Directory of the saved browser storage states, one per site and egress (empty, the default,
+# disables saving: the states hold session cookies)
+BROWSER_STATE_DIR = os.environ.get('BROWSER_STATE_DIR', '')
+# Seconds after which a saved storage state is saved again from its live context
+BROWSER_STATE_MAX_AGE = float(os.environ.get('BROWSER_STATE_MAX_AGE', '3600'))
+# Pages per browser context kept open at the search form for the next checks
+BROWSER_WARM_PAGES = int(os.environ.get('BROWSER_WARM_PAGES', '2'))
+# Buttons accepting a cookie-consent wall (CSS selector list)
+BROWSER_CONSENT_SELECTOR = os.environ.get('BROWSER_CONSENT_SELECTOR', '#onetrust-accept-btn-handler')
+
 class GoDaddyBrowserProvider(DomainSourceProvider):
-    """Domain availability provider using browser automation with GoDaddy's website."""
+    """
+    Domain availability provider using browser automation with GoDaddy's website.
+    
+    One browser is shared by all checks, with a context per egress (direct or proxy) so
+    each context's traffic leaves from its own address. Contexts start from the storage
+    state saved for their egress, and keep pages ready at the search form.
+    """
     
     # GoDaddy search URL
     SEARCH_URL = "https://www.godaddy.com/domainsearch/find"
+    USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
+    SEARCH_INPUT = 'input[name="domainToCheck"]'
     
-    def __init__(self, headless: bool = True, timeout: int = 30, max_retries: int = 2):
+    def __init__(self, headless: bool = True, timeout: int = 30, max_retries: int = 2,
+                 search_url: Optional[str] = None, egress_pool: Optional[EgressPool] = None,
+                 state_dir: Optional[str] = None, warm_pages: Optional[int] = None):
         """
         Initialize the GoDaddy Browser provider.
         
@@ -32,16 +64,33 @@ class GoDaddyBrowserProvider(DomainSourceProvider):
             headless: Whether to run browser in headless mode
             timeout: Timeout in seconds for page operations
             max_retries: Maximum number of retry attempts for failed operations
+            search_url: Search page URL overriding SEARCH_URL (e.g. a local fixture)
+            egress_pool: Proxies the browser contexts are spread over
+            state_dir: Directory of the saved storage states (default BROWSER_STATE_DIR; empty disables)
+            warm_pages: Pages per context kept at the search form (default BROWSER_WARM_PAGES)
         """
         self._source_name = "GoDaddy"
         self._weight = 0.9  # Higher weight than WHOIS
         self._headless = headless
         self._timeout = timeout * 1000  # Convert to ms for Playwright
         self._max_retries = max_retries
+        self._search_url = search_url or self.SEARCH_URL
+        self._egress_pool = egress_pool if egress_pool is not None else get_egress_pool()
+        self._upstream = urlsplit(self._search_url).netloc
         self._browser = None
-        self._context = None
+        # egress name -> browser context routed through it
+        self._contexts: Dict[str, 'BrowserContext'] = {}
+        self._context_lock: Optional[asyncio.Lock] = None
+        self._state_dir = BROWSER_STATE_DIR if state_dir is None else state_dir
+        # egress name -> time its storage state was last saved
+        self._saved_at: Dict[str, float] = {}
+        self._warm_pages = BROWSER_WARM_PAGES if warm_pages is None else max(0, warm_pages)
+        # egress name -> pages at the search form, and pages being brought back to it
+        self._ready: Dict[str, List['Page']] = {}
+        self._recycling: Dict[str, int] = {}
+        self._tasks: Set[asyncio.Task] = set()
         
-        logger.info(f"GoDaddy Browser provider initialized with headless={headless}, timeout={timeout}s")
+        logger.info("GoDaddy Browser provider initialized with headless=%s, timeout=%ss", headless, timeout)
     
     @property
     def source_name(self) -> str:
@@ -55,26 +104,200 @@ class GoDaddyBrowserProvider(DomainSourceProvider):
         """Initialize the browser if not already initialized."""
         if self._browser is None:
             logger.info("Initializing browser for GoDaddy checks")
+            from playwright.async_api import async_playwright
             self._playwright = await async_playwright().start()
             self._browser = await self._playwright.chromium.launch(headless=self._headless)
-            self._context = await self._browser.new_context(
-                user_agent="Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
-            )
+            BROWSER_INSTANCES.labels(self.source_name).inc()
             logger.info("Browser initialized successfully")
     
+    async def _context_for(self, egress: Egress) -> 'BrowserContext':
+        """Return the browser context routed through an egress, creating it on first use."""
+        context = self._contexts.get(egress.name)
+        if context is not None:
+            return context
+        if self._context_lock is None:
+            self._context_lock = asyncio.Lock()
+        async with self._context_lock:
+            context = self._contexts.get(egress.name)
+            if context is None:
+                options: Dict[str, Any] = {'user_agent': self.USER_AGENT}
+                proxy = egress.playwright_proxy()
+                if proxy is not None:
+                    options['proxy'] = proxy
+                path = self._state_path(egress)
+                if path is not None and self._owned(path):
+                    try:
+                        context = await self._browser.new_context(storage_state=path, **options)
+                        self._saved_at[egress.name] = os.path.getmtime(path)
+                        logger.info("Loaded browser state for %s from %s", egress.name, path)
+                    except Exception as e:
+                        logger.warning("Could not load browser state %s, starting without it: %s", path, e)
+                if context is None:
+                    context = await self._browser.new_context(**options)
+                self._contexts[egress.name] = context
+                for _ in range(self._warm_pages):
+                    self._recycling[egress.name] = self._recycling.get(egress.name, 0) + 1
+                    self._spawn(self._recycle(None, egress, context))
+        return context
+    
+    def _state_path(self, egress: Egress) -> Optional[str]:
+        """File of the storage state saved for an egress, or None when states are not saved."""
+        if not self._state_dir:
+            return None
+        name = re.sub(r'[^A-Za-z0-9_.-]', '_', f"{self._upstream}-{egress.name}")
+        return os.path.join(self._state_dir, f"{name}.json")
+    
+    @staticmethod
+    def _owned(path: str) -> bool:
+        """Whether a saved state exists and was written by this user, so it can be loaded."""
+        try:
+            owner = os.stat(path).st_uid
+        except OSError:
+            return False
+        if hasattr(os, 'getuid') and owner != os.getuid():
+            logger.warning("Ignoring browser state %s: it belongs to another user", path)
+            return False
+        return True
+    
+    async def _save_state(self, egress: Egress, context: 'BrowserContext', reason: str) -> None:
+        """Save a context's cookies and localStorage for the contexts created after it."""
+        path = self._state_path(egress)
+        if path is None:
+            return
+        try:
+            state = await context.storage_state()
+            os.makedirs(self._state_dir, mode=0o700, exist_ok=True)
+            # The state holds session cookies: readable by the owner only, and replaced in one step
+            temp_path = f"{path}.{os.getpid()}.tmp"
+            with open(os.open(temp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600), 'w', encoding='utf-8') as f:
+                json.dump(state, f)
+            os.replace(temp_path, path)
+        except Exception as e:
+            logger.warning("Could not save browser state to %s: %s", path, e)
+            return
+        self._saved_at[egress.name] = time.time()
+        BROWSER_STATE_SAVES.labels(self.source_name, reason).inc()
+        logger.debug("Saved browser state for %s (%s)", egress.name, reason)
+    
+    async def _open_search(self, page: 'Page', egress: Egress, context: 'BrowserContext') -> None:
+        """Navigate a page to the search form, accepting a cookie-consent wall on the way."""
+        logger.debug("Navigating to GoDaddy search page: %s", self._search_url)
+        with span('browser.goto', url=self._search_url):
+            response = await page.goto(self._search_url)
+        # Access denied or rate limited: this egress is refused by the site
+        if response is not None and response.status in (403, 429):
+            raise EgressBanned(f"{self._upstream} answered HTTP {response.status}")
+        
+        # Wait for the search input, or for the consent wall in front of it
+        with span('browser.wait_for_selector', selector=self.SEARCH_INPUT):
+            await page.wait_for_selector(f"{self.SEARCH_INPUT}, {BROWSER_CONSENT_SELECTOR}")
+        consent = await page.query_selector(BROWSER_CONSENT_SELECTOR)
+        if consent is not None and await consent.is_visible():
+            # No saved consent, or it expired: accept it and save the renewed state
+            logger.info("Accepting the consent wall of %s via %s", self._upstream, egress.name)
+            BROWSER_CONSENT_WALLS.labels(self.source_name).inc()
+            with span('browser.consent'):
+                await consent.click()
+                await page.wait_for_selector(self.SEARCH_INPUT)
+            await self._save_state(egress, context, 'consent')
+    
+    async def _take_page(self, egress: Egress, context: 'BrowserContext') -> 'Page':
+        """Return a page at the search form: a ready one if any, else a new page navigated there."""
+        ready = self._ready.get(egress.name)
+        while ready:
+            page = ready.pop()
+            if not page.is_closed():
+                BROWSER_READY_PAGES.labels(self.source_name, 'hit').inc()
+                return page
+            BROWSER_PAGES.labels(self.source_name).dec()
+        BROWSER_READY_PAGES.labels(self.source_name, 'miss').inc()
+        page = await self._new_page(context)
+        try:
+            await self._open_search(page, egress, context)
+        except BaseException:
+            await self._close_page(page)
+            raise
+        return page
+    
+    async def _new_page(self, context: 'BrowserContext') -> 'Page':
+        with span('browser.new_page'):
+            page = await context.new_page()
+        BROWSER_PAGES.labels(self.source_name).inc()
+        page.set_default_timeout(self._timeout)
+        return page
+    
+    async def _close_page(self, page: 'Page', domain: Optional[str] = None) -> None:
+        BROWSER_PAGES.labels(self.source_name).dec()
+        try:
+            await page.close()
+        except Exception as e:
+            logger.warning("Could not close page for %s: %s", domain, e, extra={'domain': domain})
+    
+    async def _release_page(self, page: 'Page', egress: Optional[Egress], context: Optional['BrowserContext'],
+                            reuse: bool, domain: str) -> None:
+        """After a check, bring its page back to the search form in the background, or close it."""
+        if (reuse and egress is not None and context is self._contexts.get(egress.name)
+                and len(self._ready.get(egress.name, ())) + self._recycling.get(egress.name, 0) < self._warm_pages):
+            self._recycling[egress.name] = self._recycling.get(egress.name, 0) + 1
+            self._spawn(self._recycle(page, egress, context))
+        else:
+            await self._close_page(page, domain)
+    
+    async def _recycle(self, page: Optional['Page'], egress: Egress, context: 'BrowserContext') -> None:
+        """Navigate a page (a new one when None) to the search form and keep it ready."""
+        try:
+            # The navigation leaves from the context's egress: count it against its budgets and health
+            async with self._egress_pool.lease(self._upstream, local_address=False, egress=egress) as lease:
+                await lease.wait()
+                if page is None:
+                    page = await self._new_page(context)
+                await self._open_search(page, egress, context)
+        except (Exception, asyncio.CancelledError) as e:
+            logger.debug("Could not keep a page ready via %s: %s", egress.name, e)
+            if page is not None:
+                await self._close_page(page)
+            if isinstance(e, asyncio.CancelledError):
+                raise
+            return
+        finally:
+            self._recycling[egress.name] = self._recycling.get(egress.name, 1) - 1
+        if context is self._contexts.get(egress.name):
+            self._ready.setdefault(egress.name, []).append(page)
+        else:
+            await self._close_page(page)
+    
+    def _spawn(self, coro) -> None:
+        task = asyncio.ensure_future(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+    
+    async def close(self) -> None:
+        await self._close_browser()
+    
     async def _close_browser(self):
         """Close the browser and clean up resources."""
         if self._browser:
             logger.info("Closing browser")
-            await self._context.close()
+            for task in list(self._tasks):
+                task.cancel()
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+            for pages in self._ready.values():
+                BROWSER_PAGES.labels(self.source_name).dec(len(pages))
+            for context in self._contexts.values():
+                await context.close()
             await self._browser.close()
             await self._playwright.stop()
+            BROWSER_INSTANCES.labels(self.source_name).dec()
             self._browser = None
-            self._context = None
+            self._contexts = {}
+            self._ready = {}
+            self._recycling = {}
             logger.info("Browser closed successfully")
     
     async def check_availability(self, domain: str) -> Dict[str, Any]:
         """Check domain availability using GoDaddy's website."""
+        from playwright.async_api import TimeoutError as PlaywrightTimeoutError
+        
         result = {
             'available': False,
             'confidence': 0.0,
@@ -83,63 +306,75 @@ class GoDaddyBrowserProvider(DomainSourceProvider):
             'error': None
         }
         
-        logger.info(f"Checking domain availability via GoDaddy Browser: {domain}")
+        logger.debug("Checking domain availability via GoDaddy Browser: %s", domain, extra={'domain': domain})
         
+        page = None
+        egress = context = None
+        succeeded = False
         try:
             # Initialize browser if needed
-            await self._initialize_browser()
-            
-            # Create a new page
-            page = await self._context.new_page()
-            
-            # Set default timeout
-            page.set_default_timeout(self._timeout)
-            
-            # Navigate to GoDaddy search page
-            logger.info(f"Navigating to GoDaddy search page: {self.SEARCH_URL}")
-            await page.goto(self.SEARCH_URL)
+            with span('browser.init'):
+                await self._initialize_browser()
             
-            # Wait for the search input to be available
-            logger.info("Waiting for search input field")
-            await page.wait_for_selector('input[name="domainToCheck"]')
+            # Browsers cannot bind a local address, so only the direct route and proxies are used
+            async with self._egress_pool.lease(self._upstream, local_address=False) as lease:
+                await lease.wait()
+                egress = lease.egress
+                context = await self._context_for(egress)
+                
+                # A page already at the search form skips the navigation
+                page = await self._take_page(egress, context)
             
-            # Clear any existing input and type the domain
-            await page.fill('input[name="domainToCheck"]', domain)
-            logger.info(f"Entered domain: {domain}")
+                # Clear any existing input and type the domain
+                with span('browser.fill'):
+                    await page.fill(self.SEARCH_INPUT, domain)
+                logger.debug("Entered domain: %s", domain, extra={'domain': domain})
             
-            # Click the search button
-            await page.click('button[type="submit"]')
-            logger.info("Clicked search button")
+                # Click the search button
+                with span('browser.click'):
+                    await page.click('button[type="submit"]')
+                logger.debug("Clicked search button", extra={'domain': domain})
             
-            # Wait for results to load
-            logger.info("Waiting for search results")
-            await page.wait_for_selector('.domain-search-results', timeout=self._timeout)
+                # Wait for results to load
+                logger.debug("Waiting for search results", extra={'domain': domain})
+                with span('browser.wait_for_selector', selector='.domain-search-results'):
+                    await page.wait_for_selector('.domain-search-results', timeout=self._timeout)
             
-            # Extract availability information
-            availability_info = await self._extract_availability_info(page, domain)
+                # Extract availability information
+                with span('browser.extract'):
+                    availability_info = await self._extract_availability_info(page, domain)
             
-            # Update result with extracted information
-            result.update(availability_info)
+                # Update result with extracted information
+                result.update(availability_info)
+                succeeded = True
             
-            # Close the page
-            await page.close()
+            # Keep the saved state as fresh as the live context
+            if time.time() - self._saved_at.get(egress.name, 0.0) > BROWSER_STATE_MAX_AGE:
+                await self._save_state(egress, context, 'refresh' if egress.name in self._saved_at else 'warm_up')
             
         except PlaywrightTimeoutError as e:
             error_msg = f"Timeout while checking domain {domain} via GoDaddy Browser: {str(e)}"
-            logger.error(error_msg)
+            logger.error(error_msg, extra={'domain': domain})
+            PROVIDER_ERRORS.labels(self.source_name, 'timeout').inc()
             result['error'] = error_msg
             result['confidence'] = 0.0
             
         except Exception as e:
             error_msg = f"Error checking domain {domain} via GoDaddy Browser: {str(e)}"
-            logger.error(error_msg)
+            logger.error(error_msg, extra={'domain': domain})
+            PROVIDER_ERRORS.labels(self.source_name, error_cause(e)).inc()
             result['error'] = error_msg
             result['confidence'] = 0.0
+        
+        finally:
+            # Keep the page for the next checks, or close it when the check failed
+            if page is not None:
+                await self._release_page(page, egress, context, succeeded, domain)
             
-        logger.info(f"Final GoDaddy Browser result for {domain}: {result}")
+        logger.debug("Final GoDaddy Browser result for %s: %s", domain, result, extra={'domain': domain})
         return result
     
-    async def _extract_availability_info(self, page: Page, domain: str) -> Dict[str, Any]:
+    async def _extract_availability_info(self, page: 'Page', domain: str) -> Dict[str, Any]:
         """Extract domain availability information from the GoDaddy search results page."""
         result = {
             'available': False,
@@ -156,7 +391,7 @@ class GoDaddyBrowserProvider(DomainSourceProvider):
             is_unavailable = await page.is_visible(unavailable_selector, timeout=5000)
             
             if is_available:
-                logger.info(f"Domain {domain} is available according to GoDaddy")
+                logger.debug("Domain %s is available according to GoDaddy", domain, extra={'domain': domain})
                 result['available'] = True
                 result['confidence'] = 0.9
                 
@@ -170,10 +405,10 @@ class GoDaddyBrowserProvider(DomainSourceProvider):
                         if price_match:
                             result['details']['price'] = price_match.group(1)
                 except Exception as e:
-                    logger.warning(f"Could not extract price for {domain}: {str(e)}")
+                    logger.warning("Could not extract price for %s: %s", domain, e, extra={'domain': domain})
                 
             elif is_unavailable:
-                logger.info(f"Domain {domain} is unavailable according to GoDaddy")
+                logger.debug("Domain %s is unavailable according to GoDaddy", domain, extra={'domain': domain})
                 result['available'] = False
                 result['confidence'] = 0.9
                 
@@ -185,9 +420,9 @@ class GoDaddyBrowserProvider(DomainSourceProvider):
                         result['details']['for_sale'] = True
                         result['details']['for_sale_info'] = for_sale_text.strip()
                 except Exception as e:
-                    logger.warning(f"Could not extract 'for sale' info for {domain}: {str(e)}")
+                    logger.warning("Could not extract 'for sale' info for %s: %s", domain, e, extra={'domain': domain})
             else:
-                logger.warning(f"Could not determine availability for {domain}")
+                logger.warning("Could not determine availability for %s", domain, extra={'domain': domain})
                 result['confidence'] = 0.5
                 result['details']['indeterminate'] = True
             
@@ -202,10 +437,10 @@ class GoDaddyBrowserProvider(DomainSourceProvider):
                 if suggestions:
                     result['details']['suggestions'] = suggestions
             except Exception as e:
-                logger.warning(f"Could not extract suggestions for {domain}: {str(e)}")
+                logger.warning("Could not extract suggestions for %s: %s", domain, e, extra={'domain': domain})
             
         except Exception as e:
-            logger.error(f"Error extracting availability info for {domain}: {str(e)}")
+            logger.error("Error extracting availability info for %s: %s", domain, e, extra={'domain': domain})
             result['confidence'] = 0.3
             
         return result
@@ -224,8 +459,11 @@ def create_godaddy_browser_provider(headless: bool = True, timeout: int = 30, ma
         timeout: Timeout in seconds for page operations
         max_retries: Maximum number of retry attempts for failed operations
         
+    The search page URL can be overridden with GODADDY_SEARCH_URL.
+        
     Returns:
         GoDaddyBrowserProvider instance
     """
-    logger.info(f"Creating GoDaddy Browser provider with headless={headless}, timeout={timeout}s")
-    return GoDaddyBrowserProvider(headless=headless, timeout=timeout, max_retries=max_retries)
+    logger.info("Creating GoDaddy Browser provider with headless=%s, timeout=%ss", headless, timeout)
+    return GoDaddyBrowserProvider(headless=headless, timeout=timeout, max_retries=max_retries,
+                                  search_url=os.environ.get('GODADDY_SEARCH_URL'))
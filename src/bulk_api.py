@@ -0,0 +1,355 @@
+"""
+Machine-to-machine bulk checks.
+Parses bulk requests (a JSON array or object, or NDJSON lines read as they arrive) into a
+list of domains and options, turns results into NDJSON lines, compresses the response stream with gzip or zstd
+as negotiated by the client, and keeps completed responses by idempotency key so a retried
+request replays them instead of checking again.
+"""
+
+import io
+import os
+import json
+import time
+import zlib
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Any, Optional, Iterable, Iterator, Tuple, FrozenSet
+
+from .preflight import Preflight, normalize_domain
+from .results import DomainResult, RESULTS_INCLUDE_RAW
+
+try:
+    import zstandard
+    ZSTD_AVAILABLE = True
+except ImportError:
+    ZSTD_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+# Largest number of domains accepted in one bulk request
+API_MAX_DOMAINS = int(os.environ.get('API_MAX_DOMAINS', '100000'))
+# Longest NDJSON line accepted, in bytes
+API_MAX_LINE = int(os.environ.get('API_MAX_LINE', '65536'))
+# Brand entries planned at a time while an NDJSON body is read
+_BRAND_CHUNK = 1000
+# Seconds a completed response is kept for replay by idempotency key
+IDEMPOTENCY_TTL = float(os.environ.get('IDEMPOTENCY_TTL', '86400'))
+# Memory used by responses kept for replay
+IDEMPOTENCY_MAX_BYTES = int(os.environ.get('IDEMPOTENCY_MAX_BYTES', str(64 * 1024 * 1024)))
+
+# Response encodings in order of preference
+ENCODINGS = ('zstd', 'gzip') if ZSTD_AVAILABLE else ('gzip',)
+
+
+class BulkRequestError(ValueError):
+    """Bulk request that cannot be parsed; the message is returned to the client."""
+
+
+class BodyReader(io.RawIOBase):
+    """Request body read in place, hashed as it is read to fingerprint the request."""
+
+    def __init__(self, stream: Any):
+        self._stream = stream
+        self._hash = hashlib.sha256()
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        data = self._stream.read(len(buffer))
+        if not data:
+            return 0
+        self._hash.update(data)
+        buffer[:len(data)] = data
+        return len(data)
+
+    def fingerprint(self, query: bytes) -> str:
+        """Hash identifying the request, once its body is read, to detect a reused idempotency key."""
+        return hashlib.sha256(query + b'\0' + self._hash.digest()).hexdigest()
+
+
+class BulkRequest:
+    """Domains and options of a bulk check."""
+
+    def __init__(self, domains: List[str], rejected: Dict[str, str], sources: Optional[FrozenSet[str]],
+                 deadline: Optional[float], max_age: float):
+        self.domains = domains
+        self.rejected = rejected
+        self.sources = sources
+        self.deadline = deadline
+        self.max_age = max_age
+
+
+def _list_option(value: Any, name: str) -> Optional[List[str]]:
+    if value is None:
+        return None
+    if isinstance(value, str):
+        value = value.split(',')
+    if not isinstance(value, list) or not all(isinstance(item, str) for item in value):
+        raise BulkRequestError(f"{name} must be a list of strings")
+    return [item.strip() for item in value if item.strip()]
+
+
+def _tld_option(value: Any, preflight: Preflight) -> Optional[List[str]]:
+    """TLDs of the "tlds" option as ".tld", in the form /upload-check accepts; unknown TLDs are an error."""
+    tlds = _list_option(value, 'tlds')
+    if tlds is None:
+        return None
+    tlds = list(dict.fromkeys('.' + tld.lstrip('.').lower() for tld in tlds if tld.lstrip('.')))
+    unknown = [tld for tld in tlds if tld not in preflight.tld_registry]
+    if unknown:
+        raise BulkRequestError(f"Unknown TLDs: {', '.join(unknown)}; "
+                               f"available: {', '.join(preflight.tld_registry.tlds())}")
+    return tlds
+
+
+def _number_option(value: Any, name: str) -> Optional[float]:
+    if value is None:
+        return None
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        raise BulkRequestError(f"{name} must be a number of seconds")
+    if number < 0:
+        raise BulkRequestError(f"{name} must not be negative")
+    return number
+
+
+def parse_items(body: io.BufferedReader, content_type: str) -> Tuple[Iterator[str], Dict[str, Any]]:
+    """
+    Split a request body into its entries and options.
+
+    JSON bodies are an array of entries or an object with "domains" and options, and are read
+    whole; NDJSON bodies have one entry per line, as a JSON string or an object with a "domain"
+    key, and their entries are read from the body as they are consumed.
+
+    Returns:
+        tuple: (entries, options)
+    """
+    if 'ndjson' in content_type or 'jsonl' in content_type:
+        return _ndjson_items(body), {}
+    try:
+        data = json.loads(body.read() or b'null')
+    except ValueError:
+        raise BulkRequestError("Body is not valid JSON")
+    if isinstance(data, list):
+        items, options = data, {}
+    elif isinstance(data, dict):
+        items, options = data.get('domains'), data
+    else:
+        raise BulkRequestError("Body must be a JSON array of domains or an object with domains")
+    if not isinstance(items, list) or not all(isinstance(item, str) for item in items):
+        raise BulkRequestError("domains must be a list of strings")
+    return iter(items), options
+
+
+def _ndjson_items(body: io.BufferedReader) -> Iterator[str]:
+    number = 0
+    while True:
+        line = body.readline(API_MAX_LINE + 1)
+        if not line:
+            return
+        number += 1
+        if len(line) > API_MAX_LINE:
+            raise BulkRequestError(f"Line {number} is longer than {API_MAX_LINE} bytes")
+        if not line.strip():
+            continue
+        try:
+            value = json.loads(line)
+        except ValueError:
+            raise BulkRequestError(f"Line {number} is not valid JSON")
+        if isinstance(value, dict):
+            value = value.get('domain')
+        if not isinstance(value, str):
+            raise BulkRequestError(f"Line {number} must be a string or an object with a domain")
+        yield value
+
+
+def build_request(items: Iterable[str], options: Dict[str, Any], preflight: Preflight, providers: Iterable[str],
+                  default_tlds: List[str], default_max_age: float) -> BulkRequest:
+    """
+    Turn entries and options into a deduplicated bulk check.
+
+    Entries with a dot are domains; the others are brand names checked on every TLD of the
+    "tlds" option (default: the default TLDs), given with or without their leading dot. Options are "tlds", "providers", "deadline"
+    (seconds) and "max_age" (seconds a stored result may be old and still be returned).
+    Entries are consumed one at a time, and reading stops as soon as the request has more
+    than API_MAX_DOMAINS domains.
+
+    Raises:
+        BulkRequestError: If the request is invalid
+    """
+    tlds = _tld_option(options.get('tlds'), preflight) or default_tlds
+    requested = _list_option(options.get('providers'), 'providers')
+    sources = None
+    if requested:
+        available = {name.lower(): name for name in providers}
+        unknown = [name for name in requested if name.lower() not in available]
+        if unknown:
+            raise BulkRequestError(f"Unknown providers: {', '.join(unknown)}; available: {', '.join(available.values())}")
+        sources = frozenset(name.lower() for name in requested)
+    deadline = _number_option(options.get('deadline'), 'deadline')
+    max_age = _number_option(options.get('max_age'), 'max_age')
+
+    domains: Dict[str, None] = {}
+    rejected: Dict[str, str] = {}
+    brands = []
+
+    def plan_brands():
+        for domain, reason in preflight.plan_domains(brands, tlds):
+            if domain not in domains:
+                domains[domain] = None
+                if reason is not None:
+                    rejected[domain] = reason
+        brands.clear()
+
+    for item in items:
+        item = item.strip()
+        if not item:
+            continue
+        if '.' in item:
+            domain = normalize_domain(item)
+            if domain not in domains:
+                domains[domain] = None
+                reason = preflight.validate(domain)
+                if reason is not None:
+                    rejected[domain] = reason
+        else:
+            brands.append(item)
+            if len(brands) >= _BRAND_CHUNK:
+                plan_brands()
+        if len(domains) > API_MAX_DOMAINS:
+            break
+    plan_brands()
+    if len(domains) > API_MAX_DOMAINS:
+        raise BulkRequestError(f"At most {API_MAX_DOMAINS} domains are accepted per request")
+    return BulkRequest(list(domains), rejected, sources, deadline,
+                       max_age if max_age is not None else default_max_age)
+
+
+def result_line(domain: str, result: Optional[DomainResult], error: Optional[str]) -> Dict[str, Any]:
+    """NDJSON line of a result; stored results carry cached=true and their checked_at."""
+    if result is None:
+        return {'domain': domain, 'available': None, 'confidence': 0.0, 'status': 'error', 'error': error,
+                'cached': False}
+    line = {'domain': domain}
+    line.update(result.to_dict(RESULTS_INCLUDE_RAW))
+    line['cached'] = result.checked_at is not None
+    return line
+
+
+def negotiate_encoding(accept_encodings) -> Optional[str]:
+    """Best encoding the client accepts (a werkzeug Accept header), or None for identity."""
+    return accept_encodings.best_match(ENCODINGS)
+
+
+def compress_stream(chunks: Iterable[bytes], encoding: Optional[str]) -> Iterator[bytes]:
+    """Compress a stream of chunks, flushing after each one so the client can decode it right away."""
+    if encoding is None:
+        yield from chunks
+        return
+    if encoding == 'zstd':
+        compressor = zstandard.ZstdCompressor(level=3).compressobj()
+        block = zstandard.COMPRESSOBJ_FLUSH_BLOCK
+        finish = compressor.flush
+    else:
+        compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+        block = zlib.Z_SYNC_FLUSH
+        finish = compressor.flush
+    for chunk in chunks:
+        data = compressor.compress(chunk) + compressor.flush(block)
+        if data:
+            yield data
+    yield finish()
+
+
+
+class IdempotencyStore:
+    """
+    Bulk responses kept by (tenant, idempotency key).
+
+    A request starts an entry, its NDJSON lines are appended as they are streamed, and the
+    entry is kept for replay once the response completed; an interrupted response drops
+    its entry so the retry runs again. Entries expire after `ttl` seconds, and the oldest
+    are dropped when the stored lines exceed `max_bytes`.
+    """
+
+    NEW, REPLAY, IN_PROGRESS, MISMATCH = 'new', 'replay', 'in_progress', 'mismatch'
+
+    def __init__(self, ttl: float = IDEMPOTENCY_TTL, max_bytes: int = IDEMPOTENCY_MAX_BYTES):
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._entries: 'OrderedDict[Tuple[str, str], Dict[str, Any]]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def begin(self, tenant: str, key: str, fingerprint: str) -> Tuple[str, Optional[List[bytes]]]:
+        """
+        Claim a key for a request.
+
+        Returns:
+            tuple: (NEW, None) to run the request, (REPLAY, lines) to replay a completed response,
+            or (IN_PROGRESS | MISMATCH, None) when the key is taken
+        """
+        now = time.time()
+        with self._lock:
+            self._expire(now)
+            entry = self._entries.get((tenant, key))
+            if entry is None:
+                self._entries[(tenant, key)] = {'fingerprint': fingerprint, 'done': False, 'lines': [], 'size': 0,
+                                                'created': now}
+                return self.NEW, None
+            if entry['fingerprint'] != fingerprint:
+                return self.MISMATCH, None
+            if not entry['done']:
+                return self.IN_PROGRESS, None
+            return self.REPLAY, list(entry['lines'])
+
+    def append(self, tenant: str, key: str, line: bytes) -> None:
+        """Store a line of a running response."""
+        with self._lock:
+            entry = self._entries.get((tenant, key))
+            if entry is not None and entry['lines'] is not None:
+                entry['lines'].append(line)
+                entry['size'] += len(line)
+                self.size += len(line)
+                if entry['size'] > self.max_bytes:
+                    # Too large to replay; the retry of this request runs again
+                    self.size -= entry['size']
+                    entry['lines'] = None
+
+    def finish(self, tenant: str, key: str) -> None:
+        """Mark a response complete, or drop it when it could not be kept."""
+        with self._lock:
+            entry = self._entries.get((tenant, key))
+            if entry is None:
+                return
+            if entry['lines'] is None:
+                del self._entries[(tenant, key)]
+                return
+            entry['done'] = True
+            while self.size > self.max_bytes:
+                _, oldest = self._entries.popitem(last=False)
+                self.size -= oldest['size'] if oldest['lines'] is not None else 0
+
+    def abort(self, tenant: str, key: str) -> None:
+        """Drop the entry of an interrupted response."""
+        with self._lock:
+            entry = self._entries.pop((tenant, key), None)
+            if entry is not None and entry['lines'] is not None:
+                self.size -= entry['size']
+
+    def _expire(self, now: float) -> None:
+        while self._entries:
+            key, entry = next(iter(self._entries.items()))
+            if now - entry['created'] < self.ttl:
+                break
+            del self._entries[key]
+            if entry['lines'] is not None:
+                self.size -= entry['size']
+
+
+# Process-wide store of replayable bulk responses
+idempotency_store = IdempotencyStore()
@@ -0,0 +1,138 @@
+"""
+Process pool for CPU-bound steps.
+Checks run on one event loop thread, and request handlers share the same interpreter, so
+parsing python-whois answers or rendering a PDF report holds the GIL long enough to delay
+every query in flight. Those steps are submitted to a pool of worker processes instead.
+Tasks are module-level functions taking and returning plain data (strings, dicts, bytes),
+so only compact inputs and outputs cross the process boundary.
+The pool starts on the first task rather than at import. Its workers come from a fork
+server by default, a clean single-threaded process, so it does not matter that the web
+process already runs its event loop and logging threads by then.
+With CPU_POOL_WORKERS=0 the steps run in threads of the calling process, as before.
+"""
+
+import os
+import time
+import atexit
+import asyncio
+import logging
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Optional
+
+from .metrics import CPU_POOL_TASKS, CPU_POOL_DURATION
+
+logger = logging.getLogger(__name__)
+
+# Worker processes of the pool (0 runs CPU-bound steps in threads of the web process)
+CPU_POOL_WORKERS = int(os.environ.get('CPU_POOL_WORKERS', str(min(4, os.cpu_count() or 1))))
+# How workers are started; forkserver forks them from a clean process, fork copies the
+# (threaded) web process and is only safe before its threads start, spawn is slowest
+CPU_POOL_START_METHOD = os.environ.get(
+    'CPU_POOL_START_METHOD', 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn')
+
+_pool: Optional[ProcessPoolExecutor] = None
+_lock = threading.Lock()
+
+
+def _init_worker() -> None:
+    from .logging_config import configure_child_logging
+    configure_child_logging()
+
+
+def _noop() -> None:
+    pass
+
+
+def get_cpu_pool() -> Optional[ProcessPoolExecutor]:
+    """Return the shared process pool, creating it on first use (None when disabled)."""
+    global _pool
+    if CPU_POOL_WORKERS <= 0:
+        return None
+    with _lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(CPU_POOL_WORKERS, multiprocessing.get_context(CPU_POOL_START_METHOD),
+                                        initializer=_init_worker)
+            logger.info("Started CPU pool with %d %s workers", CPU_POOL_WORKERS, CPU_POOL_START_METHOD)
+        return _pool
+
+
+def start_cpu_pool() -> None:
+    """
+    Start the pool's workers now rather than on the first CPU-bound step.
+
+    With CPU_POOL_START_METHOD=fork, call it before any thread starts (logging included),
+    since forked workers copy the process as it is.
+    """
+    pool = get_cpu_pool()
+    if pool is not None:
+        pool.submit(_noop).result()
+
+
+def _discard(pool: ProcessPoolExecutor) -> None:
+    """Drop a broken pool (a worker died) so the next task starts a new one."""
+    global _pool
+    with _lock:
+        if _pool is pool:
+            _pool = None
+    logger.warning("CPU pool broken, starting a new one")
+
+
+async def run_cpu(func: Callable[..., Any], *args: Any) -> Any:
+    """
+    Run a CPU-bound function in the process pool from the event loop.
+
+    Args:
+        func: Module-level function (workers import it by name)
+        args: Picklable arguments
+
+    Returns:
+        The function's return value
+    """
+    loop = asyncio.get_running_loop()
+    pool = get_cpu_pool()
+    start = time.perf_counter()
+    try:
+        try:
+            return await loop.run_in_executor(pool, func, *args)
+        except BrokenProcessPool:
+            _discard(pool)
+            return await loop.run_in_executor(None, func, *args)
+    finally:
+        _observe(func, start, pool)
+
+
+def call_cpu(func: Callable[..., Any], *args: Any) -> Any:
+    """Run a CPU-bound function in the process pool from a synchronous caller (a request thread)."""
+    pool = get_cpu_pool()
+    start = time.perf_counter()
+    try:
+        if pool is None:
+            return func(*args)
+        try:
+            return pool.submit(func, *args).result()
+        except BrokenProcessPool:
+            _discard(pool)
+            return func(*args)
+    finally:
+        _observe(func, start, pool)
+
+
+def _observe(func: Callable[..., Any], start: float, pool: Optional[ProcessPoolExecutor]) -> None:
+    task = func.__name__.lstrip('_')
+    CPU_POOL_TASKS.labels(task, 'process' if pool is not None else 'thread').inc()
+    CPU_POOL_DURATION.labels(task).observe(time.perf_counter() - start)
+
+
+def shutdown_cpu_pool() -> None:
+    """Stop the workers."""
+    global _pool
+    with _lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+atexit.register(shutdown_cpu_pool)
@@ -3,17 +3,33 @@ Multi-source domain availability checker core implementation.
 This module provides the foundation for checking domain availability from multiple sources.
 """
 
+import os
 import abc
 import asyncio
 import time
-import re
+import json
 import whois
 import logging
-from typing import Dict, List, Any, Optional, Tuple
+from urllib.parse import urlsplit
+from typing import Dict, List, Any, Optional, Tuple, FrozenSet
+
+from .scheduler import FairScheduler, Priority, SlotRequest, DEFAULT_TENANT, create_scheduler
+from .tld_registry import TldRegistry, get_tld_registry
+from .history_store import HistoryStore, get_history_store
+from .preflight import normalize_domain
+from .rate_limiter import RateLimiter, rate_limiter
+from .egress import (EgressPool, Egress, EgressBanned, HttpSessions, SendClock, get_egress_pool, is_ban_response,
+                     mark_sent)
+from .adaptive_limiter import AdaptiveLimits, adaptive_limits, classify_error, OK
+from .hedging import Hedger, hedger as default_hedger
+from .rdap import query_rdap, rdap_details, rdap_url
+from .cpu_pool import run_cpu
+from .whois_parsers import get_parser, query_whois
+from .metrics import (CHECKS, CHECKS_IN_PROGRESS, CHECK_LATENCY, PROVIDER_LATENCY, PROVIDER_TLD_LATENCY,
+                      PROVIDER_ERRORS, SCHEDULER_QUEUED, SCHEDULER_RUNNING, error_cause)
+from .tracing import tracer, span
+from .results import Status, SourceResult, DomainResult
 
-# Configure logging
-logging.basicConfig(level=logging.INFO, 
-                   format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
 class DomainSourceProvider(abc.ABC):
@@ -49,14 +65,64 @@ class DomainSourceProvider(abc.ABC):
     def weight(self) -> float:
         """Return the weight of this source in the reconciliation algorithm."""
         pass
+    
+    @property
+    def registrar(self) -> bool:
+        """Whether this source is a registrar, whose answers win conflicts under registrar priority."""
+        return True
+    
+    def upstream(self, domain: str) -> str:
+        """Server answering for the domain; adaptive concurrency limits are kept per upstream."""
+        return self.source_name
+    
+    async def close(self) -> None:
+        """Release the provider's connections and other resources."""
+        pass
 
 
 class WhoisProvider(DomainSourceProvider):
-    """Domain availability provider using WHOIS protocol."""
+    """
+    Domain availability provider using WHOIS protocol.
+    
+    TLDs with a known WHOIS host are queried directly over port 43, through an egress of
+    the shared pool, and parsed by the registry's native parser; other TLDs fall back to
+    python-whois on the direct route. A native query that is slow compared to the host's
+    recent latencies is hedged to the registry's RDAP endpoint or the TLD's second WHOIS
+    host, whichever answers first wins.
+    """
     
-    def __init__(self):
+    # Query rate used for TLDs missing from the registry
+    DEFAULT_QUERY_RATE = 2.0
+    # Egresses tried for a query when the WHOIS server refuses the first one
+    EGRESS_ATTEMPTS = 2
+    
+    def __init__(self, tld_registry: Optional[TldRegistry] = None, limiter: Optional[RateLimiter] = None,
+                 parse_details: Optional[bool] = None, timeout: float = 10.0,
+                 egress_pool: Optional[EgressPool] = None, hedger: Optional[Hedger] = None):
+        """
+        Initialize the WHOIS provider.
+        
+        Args:
+            tld_registry: TLD metadata (WHOIS hosts, query rates, not-found patterns)
+            limiter: Rate limiter shared with other providers
+            parse_details: Whether to parse registrar, status and dates of registered
+                domains (default from WHOIS_PARSE_DETAILS, true)
+            timeout: Timeout in seconds of a native WHOIS query
+            egress_pool: Source addresses and proxies WHOIS queries are spread over
+            hedger: Decides when slow queries are duplicated to an equivalent endpoint
+        """
         self._source_name = "WHOIS"
         self._weight = 0.6  # Lower weight than registrar APIs
+        self._tld_registry = tld_registry if tld_registry is not None else get_tld_registry()
+        self._rate_limiter = limiter if limiter is not None else rate_limiter
+        self._egress_pool = egress_pool if egress_pool is not None else get_egress_pool()
+        self._hedger = hedger if hedger is not None else default_hedger
+        if parse_details is None:
+            parse_details = os.environ.get('WHOIS_PARSE_DETAILS', 'true').lower() == 'true'
+        self._parse_details = parse_details
+        self._timeout = timeout
+        # Pooled connections of the RDAP queries, per egress source address
+        self._sessions = HttpSessions()
     
     @property
     def source_name(self) -> str:
@@ -66,6 +132,17 @@ class WhoisProvider(DomainSourceProvider):
     def weight(self) -> float:
         return self._weight
     
+    @property
+    def registrar(self) -> bool:
+        return False
+    
+    def upstream(self, domain: str) -> str:
+        _, tld_info = self._tld_registry.split(domain)
+        return tld_info.whois_host if tld_info is not None and tld_info.whois_host else 'whois'
+    
+    async def close(self) -> None:
+        await self._sessions.close()
+    
     async def check_availability(self, domain: str) -> Dict[str, Any]:
         """Check domain availability using WHOIS."""
         result = {
@@ -77,35 +154,135 @@ class WhoisProvider(DomainSourceProvider):
         }
         
         try:
-            # Add a small delay to avoid rate limiting
-            await asyncio.sleep(0.5)
+            _, tld_info = self._tld_registry.split(domain)
+            if tld_info is not None and tld_info.whois_host:
+                host = tld_info.whois_host
+                answer, endpoint = await self._hedger.run(
+                    self.source_name, host, lambda: self._query_host(domain, tld_info, host, dict(result)),
+                    self._alternate(domain, tld_info, result))
+                if endpoint != host:
+                    answer['details']['answered_by'] = endpoint
+                return answer
             
-            # Query WHOIS
-            domain_info = whois.whois(domain)
+            with span('whois.rate_limit'):
+                await self._rate_limiter.acquire('whois', self.DEFAULT_QUERY_RATE)
+            mark_sent()
             
-            # Process the result
-            if domain_info.status is None or domain_info.domain_name is None:
-                result['available'] = True
-                result['confidence'] = 0.7  # Moderate confidence for available domains
-                result['details'] = {'raw_response': str(domain_info)}
-            else:
-                result['available'] = False
-                result['confidence'] = 0.8  # Higher confidence for unavailable domains
-                result['details'] = {
-                    'status': str(domain_info.status),
-                    'registrar': str(domain_info.registrar),
-                    'creation_date': str(domain_info.creation_date),
-                    'expiration_date': str(domain_info.expiration_date),
-                    'raw_response': str(domain_info)
-                }
+            # Query WHOIS in a worker thread so the shared event loop keeps running, and parse
+            # the answer in the CPU pool so it does not hold the GIL
+            loop = asyncio.get_running_loop()
+            with span('whois.python_whois'):
+                text = await loop.run_in_executor(None, _python_whois_query, domain)
+            with span('whois.python_whois_parse'):
+                result['available'], result['details'] = await run_cpu(_python_whois_parse, domain, text)
+            # Higher confidence for unavailable domains
+            result['confidence'] = 0.7 if result['available'] else 0.8
                 
         except Exception as e:
-            error_msg = f"Error checking domain {domain} via WHOIS: {str(e)}"
-            logger.error(error_msg)
+            error_msg = f"Error checking domain {domain} via WHOIS: {str(e) or type(e).__name__}"
+            logger.error(error_msg, extra={'domain': domain, 'provider': self.source_name})
+            PROVIDER_ERRORS.labels(self.source_name, error_cause(e)).inc()
             result['confidence'] = 0.3  # Low confidence due to error
             result['error'] = error_msg
             
         return result
+    
+    def _alternate(self, domain: str, tld_info, result: Dict[str, Any]):
+        """(endpoint, query factory) equivalent to the TLD's primary WHOIS host, or None."""
+        if not self._hedger.enabled:
+            return None
+        if tld_info.rdap_base_url:
+            url = rdap_url(tld_info.rdap_base_url, domain)
+            return urlsplit(url).netloc, lambda: self._check_rdap(domain, tld_info, url, dict(result))
+        if len(tld_info.whois_hosts) > 1:
+            host = tld_info.whois_hosts[1]
+            return host, lambda: self._query_host(domain, tld_info, host, dict(result))
+        return None
+    
+    async def _query_host(self, domain: str, tld_info, host: str, result: Dict[str, Any]) -> Dict[str, Any]:
+        """Query a WHOIS host of the TLD through the egress pool, from another egress if one is refused."""
+        for attempt in range(self.EGRESS_ATTEMPTS):
+            try:
+                # The safe query rate of the TLD's WHOIS server applies per source address
+                async with self._egress_pool.lease(host, tld_info.query_rate, tld_info.burst,
+                                                   self._rate_limiter) as lease:
+                    with span('whois.rate_limit', egress=lease.egress.name):
+                        await lease.wait()
+                    return await self._check_native(domain, tld_info, result, lease.egress, host)
+            except EgressBanned:
+                # The banned egress is out of rotation now; ask again from another one
+                if attempt + 1 == self.EGRESS_ATTEMPTS or len(self._egress_pool.egresses) == 1:
+                    raise
+    
+    async def _check_rdap(self, domain: str, tld_info, url: str, result: Dict[str, Any]) -> Dict[str, Any]:
+        """Look the domain up on the registry's RDAP endpoint."""
+        upstream = urlsplit(url).netloc
+        async with self._egress_pool.lease(upstream, tld_info.query_rate, tld_info.burst,
+                                           self._rate_limiter) as lease:
+            with span('whois.rate_limit', egress=lease.egress.name):
+                await lease.wait()
+            with span('whois.rdap', url=url):
+                available, data = await query_rdap(url, self._timeout, lease.egress, self._sessions)
+        
+        result['available'] = available
+        if available:
+            result['confidence'] = 0.7  # Moderate confidence for available domains
+            result['details'] = {}
+        else:
+            result['confidence'] = 0.8  # Higher confidence for unavailable domains
+            result['details'] = rdap_details(data) if self._parse_details else {}
+            result['details']['raw_response'] = json.dumps(data)
+        return result
+    
+    async def _check_native(self, domain: str, tld_info, result: Dict[str, Any],
+                            egress: Optional[Egress] = None, host: Optional[str] = None) -> Dict[str, Any]:
+        """Query a WHOIS server of the TLD directly and classify the answer with its native parser."""
+        host = host or tld_info.whois_host
+        parser = get_parser(host, tld_info.not_found_patterns, tld_info.whois_parser)
+        with span('whois.query', host=host):
+            text = await query_whois(host, domain, parser, self._timeout, egress)
+        with span('whois.parse', parser=parser.name):
+            parsed = parser.parse(text)
+        
+        if parsed.available is None:
+            if is_ban_response(text):
+                raise EgressBanned(f"{host} refused the query: {text[:200].strip()!r}")
+            raise ValueError(f"Unrecognized response from {host}: {text[:200].strip()!r}")
+        
+        if parsed.available:
+            result['available'] = True
+            result['confidence'] = 0.7  # Moderate confidence for available domains
+            result['details'] = {'raw_response': text}
+        else:
+            result['available'] = False
+            result['confidence'] = 0.8  # Higher confidence for unavailable domains
+            # Fields are only parsed when details are wanted
+            with span('whois.parse_details'):
+                result['details'] = parsed.details() if self._parse_details else {}
+            result['details']['raw_response'] = text
+        return result
+
+
+def _python_whois_query(domain: str) -> str:
+    """Query the WHOIS server python-whois picks for the domain (blocking)."""
+    text = whois.NICClient().whois_lookup(None, whois.extract_domain(domain), 0)
+    if not text:
+        raise whois.WhoisError("Whois command returned no output")
+    return text
+
+
+def _python_whois_parse(domain: str, text: str) -> Tuple[bool, Dict[str, Any]]:
+    """Parse a python-whois answer into (available, details); runs in the CPU pool."""
+    domain_info = whois.WhoisEntry.load(whois.extract_domain(domain), text)
+    if domain_info.status is None or domain_info.domain_name is None:
+        return True, {'raw_response': str(domain_info)}
+    return False, {
+        'status': str(domain_info.status),
+        'registrar': str(domain_info.registrar),
+        'creation_date': str(domain_info.creation_date),
+        'expiration_date': str(domain_info.expiration_date),
+        'raw_response': str(domain_info)
+    }
 
 
 class DomainChecker:
@@ -114,237 +291,236 @@ class DomainChecker:
     and reconciles the results.
     """
     
-    def __init__(self):
+    def __init__(self, scheduler: Optional[FairScheduler] = None, tld_registry: Optional[TldRegistry] = None,
+                 history: Optional[HistoryStore] = None, limits: Optional[AdaptiveLimits] = None):
         self.providers = []
+        # Shares check capacity between priority classes and tenants
+        self.scheduler = scheduler if scheduler is not None else create_scheduler()
+        # Per-TLD rules used to reject invalid domains and pick providers
+        self.tld_registry = tld_registry if tld_registry is not None else get_tld_registry()
+        # Records every completed check when HISTORY_DB_PATH is set
+        self.history = history if history is not None else get_history_store()
+        # Adaptive in-flight limit per provider upstream
+        self.limits = limits if limits is not None else adaptive_limits
+        # Reconciler for the current providers, rebuilt when they change
+        self._reconciler = None
+        self._reconciler_key = None
         # Add the WHOIS provider by default
-        self.add_provider(WhoisProvider())
+        self.add_provider(WhoisProvider(self.tld_registry))
+        
+        # Scheduler occupancy is read when metrics are collected
+        for priority in Priority:
+            name = priority.name.lower()
+            SCHEDULER_QUEUED.labels(name).set_function(lambda n=name: self.scheduler.stats()['queued_by_class'][n])
+            SCHEDULER_RUNNING.labels(name).set_function(lambda n=name: self.scheduler.stats()['running_by_class'][n])
     
     def add_provider(self, provider: DomainSourceProvider) -> None:
         """Add a domain source provider to the checker."""
         self.providers.append(provider)
-        logger.info(f"Added provider: {provider.source_name} with weight {provider.weight}")
+        logger.info("Added provider: %s with weight %s", provider.source_name, provider.weight)
+    
+    async def close(self) -> None:
+        """Close every provider's connections."""
+        for provider in self.providers:
+            try:
+                await provider.close()
+            except Exception as e:
+                logger.warning("Could not close provider %s: %s", provider.source_name, e)
     
-    async def check_domain(self, domain: str) -> Dict[str, Any]:
+    async def check_domain(self, domain: str, priority: Priority = Priority.INTERACTIVE,
+                           tenant: str = DEFAULT_TENANT, sources: Optional[FrozenSet[str]] = None,
+                           request: Optional[SlotRequest] = None) -> DomainResult:
         """
         Check domain availability across all providers and reconcile results.
         
         Args:
             domain (str): The domain to check
+            priority: Scheduling class of the check
+            tenant: Client or tenant the check is accounted to
+            sources: Lowercase source names of the providers to use (default: all)
+            request: Slot claim through which coalesced callers can promote the check (overrides priority)
             
         Returns:
-            dict: Reconciled result with all source details
+            DomainResult: Reconciled result with all source results
         """
         # Normalize domain
         domain = self._normalize_domain(domain)
         
-        # Log providers being used
-        provider_names = [p.source_name for p in self.providers]
-        logger.info(f"Checking domain {domain} with providers: {', '.join(provider_names)}")
+        with span('check_domain', domain=domain, priority=priority.name.lower(), tenant=tenant) as root:
+            # Reject obviously invalid domains before using any capacity
+            invalid_reason = self.tld_registry.validate(domain)
+            if invalid_reason is not None:
+                logger.info("Rejected invalid domain %s: %s", domain, invalid_reason, extra={'domain': domain})
+                CHECKS.labels(Status.INVALID.value).inc()
+                result = DomainResult.invalid(invalid_reason)
+            else:
+                # Wait for a check slot before using any WHOIS or browser capacity
+                with span('scheduler.wait'):
+                    granted = await self.scheduler.acquire(priority, tenant, request)
+                CHECKS_IN_PROGRESS.inc()
+                try:
+                    with CHECK_LATENCY.time():
+                        result = await self._check_domain(domain, sources)
+                finally:
+                    CHECKS_IN_PROGRESS.dec()
+                    self.scheduler.release(granted, tenant)
+                CHECKS.labels(result.status.value).inc()
+                if self.history is not None:
+                    self.history.record(domain, result)
+            root.set_attribute('status', result.status.value)
         
-        # Check with all providers in parallel
-        tasks = [provider.check_availability(domain) for provider in self.providers]
-        results = await asyncio.gather(*tasks, return_exceptions=True)
+        # Compact span breakdown for debugging, available once the root span has ended
+        if tracer.timings:
+            result.timings = root.timings()
+        return result
+    
+    async def _check_domain(self, domain: str, sources: Optional[FrozenSet[str]] = None) -> DomainResult:
+        """Check a normalized, valid domain with its providers once a scheduler slot is held."""
+        providers = self._providers_for(domain, sources)
         
-        # Process results, handling any exceptions
-        processed_results = []
-        for i, result in enumerate(results):
-            if isinstance(result, Exception):
-                logger.error(f"Provider {self.providers[i].source_name} raised exception: {str(result)}")
-                processed_results.append({
-                    'available': None,
-                    'confidence': 0.0,
-                    'source': self.providers[i].source_name,
-                    'details': {},
-                    'error': str(result)
-                })
-            else:
-                processed_results.append(result)
-                logger.info(f"Result from {self.providers[i].source_name} for {domain}: available={result.get('available')}, confidence={result.get('confidence')}, error={result.get('error')}")
+        # Per-step details are DEBUG; one INFO line per domain summarizes the check
+        debug = logger.isEnabledFor(logging.DEBUG)
+        if debug:
+            logger.debug("Checking domain %s with providers: %s", domain,
+                         ', '.join(p.source_name for p in providers), extra={'domain': domain})
+        
+        # Check with all providers in parallel
+        _, tld_info = self.tld_registry.split(domain)
+        tld = tld_info.tld if tld_info is not None else 'unknown'
+        tasks = [self._timed_check(provider, domain, tld) for provider in providers]
+        processed_results = await asyncio.gather(*tasks)
+        if debug:
+            for result in processed_results:
+                logger.debug("Result from %s for %s: available=%s, confidence=%s, error=%s",
+                             result.source, domain, result.available, result.confidence, result.error,
+                             extra={'domain': domain})
         
         # Reconcile the results
-        reconciled = self._reconcile_results(processed_results)
+        with span('reconcile'):
+            reconciled = self._reconcile_results(processed_results)
         
         # Add all source results for transparency
-        reconciled['sources'] = processed_results
+        reconciled.sources = tuple(processed_results)
         
-        # Log the reconciled result
-        logger.info(f"Reconciled result for {domain}: {reconciled}")
+        # Log the reconciled result; the full result only at DEBUG
+        logger.info("Checked %s: %s (confidence %.2f)", domain, reconciled.status.value, reconciled.confidence,
+                    extra={'domain': domain, 'status': reconciled.status.value})
+        if debug:
+            logger.debug("Reconciled result for %s: %s", domain, reconciled, extra={'domain': domain})
         
         return reconciled
     
+    async def _timed_check(self, provider: DomainSourceProvider, domain: str, tld: str) -> SourceResult:
+        """
+        Run a provider check within its upstream's adaptive limit, recording its latency;
+        an exception it raises becomes an error result. The limit adapts to the upstream's
+        own latency, from the send (see SendClock), so queueing behind our rate budgets does
+        not read as the upstream slowing down.
+        """
+        limiter = self.limits.get(provider.source_name, provider.upstream(domain))
+        with span(f"provider.{provider.source_name}", provider=provider.source_name, tld=tld) as provider_span:
+            with span('adaptive_limit.wait', limit=int(limiter.limit)):
+                started = await limiter.acquire()
+            start = time.perf_counter()
+            clock = SendClock()
+            try:
+                with clock.tracking():
+                    result, error = await provider.check_availability(domain), None
+            except Exception as e:
+                result, error = None, e
+            except BaseException:
+                limiter.release(None, OK)
+                raise
+            elapsed = time.perf_counter() - start
+            if error is not None:
+                cause = error_cause(error)
+                limiter.release(started, cause if cause in ('timeout', 'connection') else classify_error(str(error)))
+            else:
+                upstream_latency = time.monotonic() - clock.sent_at if clock.sent_at is not None else None
+                limiter.release(started, classify_error(result.get('error')), upstream_latency)
+            PROVIDER_LATENCY.labels(provider.source_name).observe(elapsed)
+            PROVIDER_TLD_LATENCY.labels(provider.source_name, tld).observe(elapsed)
+            
+            if error is not None:
+                # Errors providers catch themselves are counted by the providers
+                PROVIDER_ERRORS.labels(provider.source_name, error_cause(error)).inc()
+                logger.error("Provider %s raised exception: %s", provider.source_name, error,
+                             extra={'domain': domain, 'provider': provider.source_name})
+                provider_span.set_error(f"{type(error).__name__}: {error}")
+                return SourceResult.from_exception(domain, provider.source_name, error, elapsed)
+            if result.get('error'):
+                provider_span.set_error(result['error'])
+            return SourceResult.from_provider(domain, result, latency=elapsed)
+    
+    def _providers_for(self, domain: str, sources: Optional[FrozenSet[str]] = None) -> List[DomainSourceProvider]:
+        """
+        Return the providers able to answer for the domain's TLD (all of them if none is listed),
+        among the requested sources if any.
+        """
+        candidates = self.providers
+        if sources is not None:
+            candidates = [p for p in self.providers if p.source_name.lower() in sources] or self.providers
+        _, tld_info = self.tld_registry.split(domain)
+        if tld_info is None:
+            return candidates
+        providers = [p for p in candidates if tld_info.supports(p.source_name)]
+        return providers or candidates
+    
     def _normalize_domain(self, domain: str) -> str:
         """Normalize domain name for checking."""
-        # Convert to lowercase
-        domain = domain.lower()
-        
-        # Remove any protocol prefixes
-        domain = re.sub(r'^https?://', '', domain)
-        
-        # Remove www. prefix if present
-        domain = re.sub(r'^www\.', '', domain)
-        
-        # Remove any trailing paths
-        domain = domain.split('/')[0]
-        
-        return domain
+        return normalize_domain(domain)
     
-    def _reconcile_results(self, results: List[Dict[str, Any]]) -> Dict[str, Any]:
+    @property
+    def reconciler(self) -> 'Reconciler':
+        """Reconciler with the weight and role of each provider's source, looked up by name."""
+        key = (id(self.providers), len(self.providers))
+        if self._reconciler is None or self._reconciler_key != key:
+            # NumPy is loaded on the first reconciliation rather than at import
+            from .reconciliation import Reconciler
+            weights, registrars = {}, {}
+            for provider in self.providers:
+                # The first provider with a source name decides its weight
+                weights.setdefault(provider.source_name, provider.weight)
+                registrars.setdefault(provider.source_name, provider.registrar)
+            self._reconciler = Reconciler(weights, registrars)
+            self._reconciler_key = key
+        return self._reconciler
+    
+    def _reconcile_results(self, results: List[SourceResult]) -> DomainResult:
         """
-        Reconcile results from multiple sources using a weighted algorithm.
+        Reconcile results from multiple sources under the configured policy.
         
         Args:
             results: List of results from different providers
             
         Returns:
-            dict: Reconciled result
+            DomainResult: Reconciled result, without its sources
         """
-        # Initialize the reconciled result
-        reconciled = {
-            'available': None,
-            'confidence': 0.0,
-            'sources_checked': len(results),
-            'sources_with_errors': 0,
-            'conflicting_results': False
-        }
-        
-        # Count errors
-        errors = [r for r in results if r['error'] is not None]
-        reconciled['sources_with_errors'] = len(errors)
-        
-        # If all sources had errors, we can't determine availability
-        if len(errors) == len(results):
-            reconciled['available'] = None
-            reconciled['confidence'] = 0.0
-            reconciled['status'] = 'unknown'
-            logger.warning(f"All sources had errors, cannot determine availability")
-            return reconciled
-        
-        # Filter out error results
-        valid_results = [r for r in results if r['error'] is None]
-        logger.info(f"Valid results for reconciliation: {[(r['source'], r['available']) for r in valid_results]}")
-        
-        # Check if all valid results agree
-        availabilities = [r['available'] for r in valid_results]
-        all_agree = all(a == availabilities[0] for a in availabilities)
-        
-        if all_agree:
-            # All sources agree
-            reconciled['available'] = availabilities[0]
-            # Average confidence weighted by provider weight
-            total_weight = sum(self._get_provider_weight(r['source']) for r in valid_results)
-            weighted_confidence = sum(r['confidence'] * self._get_provider_weight(r['source']) 
-                                     for r in valid_results)
-            reconciled['confidence'] = weighted_confidence / total_weight if total_weight > 0 else 0.5
-            reconciled['status'] = 'available' if reconciled['available'] else 'unavailable'
-            logger.info(f"All sources agree: {reconciled['status']} with confidence {reconciled['confidence']}")
-        else:
-            # Sources disagree - prioritize registrar APIs over WHOIS
-            reconciled['conflicting_results'] = True
-            logger.info(f"Sources disagree on availability")
-            
-            # Group by source type
-            registrar_results = [r for r in valid_results if r['source'] != 'WHOIS']
-            whois_results = [r for r in valid_results if r['source'] == 'WHOIS']
-            
-            logger.info(f"Registrar results: {[(r['source'], r['available']) for r in registrar_results]}")
-            logger.info(f"WHOIS results: {[(r['source'], r['available']) for r in whois_results]}")
-            
-            if registrar_results:
-                # Prioritize registrar API results
-                registrar_weights = [self._get_provider_weight(r['source']) for r in registrar_results]
-                registrar_availabilities = [r['available'] for r in registrar_results]
-                
-                # Weighted vote among registrar APIs
-                weighted_votes = {}
-                for i, avail in enumerate(registrar_availabilities):
-                    weighted_votes[avail] = weighted_votes.get(avail, 0) + registrar_weights[i]
-                
-                logger.info(f"Weighted votes: {weighted_votes}")
-                
-                # Get the availability with the highest weighted vote
-                reconciled['available'] = max(weighted_votes.items(), key=lambda x: x[1])[0]
-                reconciled['confidence'] = 0.7  # Medium-high confidence for registrar API with conflicts
-                reconciled['status'] = 'available' if reconciled['available'] else 'unavailable'
-                reconciled['status'] += '_conflicted'
-                logger.info(f"Reconciled based on registrar APIs: {reconciled['status']} with confidence {reconciled['confidence']}")
-            else:
-                # Only WHOIS results with conflicts (unusual case)
-                # Take the majority vote
-                true_votes = sum(1 for r in whois_results if r['available'])
-                false_votes = len(whois_results) - true_votes
-                
-                reconciled['available'] = true_votes > false_votes
-                reconciled['confidence'] = 0.5  # Medium confidence for conflicting WHOIS
-                reconciled['status'] = 'available' if reconciled['available'] else 'unavailable'
-                reconciled['status'] += '_uncertain'
-                logger.info(f"Reconciled based on WHOIS majority: {reconciled['status']} with confidence {reconciled['confidence']}")
-        
-        return reconciled
+        return self.reconciler.reconcile(results)
     
-    def _get_provider_weight(self, source_name: str) -> float:
-        """Get the weight of a provider by its source name."""
-        for provider in self.providers:
-            if provider.source_name == source_name:
-                return provider.weight
-        return 0.5  # Default weight if provider not found
-
-
-class DomainSuggestionGenerator:
-    """Generate alternative domain suggestions."""
+    def reconcile_many(self, rows: List[List[SourceResult]]) -> List[DomainResult]:
+        """Reconcile the source results of many domains in one vectorized pass, without their sources."""
+        return self.reconciler.reconcile_many(rows)
     
-    @staticmethod
-    def generate_suggestions(brand: str, tlds: List[str], max_suggestions: int = 10) -> List[str]:
+    def reconcile_stored(self, stored: Dict[str, DomainResult]) -> Dict[str, DomainResult]:
         """
-        Generate alternative domain suggestions.
+        Decide stored results again from their source results, in one vectorized pass, under
+        the current policy and provider weights. Results without source results (invalid
+        domains, failed checks) are kept as stored.
         
         Args:
-            brand: The brand name
-            tlds: List of TLDs to use for suggestions
-            max_suggestions: Maximum number of suggestions to return
+            stored: Results by domain, with their sources (e.g. HistoryStore.fresh_results)
             
         Returns:
-            List of domain suggestions
+            dict: Results by domain, keeping their sources and check time
         """
-        suggestions = []
-        
-        # Prefixes to try
-        prefixes = ['get', 'try', 'use', 'my', 'the']
-        
-        # Suffixes to try
-        suffixes = ['app', 'site', 'online', 'digital', 'web']
-        
-        # Generate suggestions with prefixes
-        for prefix in prefixes:
-            for tld in tlds:
-                suggestions.append(f"{prefix}{brand}{tld}")
-                if len(suggestions) >= max_suggestions:
-                    return suggestions
-        
-        # Generate suggestions with suffixes
-        for suffix in suffixes:
-            for tld in tlds:
-                suggestions.append(f"{brand}{suffix}{tld}")
-                if len(suggestions) >= max_suggestions:
-                    return suggestions
-        
-        # Add hyphenated version if brand is long enough
-        if len(brand) > 5:
-            middle = len(brand) // 2
-            hyphenated = f"{brand[:middle]}-{brand[middle:]}"
-            for tld in tlds:
-                suggestions.append(f"{hyphenated}{tld}")
-                if len(suggestions) >= max_suggestions:
-                    return suggestions
-        
-        return suggestions[:max_suggestions]
-
-
-def normalize_brand_name(brand_name: str) -> str:
-    """Normalize brand name for domain use (remove spaces, special chars, etc.)"""
-    # Convert to lowercase
-    normalized = brand_name.lower()
-    
-    # Remove special characters and spaces
-    normalized = re.sub(r'[^a-z0-9]', '', normalized)
-    
-    return normalized
+        domains = [domain for domain, result in stored.items()
+                   if result.sources and result.status not in (Status.INVALID, Status.ERROR)]
+        if not domains:
+            return stored
+        results = dict(stored)
+        for domain, result in zip(domains, self.reconcile_many([stored[domain].sources for domain in domains])):
+            result.sources = stored[domain].sources
+            result.checked_at = stored[domain].checked_at
+            results[domain] = result
+        return results
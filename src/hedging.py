@@ -0,0 +1,228 @@
+"""
+Hedged provider queries.
+A WHOIS server occasionally stalls for tens of seconds on one query, and that domain then
+holds up a whole batch. When a query to an upstream has not answered within a high
+percentile of that upstream's recent latencies, a duplicate is sent to an equivalent
+endpoint (the registry's RDAP, or another WHOIS host of the TLD); the first answer wins and
+the other query is cancelled.
+Hedges are paid from a budget earned by primary queries, so the extra load stays under a
+configured share of the traffic even when an upstream slows down as a whole.
+"""
+
+import os
+import time
+import asyncio
+import logging
+import threading
+from collections import deque
+from typing import Dict, List, Any, Optional, Tuple, Callable, Awaitable
+
+from .egress import SendClock
+from .metrics import HEDGES, HEDGE_DELAY
+
+logger = logging.getLogger(__name__)
+
+# Set to false to never send hedged queries
+HEDGING = os.environ.get('HEDGING', 'true').lower() == 'true'
+# Percentile of an upstream's recent latencies after which a query is hedged
+HEDGE_PERCENTILE = float(os.environ.get('HEDGE_PERCENTILE', '95'))
+# Shortest wait before hedging, whatever the percentile
+HEDGE_MIN_DELAY = float(os.environ.get('HEDGE_MIN_DELAY', '0.2'))
+# Latencies an upstream needs before its queries are hedged
+HEDGE_MIN_SAMPLES = int(os.environ.get('HEDGE_MIN_SAMPLES', '20'))
+# Hedged queries allowed, as a share of an upstream's queries
+HEDGE_MAX_EXTRA = float(os.environ.get('HEDGE_MAX_EXTRA', '0.05'))
+
+# Latencies kept per upstream
+_WINDOW = 512
+# New samples after which the percentile is recomputed
+_REFRESH = 16
+# Hedges an upstream can save up while it is healthy
+_MAX_SAVED = 10.0
+
+
+class LatencyWindow:
+    """Recent latencies of an upstream and a cached percentile of them."""
+
+    __slots__ = ('samples', '_stale', '_percentile')
+
+    def __init__(self):
+        self.samples: deque = deque(maxlen=_WINDOW)
+        self._stale = 0
+        self._percentile: Optional[float] = None
+
+    def add(self, latency: float) -> None:
+        self.samples.append(latency)
+        self._stale += 1
+
+    def percentile(self, q: float) -> float:
+        if self._percentile is None or self._stale >= _REFRESH:
+            ordered = sorted(self.samples)
+            self._percentile = ordered[min(len(ordered) - 1, int(len(ordered) * q / 100))]
+            self._stale = 0
+        return self._percentile
+
+
+class Hedger:
+    """
+    Runs queries with an optional hedge to an alternate endpoint.
+
+    The hedger is thread-safe and can be used from several event loops.
+    """
+
+    def __init__(self, percentile: float = HEDGE_PERCENTILE, min_delay: float = HEDGE_MIN_DELAY,
+                 min_samples: int = HEDGE_MIN_SAMPLES, max_extra: float = HEDGE_MAX_EXTRA,
+                 enabled: bool = HEDGING):
+        """
+        Args:
+            percentile: Percentile of recent latencies after which a query is hedged
+            min_delay: Shortest wait in seconds before hedging
+            min_samples: Latencies an upstream needs before its queries are hedged
+            max_extra: Hedged queries allowed per query to an upstream
+            enabled: Whether hedges are sent at all (latencies are tracked regardless)
+        """
+        self.percentile = percentile
+        self.min_delay = min_delay
+        self.min_samples = min_samples
+        self.max_extra = max_extra
+        self.enabled = enabled
+        self._windows: Dict[str, LatencyWindow] = {}
+        self._budgets: Dict[str, float] = {}
+        self._counts: Dict[str, Dict[str, int]] = {}
+        self._lock = threading.Lock()
+
+    def delay(self, upstream: str) -> Optional[float]:
+        """Seconds after which a query to the upstream is hedged, or None while too little is known."""
+        with self._lock:
+            window = self._windows.get(upstream)
+            if window is None or len(window.samples) < self.min_samples:
+                return None
+            return max(self.min_delay, window.percentile(self.percentile))
+
+    async def run(self, provider: str, upstream: str, primary: Callable[[], Awaitable[Any]],
+                  alternate: Optional[Tuple[str, Callable[[], Awaitable[Any]]]] = None) -> Tuple[Any, str]:
+        """
+        Run a query to an upstream, hedged to an alternate endpoint if it is slow.
+
+        The primary query is hedged once it has been sent for longer than delay(upstream) and
+        the upstream's budget allows it. Time spent waiting for our own rate budgets (see
+        SendClock) neither counts toward the delay nor into the upstream's latencies. The first
+        successful answer wins and the other query is cancelled; a failure only counts once
+        both queries have failed.
+
+        Args:
+            provider: Source name of the provider, for metrics
+            upstream: Endpoint of the primary query, whose latencies decide when to hedge
+            primary: Factory of the primary query
+            alternate: (endpoint, factory) of the equivalent query, if the upstream has one
+
+        Returns:
+            tuple: (answer, endpoint that gave it)
+
+        Raises:
+            Exception: The primary query's exception when no query succeeded
+        """
+        delay = None
+        with self._lock:
+            self._count(upstream, 'queries')
+            if self.enabled and alternate is not None:
+                self._budgets[upstream] = min(_MAX_SAVED, self._budgets.get(upstream, 1.0) + self.max_extra)
+        if self.enabled and alternate is not None:
+            delay = self.delay(upstream)
+
+        clock = SendClock()
+        with clock.tracking():
+            primary_task = asyncio.ensure_future(primary())
+        if delay is None:
+            answer = await primary_task
+            self._record(upstream, clock)
+            return answer, upstream
+
+        try:
+            # The delay runs from the send, once the query has passed its rate-limit waits
+            await asyncio.wait((primary_task, clock.sent()), return_when=asyncio.FIRST_COMPLETED)
+            done = primary_task.done()
+            if not done:
+                done, _ = await asyncio.wait((primary_task,), timeout=delay)
+        except asyncio.CancelledError:
+            primary_task.cancel()
+            raise
+        if done:
+            answer = primary_task.result()
+            self._record(upstream, clock)
+            return answer, upstream
+
+        with self._lock:
+            allowed = self._budgets.get(upstream, 0.0) >= 1.0
+            if allowed:
+                self._budgets[upstream] -= 1.0
+                self._count(upstream, 'hedged')
+        if not allowed:
+            HEDGES.labels(provider, 'over_budget').inc()
+            answer = await primary_task
+            self._record(upstream, clock)
+            return answer, upstream
+
+        endpoint, factory = alternate
+        HEDGE_DELAY.labels(provider).observe(delay)
+        logger.debug("Hedging query to %s after %.2fs with %s", upstream, delay, endpoint)
+        hedge_task = asyncio.ensure_future(factory())
+        endpoints = {primary_task: upstream, hedge_task: endpoint}
+        pending = {primary_task, hedge_task}
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in (primary_task, hedge_task):
+                    if task in done and task.exception() is None:
+                        winner = endpoints[task]
+                        if task is primary_task:
+                            self._record(upstream, clock)
+                        HEDGES.labels(provider, 'won' if task is hedge_task else 'lost').inc()
+                        if task is hedge_task:
+                            with self._lock:
+                                self._count(upstream, 'won')
+                        return task.result(), winner
+            HEDGES.labels(provider, 'failed').inc()
+            # Neither answered: report what the upstream itself said
+            return primary_task.result(), upstream
+        finally:
+            for task in pending:
+                task.cancel()
+
+    def stats(self) -> List[Dict[str, Any]]:
+        """Hedging state per upstream: current delay, queries, hedges sent and won."""
+        with self._lock:
+            upstreams = list(self._windows.keys() | self._counts.keys())
+        stats = []
+        for upstream in sorted(upstreams):
+            delay = self.delay(upstream)
+            with self._lock:
+                counts = dict(self._counts.get(upstream, {}))
+                budget = self._budgets.get(upstream)
+            stats.append({
+                'upstream': upstream,
+                'delay_ms': round(delay * 1000, 1) if delay is not None else None,
+                'queries': counts.get('queries', 0),
+                'hedged': counts.get('hedged', 0),
+                'won': counts.get('won', 0),
+                'budget': round(budget, 2) if budget is not None else None,
+            })
+        return stats
+
+    def _record(self, upstream: str, clock: SendClock) -> None:
+        if clock.sent_at is None:
+            # Answered without being sent through a lease: nothing to learn about the upstream
+            return
+        with self._lock:
+            window = self._windows.get(upstream)
+            if window is None:
+                window = self._windows[upstream] = LatencyWindow()
+            window.add(time.monotonic() - clock.sent_at)
+
+    def _count(self, upstream: str, name: str) -> None:
+        counts = self._counts.setdefault(upstream, {})
+        counts[name] = counts.get(name, 0) + 1
+
+
+# Shared by every provider in the process
+hedger = Hedger()
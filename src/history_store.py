@@ -0,0 +1,331 @@
+"""
+Persistent history of domain checks.
+Every reconciled result and its source results are recorded in SQLite (WAL mode) by a
+background writer thread that commits in batches, so checks never wait on disk. Besides
+the append-only check log, a `latest` table keeps the last known state of each domain,
+which answers bulk status lookups, change queries and name searches through indexes
+without scanning the log, even at tens of millions of rows. Fresh entries let reruns skip
+network work entirely (see BatchChecker.stream).
+"""
+
+import os
+import time
+import queue
+import sqlite3
+import logging
+import threading
+from typing import Dict, List, Any, Optional, Iterable, Tuple
+
+from .results import Status, SourceResult, DomainResult
+from .tld_registry import TldRegistry, get_tld_registry
+
+logger = logging.getLogger(__name__)
+
+# SQLite database of past checks; history is disabled when empty
+HISTORY_DB_PATH = os.environ.get('HISTORY_DB_PATH', '')
+# Default age in seconds under which a stored result is reused instead of checking again (0 = never)
+HISTORY_MAX_AGE = float(os.environ.get('HISTORY_MAX_AGE', '0'))
+
+# Status codes stored in the database; append only, never reorder
+STATUS_CODES = [Status.AVAILABLE, Status.UNAVAILABLE, Status.AVAILABLE_CONFLICTED, Status.UNAVAILABLE_CONFLICTED,
+                Status.AVAILABLE_UNCERTAIN, Status.UNAVAILABLE_UNCERTAIN, Status.UNKNOWN, Status.INVALID,
+                Status.ERROR]
+_STATUS_CODE = {status: code for code, status in enumerate(STATUS_CODES)}
+
+# SQLite allows 999 bound parameters in older builds
+_CHUNK = 500
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS checks (
+    id INTEGER PRIMARY KEY,
+    domain TEXT NOT NULL,
+    brand TEXT NOT NULL,
+    tld TEXT NOT NULL,
+    status INTEGER NOT NULL,
+    previous_status INTEGER,
+    available INTEGER,
+    confidence REAL NOT NULL,
+    conflicting INTEGER NOT NULL,
+    error TEXT,
+    checked_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_checks_domain ON checks (domain, checked_at);
+CREATE INDEX IF NOT EXISTS idx_checks_brand ON checks (brand, checked_at);
+CREATE INDEX IF NOT EXISTS idx_checks_checked_at ON checks (checked_at);
+-- Only status changes, so "changed since" reads a small index
+CREATE INDEX IF NOT EXISTS idx_checks_changes ON checks (checked_at) WHERE previous_status <> status;
+
+CREATE TABLE IF NOT EXISTS source_checks (
+    check_id INTEGER NOT NULL,
+    source TEXT NOT NULL,
+    available INTEGER,
+    confidence REAL NOT NULL,
+    latency_ms REAL,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_source_checks_check ON source_checks (check_id);
+
+CREATE TABLE IF NOT EXISTS latest (
+    domain TEXT PRIMARY KEY,
+    check_id INTEGER NOT NULL,
+    brand TEXT NOT NULL,
+    tld TEXT NOT NULL,
+    name_length INTEGER NOT NULL,
+    status INTEGER NOT NULL,
+    available INTEGER,
+    confidence REAL NOT NULL,
+    checked_at REAL NOT NULL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_latest_tld_status ON latest (tld, status, name_length);
+CREATE INDEX IF NOT EXISTS idx_latest_status ON latest (status, checked_at);
+CREATE INDEX IF NOT EXISTS idx_latest_brand ON latest (brand);
+CREATE INDEX IF NOT EXISTS idx_latest_checked_at ON latest (checked_at);
+"""
+
+
+def _bool(value: Optional[int]) -> Optional[bool]:
+    return None if value is None else bool(value)
+
+
+class HistoryStore:
+    """SQLite-backed history of checks with a batched background writer."""
+
+    def __init__(self, path: str, tld_registry: Optional[TldRegistry] = None,
+                 batch_size: int = 500, flush_interval: float = 0.5):
+        self.path = path
+        self.tld_registry = tld_registry if tld_registry is not None else get_tld_registry()
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.recorded = 0
+        self._queue: queue.Queue = queue.Queue()
+        self._local = threading.local()
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        with self._connect() as connection:
+            connection.executescript(_SCHEMA)
+        self._writer = threading.Thread(target=self._write_loop, name='history-writer', daemon=True)
+        self._writer.start()
+
+    def _connect(self) -> sqlite3.Connection:
+        connection = sqlite3.connect(self.path, timeout=30)
+        connection.execute('PRAGMA journal_mode=WAL')
+        connection.execute('PRAGMA synchronous=NORMAL')
+        return connection
+
+    def _reader(self) -> sqlite3.Connection:
+        """Connection of the calling thread, used for queries."""
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = self._connect()
+            connection.execute('PRAGMA query_only=ON')
+            self._local.connection = connection
+        return connection
+
+    def record(self, domain: str, result: DomainResult, checked_at: Optional[float] = None) -> None:
+        """Queue a result for writing; never blocks on the database."""
+        self._queue.put((domain, result, checked_at if checked_at is not None else time.time()))
+
+    def flush(self, timeout: float = 10.0) -> None:
+        """Wait until every queued result is written."""
+        done = threading.Event()
+        self._queue.put(done)
+        done.wait(timeout)
+
+    def _write_loop(self) -> None:
+        connection = self._connect()
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            entries = [item for item in batch if not isinstance(item, threading.Event)]
+            try:
+                if entries:
+                    with connection:
+                        self._write(connection, entries)
+                    self.recorded += len(entries)
+            except sqlite3.Error as e:
+                logger.error("Could not record %d checks in history: %s", len(entries), e)
+            for item in batch:
+                if isinstance(item, threading.Event):
+                    item.set()
+
+    def _write(self, connection: sqlite3.Connection, entries: List[Tuple[str, DomainResult, float]]) -> None:
+        previous = self._latest_rows(connection, {domain for domain, _, _ in entries})
+        sources = []
+        for domain, result, checked_at in entries:
+            label, info = self.tld_registry.split(domain)
+            tld = info.tld if info is not None else '.' + domain.rsplit('.', 1)[-1]
+            status = _STATUS_CODE[result.status]
+            prior = previous.get(domain)
+            cursor = connection.execute(
+                'INSERT INTO checks (domain, brand, tld, status, previous_status, available, confidence, '
+                'conflicting, error, checked_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                (domain, label, tld, status, prior[5] if prior else None, result.available, result.confidence,
+                 result.conflicting_results, result.error, checked_at))
+            check_id = cursor.lastrowid
+            sources.extend((check_id, s.source, s.available, s.confidence,
+                            s.latency * 1000 if s.latency is not None else None, s.error) for s in result.sources)
+            # Results recorded out of order never replace a newer state
+            if prior is None or prior[8] <= checked_at:
+                row = (domain, check_id, label, tld, len(label), status, result.available, result.confidence,
+                       checked_at)
+                connection.execute('INSERT OR REPLACE INTO latest VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)', row)
+                previous[domain] = row
+        connection.executemany('INSERT INTO source_checks VALUES (?, ?, ?, ?, ?, ?)', sources)
+
+    @staticmethod
+    def _latest_rows(connection: sqlite3.Connection, domains: Iterable[str],
+                     min_checked_at: Optional[float] = None) -> Dict[str, tuple]:
+        domains = list(domains)
+        rows = {}
+        for start in range(0, len(domains), _CHUNK):
+            chunk = domains[start:start + _CHUNK]
+            sql = f"SELECT * FROM latest WHERE domain IN ({','.join('?' * len(chunk))})"
+            params: List[Any] = list(chunk)
+            if min_checked_at is not None:
+                sql += ' AND checked_at >= ?'
+                params.append(min_checked_at)
+            for row in connection.execute(sql, params):
+                rows[row[0]] = row
+        return rows
+
+    def latest(self, domains: Iterable[str], max_age: Optional[float] = None) -> Dict[str, Dict[str, Any]]:
+        """
+        Last known state of each domain, optionally only when checked within max_age seconds.
+
+        Returns:
+            dict: domain -> {'domain', 'brand', 'tld', 'status', 'available', 'confidence', 'checked_at'}
+        """
+        min_checked_at = time.time() - max_age if max_age else None
+        rows = self._latest_rows(self._reader(), domains, min_checked_at)
+        return {domain: self._latest_dict(row) for domain, row in rows.items()}
+
+    def fresh_results(self, domains: Iterable[str], max_age: float) -> Dict[str, DomainResult]:
+        """Stored results of the domains checked within max_age seconds, with their source results."""
+        connection = self._reader()
+        rows = self._latest_rows(connection, domains, time.time() - max_age)
+        by_check = {row[1]: row for row in rows.values()}
+        checks: Dict[int, tuple] = {}
+        sources: Dict[int, List[SourceResult]] = {}
+        check_ids = list(by_check)
+        for start in range(0, len(check_ids), _CHUNK):
+            chunk = check_ids[start:start + _CHUNK]
+            marks = ','.join('?' * len(chunk))
+            for row in connection.execute(
+                    f"SELECT id, conflicting, error FROM checks WHERE id IN ({marks})", chunk):
+                checks[row[0]] = row
+            for check_id, source, available, confidence, latency_ms, error in connection.execute(
+                    f"SELECT * FROM source_checks WHERE check_id IN ({marks})", chunk):
+                sources.setdefault(check_id, []).append(SourceResult(
+                    by_check[check_id][0], source, _bool(available), confidence, error=error,
+                    latency=latency_ms / 1000 if latency_ms is not None else None))
+
+        results = {}
+        for check_id, row in by_check.items():
+            domain, _, _, _, _, status, available, confidence, checked_at = row
+            check_sources = sources.get(check_id, [])
+            _, conflicting, error = checks.get(check_id, (check_id, 0, None))
+            results[domain] = DomainResult(
+                available=_bool(available), confidence=confidence, status=STATUS_CODES[status],
+                sources_checked=len(check_sources),
+                sources_with_errors=sum(1 for s in check_sources if s.error is not None),
+                conflicting_results=bool(conflicting), sources=tuple(check_sources), error=error,
+                checked_at=checked_at)
+        return results
+
+    def changed_since(self, since: float, limit: int = 1000, offset: int = 0) -> List[Dict[str, Any]]:
+        """
+        Domains whose status differs from the one they had at `since`.
+
+        Returns:
+            list: {'domain', 'previous_status', 'status', 'changed_at', 'checked_at'}, most recent change first
+        """
+        # The first change after `since` carries the status the domain had at that time
+        rows = self._reader().execute(
+            'SELECT c.domain, c.previous_status, MIN(c.checked_at), l.status, l.checked_at '
+            'FROM checks c INDEXED BY idx_checks_changes JOIN latest l ON l.domain = c.domain '
+            'WHERE c.checked_at >= ? AND c.previous_status <> c.status '
+            'GROUP BY c.domain HAVING c.previous_status <> l.status '
+            'ORDER BY l.checked_at DESC LIMIT ? OFFSET ?', (since, limit, offset))
+        return [{'domain': domain, 'previous_status': STATUS_CODES[previous].value, 'status': STATUS_CODES[status].value,
+                 'changed_at': changed_at, 'checked_at': checked_at}
+                for domain, previous, changed_at, status, checked_at in rows]
+
+    def search(self, tld: Optional[str] = None, status: Optional[Status] = None, brand: Optional[str] = None,
+               min_length: Optional[int] = None, max_length: Optional[int] = None,
+               checked_since: Optional[float] = None, limit: int = 1000, offset: int = 0) -> List[Dict[str, Any]]:
+        """
+        Search the last known state of domains, e.g. available .io names of at most 5 characters:
+        search(tld='.io', status=Status.AVAILABLE, max_length=5).
+        """
+        clauses, params = [], []
+        if tld is not None:
+            clauses.append('tld = ?')
+            params.append(tld if tld.startswith('.') else '.' + tld)
+        if status is not None:
+            clauses.append('status = ?')
+            params.append(_STATUS_CODE[Status(status)])
+        if brand is not None:
+            clauses.append('brand = ?')
+            params.append(brand)
+        if min_length is not None:
+            clauses.append('name_length >= ?')
+            params.append(min_length)
+        if max_length is not None:
+            clauses.append('name_length <= ?')
+            params.append(max_length)
+        if checked_since is not None:
+            clauses.append('checked_at >= ?')
+            params.append(checked_since)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ''
+        rows = self._reader().execute(f"SELECT * FROM latest {where} ORDER BY domain LIMIT ? OFFSET ?",
+                                      params + [limit, offset])
+        return [self._latest_dict(row) for row in rows]
+
+    def domain_history(self, domain: str, limit: int = 100) -> List[Dict[str, Any]]:
+        """Past checks of a domain with their source results, most recent first."""
+        connection = self._reader()
+        checks = connection.execute(
+            'SELECT id, status, available, confidence, conflicting, error, checked_at FROM checks '
+            'WHERE domain = ? ORDER BY checked_at DESC LIMIT ?', (domain, limit)).fetchall()
+        history = []
+        for check_id, status, available, confidence, conflicting, error, checked_at in checks:
+            sources = [{'source': source, 'available': _bool(s_available), 'confidence': s_confidence,
+                        'latency_ms': latency_ms, 'error': s_error}
+                       for source, s_available, s_confidence, latency_ms, s_error in connection.execute(
+                           'SELECT source, available, confidence, latency_ms, error FROM source_checks '
+                           'WHERE check_id = ?', (check_id,))]
+            history.append({'status': STATUS_CODES[status].value, 'available': _bool(available),
+                            'confidence': confidence, 'conflicting_results': bool(conflicting), 'error': error,
+                            'checked_at': checked_at, 'sources': sources})
+        return history
+
+    @staticmethod
+    def _latest_dict(row: tuple) -> Dict[str, Any]:
+        domain, _, brand, tld, _, status, available, confidence, checked_at = row
+        return {'domain': domain, 'brand': brand, 'tld': tld, 'status': STATUS_CODES[status].value,
+                'available': _bool(available), 'confidence': confidence, 'checked_at': checked_at}
+
+
+_history: Optional[HistoryStore] = None
+_history_lock = threading.Lock()
+
+
+def get_history_store() -> Optional[HistoryStore]:
+    """Return the process-wide history store, or None when HISTORY_DB_PATH is not set."""
+    global _history
+    if not HISTORY_DB_PATH:
+        return None
+    if _history is None:
+        with _history_lock:
+            if _history is None:
+                _history = HistoryStore(HISTORY_DB_PATH)
+                logger.info("Recording check history in %s", HISTORY_DB_PATH)
+    return _history
@@ -0,0 +1,341 @@
+"""
+Columnar storage of check results for large jobs.
+Each job appends its results to an Arrow IPC stream on disk, one record batch (row group)
+every JOB_STORE_ROW_GROUP rows, with one row per requested brand and TLD. Exports to Parquet,
+Arrow and CSV and the summary statistics read the stream batch by batch, so no job is ever
+materialized in memory. Requires pyarrow; without it the store is disabled.
+"""
+
+import os
+import re
+import json
+import time
+import uuid
+import shutil
+import logging
+import tempfile
+import threading
+from typing import Dict, List, Any, Optional, Iterator, Tuple
+
+from .results import DomainResult
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    PYARROW_AVAILABLE = True
+except ImportError:
+    PYARROW_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+JOB_STORE_DIR = os.environ.get('JOB_STORE_DIR', os.path.join(tempfile.gettempdir(), 'domain-checker-jobs'))
+# Requests with at least this many unique domains are stored as jobs
+JOB_STORE_MIN_DOMAINS = int(os.environ.get('JOB_STORE_MIN_DOMAINS', '50'))
+JOB_STORE_ROW_GROUP = int(os.environ.get('JOB_STORE_ROW_GROUP', '1000'))
+# Oldest jobs are deleted beyond this number
+JOB_STORE_MAX_JOBS = int(os.environ.get('JOB_STORE_MAX_JOBS', '100'))
+
+EXPORT_FORMATS = {
+    'parquet': ('results.parquet', 'application/vnd.apache.parquet'),
+    'arrow': ('results.arrow', 'application/vnd.apache.arrow.file'),
+    'csv': ('results.csv', 'text/csv'),
+}
+
+_DATA_FILE = 'results.arrows'
+_META_FILE = 'job.json'
+
+
+def source_column(source: str) -> str:
+    """Column name prefix of a provider ("GoDaddy API" -> "godaddy_api")."""
+    return re.sub(r'\W+', '_', source.lower()).strip('_')
+
+
+def job_schema(sources: List[str]) -> 'pa.Schema':
+    """Schema of a job's rows, with availability, confidence, latency and error columns per source."""
+    fields = [
+        pa.field('domain', pa.string()),
+        pa.field('brand', pa.string()),
+        pa.field('tld', pa.string()),
+        pa.field('status', pa.string()),
+        pa.field('available', pa.bool_()),
+        pa.field('confidence', pa.float32()),
+        pa.field('conflicting', pa.bool_()),
+        pa.field('error', pa.string()),
+        pa.field('checked_at', pa.timestamp('ms', tz='UTC')),
+    ]
+    for source in sources:
+        prefix = source_column(source)
+        fields += [
+            pa.field(f"{prefix}_available", pa.bool_()),
+            pa.field(f"{prefix}_confidence", pa.float32()),
+            pa.field(f"{prefix}_ms", pa.float32()),
+            pa.field(f"{prefix}_error", pa.string()),
+        ]
+    return pa.schema(fields)
+
+
+class JobWriter:
+    """Appends the results of a running job in row groups."""
+
+    def __init__(self, job_id: str, directory: str, sources: List[str], meta: Dict[str, Any],
+                 row_group: int = JOB_STORE_ROW_GROUP):
+        self.job_id = job_id
+        self.directory = directory
+        self.sources = list(sources)
+        self.schema = job_schema(self.sources)
+        self.row_group = row_group
+        self.rows = 0
+        self.meta = dict(meta, id=job_id, sources=self.sources, status='running', rows=0,
+                         created_at=time.time(), finished_at=None)
+        self._columns: Dict[str, list] = {name: [] for name in self.schema.names}
+        self._prefixes = [(source, source_column(source)) for source in self.sources]
+        self._sink = pa.OSFile(os.path.join(directory, _DATA_FILE), 'wb')
+        self._writer = pa.ipc.new_stream(self._sink, self.schema)
+        self._write_meta()
+
+    def append(self, domain: str, owners: List[Tuple[str, str]], result: Optional[DomainResult],
+               error: Optional[str] = None) -> None:
+        """Add one row per (brand, tld) owner of a checked domain."""
+        columns = self._columns
+        checked_at = int(time.time() * 1000)
+        by_source = {s.source: s for s in result.sources} if result is not None else {}
+        for brand, tld in owners:
+            columns['domain'].append(domain)
+            columns['brand'].append(brand)
+            columns['tld'].append(tld)
+            columns['checked_at'].append(checked_at)
+            if result is None:
+                columns['status'].append('error')
+                columns['available'].append(None)
+                columns['confidence'].append(0.0)
+                columns['conflicting'].append(False)
+                columns['error'].append(error)
+            else:
+                columns['status'].append(result.status.value)
+                columns['available'].append(result.available)
+                columns['confidence'].append(result.confidence)
+                columns['conflicting'].append(result.conflicting_results)
+                columns['error'].append(result.error)
+            for source, prefix in self._prefixes:
+                answer = by_source.get(source)
+                columns[f"{prefix}_available"].append(answer.available if answer is not None else None)
+                columns[f"{prefix}_confidence"].append(answer.confidence if answer is not None else None)
+                columns[f"{prefix}_ms"].append(answer.latency * 1000 if answer is not None and answer.latency is not None
+                                               else None)
+                columns[f"{prefix}_error"].append(answer.error if answer is not None else None)
+        self.rows += len(owners)
+        if len(columns['domain']) >= self.row_group:
+            self.flush()
+
+    def flush(self) -> None:
+        """Write the buffered rows as one record batch."""
+        if not self._columns['domain']:
+            return
+        batch = pa.RecordBatch.from_pydict(self._columns, schema=self.schema)
+        self._writer.write_batch(batch)
+        self._sink.flush()
+        for values in self._columns.values():
+            values.clear()
+        self.meta['rows'] = self.rows
+        self._write_meta()
+
+    def close(self, status: str = 'complete') -> None:
+        """Flush the remaining rows and mark the job finished ('complete' or 'incomplete')."""
+        self.flush()
+        self._writer.close()
+        self._sink.close()
+        self.meta.update(status=status, rows=self.rows, finished_at=time.time())
+        self._write_meta()
+        logger.info("Stored job %s: %d rows (%s)", self.job_id, self.rows, status)
+
+    def _write_meta(self) -> None:
+        path = os.path.join(self.directory, _META_FILE)
+        with open(path + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump(self.meta, f)
+        os.replace(path + '.tmp', path)
+
+
+class JobStore:
+    """Directory of stored jobs."""
+
+    def __init__(self, directory: str = JOB_STORE_DIR, max_jobs: int = JOB_STORE_MAX_JOBS):
+        self.directory = directory
+        self.max_jobs = max_jobs
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return PYARROW_AVAILABLE
+
+    def create(self, sources: List[str], meta: Optional[Dict[str, Any]] = None) -> Optional[JobWriter]:
+        """Start a job; return None when pyarrow is not installed."""
+        if not PYARROW_AVAILABLE:
+            return None
+        job_id = f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}"
+        directory = os.path.join(self.directory, job_id)
+        with self._lock:
+            os.makedirs(directory)
+            self._expire()
+        return JobWriter(job_id, directory, sources, meta or {})
+
+    def jobs(self) -> List[Dict[str, Any]]:
+        """Metadata of the stored jobs, most recent first."""
+        jobs = []
+        for job_id in sorted(self._job_ids(), reverse=True):
+            meta = self.meta(job_id)
+            if meta is not None:
+                jobs.append(meta)
+        return jobs
+
+    def meta(self, job_id: str) -> Optional[Dict[str, Any]]:
+        path = self._path(job_id, _META_FILE)
+        if path is None or not os.path.exists(path):
+            return None
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+
+    def batches(self, job_id: str) -> Iterator['pa.RecordBatch']:
+        """Yield the record batches written so far."""
+        path = self._path(job_id, _DATA_FILE)
+        if path is None or not os.path.exists(path):
+            raise KeyError(job_id)
+        with pa.OSFile(path, 'rb') as source:
+            reader = pa.ipc.open_stream(source)
+            while True:
+                try:
+                    yield reader.read_next_batch()
+                except StopIteration:
+                    return
+                except pa.ArrowInvalid:
+                    # A running job's last batch may be partially written
+                    return
+
+    def export(self, job_id: str, fmt: str) -> str:
+        """
+        Write the job to Parquet, Arrow (IPC file) or CSV batch by batch and return the file path.
+        Exports of finished jobs are reused.
+        """
+        meta = self.meta(job_id)
+        if meta is None:
+            raise KeyError(job_id)
+        file_name, _ = EXPORT_FORMATS[fmt]
+        path = self._path(job_id, file_name)
+        finished = meta['status'] != 'running'
+        if finished and os.path.exists(path):
+            return path
+
+        schema = job_schema(meta['sources'])
+        tmp_path = f"{path}.{uuid.uuid4().hex[:8]}.tmp"
+        if fmt == 'parquet':
+            import pyarrow.parquet as pq
+            writer = pq.ParquetWriter(tmp_path, schema, compression='zstd')
+        elif fmt == 'arrow':
+            writer = pa.ipc.new_file(tmp_path, schema)
+        else:
+            import pyarrow.csv as pacsv
+            writer = pacsv.CSVWriter(tmp_path, schema)
+        try:
+            for batch in self.batches(job_id):
+                writer.write_batch(batch)
+        finally:
+            writer.close()
+
+        if finished:
+            os.replace(tmp_path, path)
+            return path
+        # Snapshot of a running job; the caller removes it once sent
+        return tmp_path
+
+    def summary(self, job_id: str) -> Dict[str, Any]:
+        """
+        Availability rate per TLD, conflict rate and per-provider disagreement with the
+        reconciled answer, aggregated batch by batch with pyarrow compute kernels.
+        """
+        meta = self.meta(job_id)
+        if meta is None:
+            raise KeyError(job_id)
+        prefixes = [(source, source_column(source)) for source in meta['sources']]
+        per_tld: Dict[str, List[int]] = {}
+        statuses: Dict[str, int] = {}
+        per_source = {source: {'answered': 0, 'errors': 0, 'disagreements': 0, 'ms_total': 0.0, 'ms_count': 0}
+                      for source, _ in prefixes}
+        rows = conflicts = available_rows = 0
+
+        for batch in self.batches(job_id):
+            rows += batch.num_rows
+            available = batch.column('available')
+            decided = pc.is_valid(available)
+            available_rows += pc.sum(pc.fill_null(available, False)).as_py() or 0
+            conflicts += pc.sum(batch.column('conflicting')).as_py() or 0
+
+            for item in pc.value_counts(batch.column('status')).to_pylist():
+                statuses[item['values']] = statuses.get(item['values'], 0) + item['counts']
+
+            table = pa.Table.from_batches([batch]).select(['tld', 'available'])
+            table = table.append_column('is_available', pc.cast(pc.fill_null(available, False), pa.int64()))
+            table = table.append_column('decided', pc.cast(decided, pa.int64()))
+            grouped = table.group_by('tld').aggregate([('is_available', 'sum'), ('decided', 'sum'),
+                                                       ('tld', 'count')])
+            for tld, hits, decided_count, count in zip(grouped.column('tld').to_pylist(),
+                                                       grouped.column('is_available_sum').to_pylist(),
+                                                       grouped.column('decided_sum').to_pylist(),
+                                                       grouped.column('tld_count').to_pylist()):
+                totals = per_tld.setdefault(tld, [0, 0, 0])
+                totals[0] += count
+                totals[1] += hits
+                totals[2] += decided_count
+
+            for source, prefix in prefixes:
+                answer = batch.column(f"{prefix}_available")
+                errors = pc.is_valid(batch.column(f"{prefix}_error"))
+                answered = pc.and_(pc.is_valid(answer), pc.invert(errors))
+                stats = per_source[source]
+                stats['answered'] += pc.sum(answered).as_py() or 0
+                stats['errors'] += pc.sum(errors).as_py() or 0
+                # Answers that differ from the reconciled availability
+                differs = pc.and_(pc.and_(answered, decided), pc.not_equal(answer, available))
+                stats['disagreements'] += pc.sum(pc.fill_null(differs, False)).as_py() or 0
+                latency = batch.column(f"{prefix}_ms")
+                stats['ms_total'] += pc.sum(latency).as_py() or 0.0
+                stats['ms_count'] += pc.count(latency).as_py()
+
+        def rate(part: float, whole: float) -> Optional[float]:
+            return round(part / whole, 4) if whole else None
+
+        return {
+            'job': meta,
+            'rows': rows,
+            'availability_rate': rate(available_rows, rows),
+            'conflict_rate': rate(conflicts, rows),
+            'statuses': statuses,
+            'tlds': {tld: {'rows': count, 'available': hits, 'availability_rate': rate(hits, decided_count)}
+                     for tld, (count, hits, decided_count) in sorted(per_tld.items())},
+            'providers': {source: {
+                'answered': stats['answered'],
+                'errors': stats['errors'],
+                'error_rate': rate(stats['errors'], stats['answered'] + stats['errors']),
+                'disagreement_rate': rate(stats['disagreements'], stats['answered']),
+                'mean_ms': round(stats['ms_total'] / stats['ms_count'], 1) if stats['ms_count'] else None,
+            } for source, stats in per_source.items()},
+        }
+
+    def _job_ids(self) -> List[str]:
+        if not os.path.isdir(self.directory):
+            return []
+        return [name for name in os.listdir(self.directory)
+                if os.path.isfile(os.path.join(self.directory, name, _META_FILE))]
+
+    def _path(self, job_id: str, file_name: str) -> Optional[str]:
+        # Job ids come from URLs; never leave the store directory
+        if not re.fullmatch(r'[\w-]+', job_id):
+            return None
+        return os.path.join(self.directory, job_id, file_name)
+
+    def _expire(self) -> None:
+        job_ids = sorted(self._job_ids())
+        for job_id in job_ids[:max(0, len(job_ids) - self.max_jobs)]:
+            shutil.rmtree(os.path.join(self.directory, job_id), ignore_errors=True)
+
+
+# Process-wide job store
+job_store = JobStore()
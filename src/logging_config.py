@@ -0,0 +1,141 @@
+"""
+Logging configuration for the domain checker.
+Sets up logging once for the whole process:
+- records go through a queue to a listener thread, so request and event loop threads never
+  block on formatting the final line or on stream I/O
+- messages use %-style arguments, formatted only for records that pass the level and sampling
+- INFO records tagged with a domain (extra={'domain': ...}) are sampled per domain, keeping
+  all lines of a sampled domain together; warnings and errors are always kept
+- messages longer than LOG_MAX_PAYLOAD characters are truncated, so a WHOIS dump cannot
+  flood the log
+- LOG_FORMAT=json writes one JSON object per line with the record's extra fields
+"""
+
+import os
+import sys
+import json
+import zlib
+import queue
+import atexit
+import logging
+import logging.handlers
+from typing import Optional
+
+LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO').upper()
+LOG_FORMAT = os.environ.get('LOG_FORMAT', 'text').lower()
+LOG_SAMPLE_RATE = float(os.environ.get('LOG_SAMPLE_RATE', '1.0'))
+LOG_MAX_PAYLOAD = int(os.environ.get('LOG_MAX_PAYLOAD', '2000'))
+
+TEXT_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+# LogRecord attributes that are not user-supplied extra fields
+_RESERVED_ATTRS = frozenset(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+class DomainSamplingFilter(logging.Filter):
+    """Keep a deterministic share of the domains for records below WARNING tagged with a domain."""
+
+    def __init__(self, rate: float):
+        super().__init__()
+        self.rate = rate
+        self._threshold = int(max(0.0, min(1.0, rate)) * 0xFFFFFFFF)
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if self.rate >= 1.0 or record.levelno >= logging.WARNING:
+            return True
+        domain = getattr(record, 'domain', None)
+        if domain is None:
+            return True
+        return zlib.crc32(domain.encode('utf-8')) <= self._threshold
+
+
+class CappedQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that merges the message with its arguments and caps its size."""
+
+    def __init__(self, log_queue: queue.Queue, max_payload: int = LOG_MAX_PAYLOAD):
+        super().__init__(log_queue)
+        self.max_payload = max_payload
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        message = record.getMessage()
+        if self.max_payload and len(message) > self.max_payload:
+            message = f"{message[:self.max_payload]}... [{len(message) - self.max_payload} chars truncated]"
+        if record.exc_info and not record.exc_text:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+        # Arguments may be mutable objects; only the merged text crosses the queue
+        record.msg = message
+        record.args = None
+        record.exc_info = None
+        return record
+
+
+class JsonFormatter(logging.Formatter):
+    """Format records as JSON lines, including extra fields."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'time': self.formatTime(record),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RESERVED_ATTRS and not key.startswith('_'):
+                entry[key] = value
+        if record.exc_text:
+            entry['exception'] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+def configure_logging(level: str = LOG_LEVEL, fmt: str = LOG_FORMAT, sample_rate: float = LOG_SAMPLE_RATE,
+                      max_payload: int = LOG_MAX_PAYLOAD, stream=None) -> None:
+    """
+    Configure the root logger with a queue handler and a background listener.
+    Calling it again replaces the previous configuration.
+
+    Args:
+        level: Root log level name
+        fmt: 'text' or 'json'
+        sample_rate: Share of domains whose INFO and DEBUG records are kept
+        max_payload: Maximum message length in characters (0 disables the cap)
+        stream: Output stream (default stderr)
+    """
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+
+    output = logging.StreamHandler(stream or sys.stderr)
+    output.setFormatter(JsonFormatter() if fmt == 'json' else logging.Formatter(TEXT_FORMAT))
+
+    log_queue: queue.Queue = queue.SimpleQueue()
+    handler = CappedQueueHandler(log_queue, max_payload)
+    handler.addFilter(DomainSamplingFilter(sample_rate))
+
+    root = logging.getLogger()
+    for existing in list(root.handlers):
+        root.removeHandler(existing)
+    root.addHandler(handler)
+    root.setLevel(level)
+
+    _listener = logging.handlers.QueueListener(log_queue, output, respect_handler_level=True)
+    _listener.start()
+
+
+def configure_child_logging() -> None:
+    """Configure logging in a worker process; a forked worker's copy of the listener has no thread."""
+    global _listener
+    _listener = None
+    configure_logging()
+
+
+def shutdown_logging() -> None:
+    """Flush queued records and stop the listener thread."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+atexit.register(shutdown_logging)
@@ -7,45 +7,65 @@ import os
 sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))  # DON'T CHANGE THIS !!!
 
 from flask import Flask, render_template, request, jsonify, Response
-import asyncio
 import json
+import time
 import traceback
-from io import BytesIO
-from weasyprint import HTML, CSS
-from datetime import datetime
 import logging
 
-# Import our domain checker modules
-from src.domain_checker import DomainChecker, normalize_brand_name, DomainSuggestionGenerator
-from src.browser_providers import create_godaddy_browser_provider
+# Import our domain checker modules; providers, PDF rendering and the suggestion engine
+# load their heavier dependencies on first use
+from src.services import get_services
+from src.scheduler import Priority, request_tenant
+from src.tld_registry import get_tld_registry
+from src.pdf_report import render_report_pdf
+from src.job_store import job_store, JOB_STORE_MIN_DOMAINS
+from src.history_store import HISTORY_MAX_AGE
+from src.results import RESULTS_INCLUDE_RAW
+from src.watchlist import get_watchlist
+from src.async_runtime import iterate_async, submit_coroutine
+from src.metrics import SSE_STREAMS_ACTIVE, SSE_STREAM_DURATION
+from src.routes.metrics import metrics_bp
+from src.routes.admin import admin_bp
+from src.routes.jobs import jobs_bp
+from src.routes.history import history_bp
+from src.routes.watchlist import watchlist_bp
+from src.routes.api import api_bp
+from src.routes.upload import upload_bp
+from src.profiling import profiler
+from src.logging_config import configure_logging
 
-# Configure logging
-logging.basicConfig(level=logging.INFO, 
-                   format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+# Configure logging once for the whole process (see src/logging_config.py)
+configure_logging()
 logger = logging.getLogger(__name__)
 
 app = Flask(__name__)
 app.config['SECRET_KEY'] = 'domain_checker_secret_key'
+app.register_blueprint(metrics_bp)
+app.register_blueprint(admin_bp)
+app.register_blueprint(jobs_bp)
+app.register_blueprint(history_bp)
+app.register_blueprint(watchlist_bp)
+app.register_blueprint(api_bp)
+app.register_blueprint(upload_bp)
 
-# List of TLDs to check
-DEFAULT_TLDS = ['.com', '.net', '.org', '.io', '.ai', '.com.br']
+# SIGUSR1 toggles process-wide profiling
+profiler.install_signal_handler()
 
-# Initialize the domain checker
-domain_checker = DomainChecker()
+# List of TLDs to check, from the bundled TLD registry
+DEFAULT_TLDS = get_tld_registry().default_tlds()
 
-# Add GoDaddy Browser provider
-try:
-    godaddy_browser = create_godaddy_browser_provider(headless=True, timeout=60, max_retries=2)
-    domain_checker.add_provider(godaddy_browser)
-    logger.info("GoDaddy Browser provider added to domain checker")
-except Exception as e:
-    logger.error(f"Failed to add GoDaddy Browser provider: {str(e)}")
-    logger.warning("Domain checker will use WHOIS only")
+# Requests with at most this many unique domains are scheduled as interactive
+INTERACTIVE_MAX_DOMAINS = int(os.environ.get('INTERACTIVE_MAX_DOMAINS', '10'))
+
+# The watchlist scheduler needs the checker from the start rather than from the first request
+if get_watchlist() is not None:
+    get_services()
 
 @app.route('/')
 def index():
     """Render the main page with the domain input form."""
     # Get the list of active providers
+    domain_checker, _, _ = get_services()
     providers = [p.source_name for p in domain_checker.providers]
     return render_template('index.html', tlds=DEFAULT_TLDS, providers=providers)
 
@@ -55,8 +75,38 @@ def stream_check_domains():
     # Capture form data before starting the stream
     form_data = dict(request.form)
     selected_tlds = request.form.getlist('tlds')
+    tenant = request_tenant(request.headers, request.remote_addr)
+    profile = profiler.requested(request.headers)
+    # Results recorded in the check history within max_age seconds are reused without checking again
+    try:
+        max_age = float(request.form.get('max_age', HISTORY_MAX_AGE))
+    except ValueError:
+        max_age = HISTORY_MAX_AGE
+    # Columnar copy of a large run's results, closed as incomplete if the stream is cut short
+    job = None
+    # Unique domains of the run after deduplication, reported with its profile
+    unique_checks = None
     
     def generate():
+        # Count the stream from its first byte to its last, including early disconnects
+        started = time.perf_counter()
+        SSE_STREAMS_ACTIVE.inc()
+        session = profiler.session('stream-check').start() if profile else None
+        try:
+            yield from generate_events()
+        finally:
+            SSE_STREAMS_ACTIVE.dec()
+            SSE_STREAM_DURATION.observe(time.perf_counter() - started)
+            if job is not None:
+                job.close('incomplete')
+            if session is not None:
+                session.domain_count = unique_checks
+                session.stop()
+    
+    def generate_events():
+        nonlocal job, unique_checks
+        domain_checker, batch_checker, suggestion_engine = get_services()
+        
         # Use the captured form data here
         brand_names = form_data.get('brand_names', '').strip().split('\n')
         
@@ -67,76 +117,101 @@ def stream_check_domains():
         # Clean brand names (remove empty lines and whitespace)
         brand_names = [name.strip() for name in brand_names if name.strip()]
         
-        # Initialize progress tracking
-        total_checks = len(brand_names) * len(selected_tlds)
-        current_check = 0
+        # Collapse identical normalized domains so each one is checked only once
+        plan = batch_checker.plan(brand_names, selected_tlds)
+        unique_checks = plan.unique_checks
+        completed_checks = 0
+        
+        # Small requests jump ahead of bulk work in the scheduler
+        priority = Priority.INTERACTIVE if unique_checks <= INTERACTIVE_MAX_DOMAINS else Priority.BATCH
         
         # Check domains and get results
-        results = []
+        results = [{'brand': brand, 'domains': [None] * len(selected_tlds), 'suggestions': []}
+                   for brand in brand_names]
         errors = []
         
-        for brand_idx, brand in enumerate(brand_names):
-            try:
-                # Send progress update
-                progress_percent = int((brand_idx / len(brand_names)) * 100)
-                yield f"data: {json.dumps({'progress': progress_percent, 'status': f'Processing brand: {brand}'})}\n\n"
+        # Speculative suggestion checks start as soon as all of a brand's domains are known
+        remaining_slots = [len(selected_tlds)] * len(brand_names)
+        suggestion_futures = {}
+        
+        # Large runs are also stored column-wise for Parquet/Arrow/CSV export
+        if unique_checks >= JOB_STORE_MIN_DOMAINS:
+            job = job_store.create([p.source_name for p in domain_checker.providers],
+                                   {'brands': len(brand_names), 'tlds': selected_tlds, 'domains': unique_checks})
+        
+        yield f"data: {json.dumps({'progress': 0, 'status': f'Checking {unique_checks} unique domains for {len(brand_names)} brands'})}\n\n"
+        
+        # Invalid domains from the plan's pre-flight come back first, without a check
+        stream = batch_checker.stream(list(plan.domains), priority, tenant, max_age, plan.rejected)
+        for domain, result, error in iterate_async(stream):
+            completed_checks += 1
+            progress_percent = int((completed_checks / unique_checks) * 100) if unique_checks else 100
+            
+            if error is not None:
+                error_msg = f"Error checking domain {domain}: {error}"
+                errors.append(error_msg)
+                yield f"data: {json.dumps({'error': error_msg})}\n\n"
                 
-                brand_result = {
-                    'brand': brand,
-                    'domains': [],
-                    'suggestions': []
+                # Add domain with error status
+                domain_result = {
+                    'domain': domain,
+                    'available': False,
+                    'confidence': 0.0,
+                    'status': 'error',
+                    'error': error
                 }
+            else:
+                domain_result = {
+                    'domain': domain,
+                    'available': result.available,
+                    'confidence': result.confidence,
+                    'status': result.status.value,
+                    'sources': [source.to_dict(RESULTS_INCLUDE_RAW) for source in result.sources],
+                    'conflicting_results': result.conflicting_results
+                }
+                # Domains rejected before any network call carry the reason
+                if result.error:
+                    domain_result['error'] = result.error
+                # Span breakdown, when TRACE_TIMINGS is enabled
+                if result.timings:
+                    domain_result['timings'] = result.timings
+                # Time of the original check for results reused from history
+                if result.checked_at is not None:
+                    domain_result['checked_at'] = result.checked_at
+            
+            if job is not None:
+                job.append(domain, [(brand_names[b], selected_tlds[t]) for b, t in plan.owners(domain)],
+                           result, error)
+            
+            # Map the shared result back to every input line that asked for this domain
+            for brand_idx, tld_idx in plan.owners(domain):
+                results[brand_idx]['domains'][tld_idx] = dict(domain_result)
+                remaining_slots[brand_idx] -= 1
                 
-                # Normalize brand name for domain use
-                normalized_brand = normalize_brand_name(brand)
-                
-                # Check each selected TLD
-                for tld_idx, tld in enumerate(selected_tlds):
-                    try:
-                        domain = f"{normalized_brand}{tld}"
-                        
-                        # Send progress update for domain check
-                        yield f"data: {json.dumps({'progress': progress_percent, 'status': f'Checking domain: {domain}'})}\n\n"
-                        
-                        # Use the multi-source domain checker
-                        result = asyncio.run(domain_checker.check_domain(domain))
-                        
-                        # Add to results
-                        domain_result = {
-                            'domain': domain,
-                            'available': result['available'],
-                            'confidence': result['confidence'],
-                            'status': result['status'],
-                            'sources': result['sources'],
-                            'conflicting_results': result['conflicting_results']
-                        }
-                        
-                        brand_result['domains'].append(domain_result)
-                        
-                        current_check += 1
-                        
-                    except Exception as e:
-                        error_msg = f"Error checking domain {normalized_brand}{tld}: {str(e)}"
-                        errors.append(error_msg)
-                        yield f"data: {json.dumps({'error': error_msg})}\n\n"
-                        
-                        # Add domain with error status
-                        brand_result['domains'].append({
-                            'domain': f"{normalized_brand}{tld}",
-                            'available': False,
-                            'confidence': 0.0,
-                            'status': 'error',
-                            'error': str(e)
-                        })
-                
-                # Generate suggestions for unavailable domains
-                unavailable_domains = [d for d in brand_result['domains'] if not d.get('available')]
-                if unavailable_domains:
+                # Kick off suggestion checks for brands with unavailable domains; bulk runs skip
+                # them, so their completion does not wait behind their own speculative checks
+                brand_domains = results[brand_idx]['domains']
+                if (priority is not Priority.BATCH and remaining_slots[brand_idx] == 0
+                        and any(not d.get('available') for d in brand_domains)):
+                    normalized_brand = plan.normalized_brands[brand_idx]
+                    if normalized_brand not in suggestion_futures:
+                        suggestion_futures[normalized_brand] = submit_coroutine(
+                            suggestion_engine.suggest(normalized_brand, selected_tlds, tenant=tenant,
+                                                      max_age=max_age))
+            
+            if result is not None:
+                suggestion_engine.observe(domain, result.available)
+            
+            yield f"data: {json.dumps({'progress': progress_percent, 'status': f'Checked domain: {domain}'})}\n\n"
+        
+        for brand_idx, brand_result in enumerate(results):
+            brand = brand_result['brand']
+            try:
+                # Collect the checked suggestions for unavailable domains
+                suggestion_future = suggestion_futures.get(plan.normalized_brands[brand_idx])
+                if suggestion_future is not None:
                     yield f"data: {json.dumps({'status': f'Generating suggestions for {brand}'})}\n\n"
-                    brand_result['suggestions'] = DomainSuggestionGenerator.generate_suggestions(
-                        normalized_brand, selected_tlds)
-                
-                results.append(brand_result)
+                    brand_result['suggestions'] = suggestion_future.result()
                 
             except Exception as e:
                 error_msg = f"Error processing brand {brand}: {str(e)}"
@@ -145,7 +220,12 @@ def stream_check_domains():
                 traceback.print_exc()
         
         # Send completion status
-        yield f"data: {json.dumps({'progress': 100, 'status': 'Completed', 'results': results, 'errors': errors})}\n\n"
+        completion = {'progress': 100, 'status': 'Completed', 'results': results, 'errors': errors}
+        if job is not None:
+            job.close()
+            completion['job_id'] = job.job_id
+            job = None
+        yield f"data: {json.dumps(completion)}\n\n"
     
     return Response(generate(), mimetype='text/event-stream')
 
@@ -160,138 +240,8 @@ def generate_pdf():
         
         results = data['results']
         
-        # Create HTML content for PDF
-        html_content = f"""
-        <!DOCTYPE html>
-        <html>
-        <head>
-            <meta charset="UTF-8">
-            <title>Domain Availability Report</title>
-            <style>
-                body {{ font-family: Arial, sans-serif; margin: 20px; }}
-                h1 {{ color: #2541b2; text-align: center; }}
-                .timestamp {{ text-align: center; color: #666; margin-bottom: 30px; }}
-                .brand-section {{ margin-bottom: 30px; }}
-                .brand-name {{ font-size: 18px; font-weight: bold; margin-bottom: 10px; }}
-                .domain-table {{ width: 100%; border-collapse: collapse; margin-bottom: 15px; }}
-                .domain-table th, .domain-table td {{ border: 1px solid #ddd; padding: 8px; text-align: left; }}
-                .domain-table th {{ background-color: #f2f2f2; }}
-                .available {{ color: green; }}
-                .unavailable {{ color: red; }}
-                .uncertain {{ color: orange; }}
-                .error {{ color: #ff6b6b; }}
-                .confidence {{ font-size: 12px; color: #666; }}
-                .high-confidence {{ font-weight: bold; }}
-                .medium-confidence {{ font-style: italic; }}
-                .low-confidence {{ font-style: italic; color: #999; }}
-                .sources {{ font-size: 11px; color: #666; margin-top: 3px; }}
-                .suggestions-title {{ font-weight: bold; margin-top: 15px; }}
-                .suggestions {{ margin-top: 5px; }}
-                .suggestion-item {{ display: inline-block; background-color: #f8f9fa; padding: 5px 10px; 
-                                   margin-right: 5px; margin-bottom: 5px; border-radius: 3px; }}
-            </style>
-        </head>
-        <body>
-            <h1>Domain Availability Report</h1>
-            <div class="timestamp">Generated on {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}</div>
-        """
-        
-        for result in results:
-            brand = result['brand']
-            domains = result['domains']
-            suggestions = result.get('suggestions', [])
-            
-            html_content += f"""
-            <div class="brand-section">
-                <div class="brand-name">{brand}</div>
-                <table class="domain-table">
-                    <tr>
-                        <th>Domain</th>
-                        <th>Status</th>
-                        <th>Confidence</th>
-                        <th>Sources</th>
-                    </tr>
-            """
-            
-            for domain in domains:
-                # Determine status class
-                status_class = "unavailable"
-                status_text = "Unavailable"
-                
-                if domain.get('status') == 'error':
-                    status_class = "error"
-                    status_text = "Error"
-                elif domain.get('available'):
-                    status_class = "available"
-                    status_text = "Available"
-                elif domain.get('status') and 'uncertain' in domain.get('status'):
-                    status_class = "uncertain"
-                    status_text = "Uncertain"
-                
-                # Determine confidence class
-                confidence = domain.get('confidence', 0.0)
-                confidence_class = "low-confidence"
-                if confidence >= 0.8:
-                    confidence_class = "high-confidence"
-                elif confidence >= 0.5:
-                    confidence_class = "medium-confidence"
-                
-                # Format confidence as percentage
-                confidence_text = f"{int(confidence * 100)}%"
-                
-                # Format sources
-                sources = domain.get('sources', [])
-                sources_text = ", ".join([s.get('source', 'Unknown') for s in sources if s.get('error') is None])
-                if not sources_text:
-                    sources_text = "No valid sources"
-                
-                html_content += f"""
-                    <tr>
-                        <td>{domain['domain']}</td>
-                        <td class="{status_class}">{status_text}</td>
-                        <td class="confidence {confidence_class}">{confidence_text}</td>
-                        <td class="sources">{sources_text}</td>
-                    </tr>
-                """
-                
-                # Add error message if present
-                if domain.get('error'):
-                    html_content += f"""
-                    <tr>
-                        <td colspan="4" class="error">Error: {domain['error']}</td>
-                    </tr>
-                    """
-            
-            html_content += """
-                </table>
-            """
-            
-            if suggestions:
-                html_content += """
-                <div class="suggestions-title">Alternative Suggestions:</div>
-                <div class="suggestions">
-                """
-                
-                for suggestion in suggestions:
-                    html_content += f'<span class="suggestion-item">{suggestion}</span>'
-                
-                html_content += """
-                </div>
-                """
-            
-            html_content += """
-            </div>
-            """
-        
-        html_content += """
-        </body>
-        </html>
-        """
-        
         # Generate PDF
-        pdf_buffer = BytesIO()
-        HTML(string=html_content).write_pdf(pdf_buffer)
-        pdf_buffer.seek(0)
+        pdf_buffer = render_report_pdf(results)
         
         # Return PDF as response
         return Response(
@@ -0,0 +1,376 @@
+"""
+Prometheus metrics for the domain checker.
+This module holds a small in-process metrics registry (counters, gauges and histograms
+with labels) and renders it in the Prometheus text exposition format. Updates are a
+dict lookup and an addition under a per-metric lock, so instrumentation can stay on at
+full throughput.
+"""
+
+import abc
+import time
+import asyncio
+import bisect
+import logging
+import threading
+from typing import Dict, List, Any, Optional, Tuple, Callable, Iterator
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Bucket bounds in seconds, from fast WHOIS answers to slow browser checks
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+WAIT_BUCKETS = (0.0, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+STREAM_BUCKETS = (0.1, 0.5, 1.0, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0, 600.0, 1800.0)
+
+
+class _Metric(abc.ABC):
+    """Base class of labelled metrics."""
+
+    kind = ''
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._children: Dict[Tuple[str, ...], Any] = {}
+
+    def labels(self, *values: Any):
+        """Return the child metric of a label combination, creating it on first use."""
+        key = tuple(str(v) for v in values)
+        child = self._children.get(key)
+        if child is None:
+            if len(key) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}, got {key}")
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+
+    @abc.abstractmethod
+    def _new_child(self):
+        pass
+
+    def _label_text(self, key: Tuple[str, ...], extra: Optional[Tuple[str, str]] = None) -> str:
+        pairs = list(zip(self.labelnames, key))
+        if extra is not None:
+            pairs.append(extra)
+        if not pairs:
+            return ''
+        return '{' + ','.join(f'{k}="{_escape(v)}"' for k, v in pairs) + '}'
+
+    @abc.abstractmethod
+    def samples(self) -> Iterator[Tuple[str, str, float]]:
+        """Yield (name suffix, label text, value) for every child."""
+        pass
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for suffix, labels, value in self.samples():
+            lines.append(f"{self.name}{suffix}{labels} {_format_value(value)}")
+        return lines
+
+
+class _CounterChild:
+    __slots__ = ('_value', '_lock')
+
+    def __init__(self):
+        self._value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self._value += amount
+
+    @property
+    def value(self) -> float:
+        return self._value
+
+
+class Counter(_Metric):
+    """Monotonically increasing counter."""
+
+    kind = 'counter'
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount: float = 1.0) -> None:
+        """Increment the unlabelled counter."""
+        self.labels().inc(amount)
+
+    def total(self) -> float:
+        """Return the sum of the counter over all label values."""
+        return sum(child.value for child in list(self._children.values()))
+
+    def samples(self):
+        for key, child in list(self._children.items()):
+            yield '_total', self._label_text(key), child.value
+
+
+class _GaugeChild:
+    __slots__ = ('_value', '_lock', '_function')
+
+    def __init__(self):
+        self._value = 0.0
+        self._lock = threading.Lock()
+        self._function: Optional[Callable[[], float]] = None
+
+    def inc(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self._value += amount
+
+    def dec(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self._value -= amount
+
+    def set(self, value: float) -> None:
+        self._value = float(value)
+
+    def set_function(self, function: Callable[[], float]) -> None:
+        """Compute the value when metrics are collected instead of on every change."""
+        self._function = function
+
+    @property
+    def value(self) -> float:
+        if self._function is not None:
+            try:
+                return float(self._function())
+            except Exception as e:
+                logger.warning(f"Gauge callback failed: {str(e)}")
+                return float('nan')
+        return self._value
+
+
+class Gauge(_Metric):
+    """Value that can go up and down, or be computed at collection time."""
+
+    kind = 'gauge'
+
+    def _new_child(self):
+        return _GaugeChild()
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.labels().inc(amount)
+
+    def dec(self, amount: float = 1.0) -> None:
+        self.labels().dec(amount)
+
+    def set(self, value: float) -> None:
+        self.labels().set(value)
+
+    def set_function(self, function: Callable[[], float]) -> None:
+        self.labels().set_function(function)
+
+    def samples(self):
+        for key, child in list(self._children.items()):
+            yield '', self._label_text(key), child.value
+
+
+class _HistogramChild:
+    __slots__ = ('_bounds', '_counts', '_sum', '_lock')
+
+    def __init__(self, bounds: Tuple[float, ...]):
+        self._bounds = bounds
+        # One count per bound plus the +Inf bucket (not cumulative until rendered)
+        self._counts = [0] * (len(bounds) + 1)
+        self._sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        index = bisect.bisect_left(self._bounds, value)
+        with self._lock:
+            self._counts[index] += 1
+            self._sum += value
+
+    def time(self) -> '_Timer':
+        """Return a context manager observing the duration of its block."""
+        return _Timer(self)
+
+    def snapshot(self) -> Tuple[List[int], float]:
+        with self._lock:
+            return list(self._counts), self._sum
+
+
+class Histogram(_Metric):
+    """Distribution of observed values over fixed buckets."""
+
+    kind = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (),
+                 buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value: float) -> None:
+        self.labels().observe(value)
+
+    def time(self) -> '_Timer':
+        return self.labels().time()
+
+    def samples(self):
+        for key, child in list(self._children.items()):
+            counts, total = child.snapshot()
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                yield '_bucket', self._label_text(key, ('le', _format_value(bound))), cumulative
+            yield '_sum', self._label_text(key), total
+            yield '_count', self._label_text(key), cumulative
+
+
+class _Timer:
+    """Context manager observing elapsed wall time into a histogram child."""
+
+    __slots__ = ('_child', '_start')
+
+    def __init__(self, child: _HistogramChild):
+        self._child = child
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._child.observe(time.perf_counter() - self._start)
+        return False
+
+
+class MetricsRegistry:
+    """Collection of metrics rendered together."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics: Dict[str, _Metric] = {}
+
+    def register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric {metric.name} is already registered")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()) -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (),
+                  buckets: Tuple[float, ...] = LATENCY_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self) -> str:
+        """Render every metric in the Prometheus text exposition format."""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    if value != value:
+        return 'NaN'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def error_cause(error: BaseException) -> str:
+    """Classify an exception into a low-cardinality cause label."""
+    if isinstance(error, (asyncio.TimeoutError, TimeoutError)) or 'Timeout' in type(error).__name__:
+        return 'timeout'
+    if 'Banned' in type(error).__name__:
+        return 'banned'
+    if isinstance(error, (ConnectionError, OSError)) or 'Connection' in type(error).__name__:
+        return 'connection'
+    if isinstance(error, ValueError):
+        return 'parse'
+    return 'exception'
+
+
+# Process-wide registry exported at /metrics
+registry = MetricsRegistry()
+
+CHECKS = registry.counter(
+    'domain_checks', 'Domain checks completed, by reconciled status', ('status',))
+CHECKS_IN_PROGRESS = registry.gauge(
+    'domain_checks_in_progress', 'Domain checks currently holding a scheduler slot')
+CHECK_LATENCY = registry.histogram(
+    'domain_check_duration_seconds', 'Time to check a domain across all its providers')
+PROVIDER_LATENCY = registry.histogram(
+    'domain_provider_duration_seconds', 'Time taken by a provider to answer', ('provider',))
+PROVIDER_TLD_LATENCY = registry.histogram(
+    'domain_provider_tld_duration_seconds', 'Time taken by a provider to answer, by TLD', ('provider', 'tld'))
+PROVIDER_ERRORS = registry.counter(
+    'domain_provider_errors', 'Provider errors by cause (timeout, connection, parse, rate_limited, ...)',
+    ('provider', 'cause'))
+CACHE_REQUESTS = registry.counter(
+    'domain_check_cache_requests', 'Lookups of reusable check results, by cache and hit or miss',
+    ('cache', 'result'))
+RATE_LIMIT_WAIT = registry.histogram(
+    'rate_limiter_wait_seconds', 'Time spent waiting for an upstream rate limit', ('upstream',), WAIT_BUCKETS)
+SCHEDULER_QUEUED = registry.gauge(
+    'scheduler_queued_checks', 'Checks waiting for a scheduler slot', ('priority',))
+SCHEDULER_RUNNING = registry.gauge(
+    'scheduler_running_checks', 'Checks holding a scheduler slot', ('priority',))
+BROWSER_PAGES = registry.gauge(
+    'browser_pages_open', 'Browser pages currently open', ('provider',))
+BROWSER_INSTANCES = registry.gauge(
+    'browser_instances', 'Launched browser instances', ('provider',))
+BROWSER_READY_PAGES = registry.counter(
+    'browser_ready_pages', 'Browser checks, by whether a page was waiting at the search form (hit, miss)',
+    ('provider', 'outcome'))
+BROWSER_CONSENT_WALLS = registry.counter(
+    'browser_consent_walls', 'Cookie-consent walls the browser accepted', ('provider',))
+BROWSER_STATE_SAVES = registry.counter(
+    'browser_state_saves', 'Browser storage states saved, by reason (warm_up, consent, refresh)', ('provider', 'reason'))
+SSE_STREAMS_ACTIVE = registry.gauge(
+    'sse_streams_active', 'Server-sent event streams currently open')
+SSE_STREAM_DURATION = registry.histogram(
+    'sse_stream_duration_seconds', 'Lifetime of server-sent event streams', (), STREAM_BUCKETS)
+UPLOADS = registry.counter(
+    'brand_uploads', 'Brand-list uploads, by format and outcome (complete, failed)', ('format', 'outcome'))
+UPLOAD_BYTES = registry.counter(
+    'brand_upload_bytes', 'Bytes of brand-list uploads read', ('format',))
+ADAPTIVE_LIMIT = registry.gauge(
+    'provider_concurrency_limit', 'Adaptive in-flight limit of a provider upstream', ('provider', 'upstream'))
+ADAPTIVE_IN_FLIGHT = registry.gauge(
+    'provider_in_flight', 'Queries in flight to a provider upstream', ('provider', 'upstream'))
+ADAPTIVE_LIMIT_CHANGES = registry.counter(
+    'provider_concurrency_limit_changes',
+    'Changes of adaptive limits, by reason (healthy, timeout, throttled, connection, latency)',
+    ('provider', 'upstream', 'reason'))
+CPU_POOL_TASKS = registry.counter(
+    'cpu_pool_tasks', 'CPU-bound steps run, by task and where they ran (process, thread)', ('task', 'executor'))
+CPU_POOL_DURATION = registry.histogram(
+    'cpu_pool_task_duration_seconds', 'Time to run a CPU-bound step, waiting for a worker included', ('task',))
+EVENT_LOOP_LAG = registry.histogram(
+    'event_loop_lag_seconds', 'How late the shared event loop runs a timer', (), WAIT_BUCKETS)
+HEDGES = registry.counter(
+    'provider_hedges', 'Hedged provider queries, by outcome (won, lost, failed, over_budget)', ('provider', 'outcome'))
+HEDGE_DELAY = registry.histogram(
+    'provider_hedge_delay_seconds', 'Wait before a provider query was hedged', ('provider',))
+EGRESS_REQUESTS = registry.counter(
+    'egress_requests', 'Upstream queries by egress and outcome (ok, failed, banned)', ('egress', 'outcome'))
+EGRESS_IN_FLIGHT = registry.gauge(
+    'egress_in_flight', 'Upstream queries currently leasing an egress', ('egress',))
+EGRESS_HEALTH = registry.gauge(
+    'egress_health', 'Health score of an egress, from 0 (failing) to 1', ('egress',))
+EGRESS_BANS = registry.counter(
+    'egress_bans', 'Times an upstream refused an egress', ('egress', 'upstream'))
+WATCHLIST_CHECKS = registry.counter(
+    'watchlist_checks', 'Watchlist rechecks, by expiry phase of the domain', ('phase',))
+WATCHLIST_DUE = registry.gauge(
+    'watchlist_due_domains', 'Watched domains whose recheck is due')
@@ -0,0 +1,173 @@
+"""
+PDF report generation for domain availability results.
+WeasyPrint and its rendering stack are imported on the first report, so processes that
+never produce a PDF do not pay for them at startup. Rendering runs in the CPU pool, where
+each worker imports WeasyPrint once.
+"""
+
+from io import BytesIO
+from datetime import datetime
+from typing import Dict, List, Any
+
+from .cpu_pool import call_cpu
+
+
+def render_report_html(results: List[Dict[str, Any]]) -> str:
+    """
+    Build the HTML of the availability report.
+    
+    Args:
+        results: Results as sent by the /stream-check completion event
+        
+    Returns:
+        str: HTML document
+    """
+    html_content = f"""
+    <!DOCTYPE html>
+    <html>
+    <head>
+        <meta charset="UTF-8">
+        <title>Domain Availability Report</title>
+        <style>
+            body {{ font-family: Arial, sans-serif; margin: 20px; }}
+            h1 {{ color: #2541b2; text-align: center; }}
+            .timestamp {{ text-align: center; color: #666; margin-bottom: 30px; }}
+            .brand-section {{ margin-bottom: 30px; }}
+            .brand-name {{ font-size: 18px; font-weight: bold; margin-bottom: 10px; }}
+            .domain-table {{ width: 100%; border-collapse: collapse; margin-bottom: 15px; }}
+            .domain-table th, .domain-table td {{ border: 1px solid #ddd; padding: 8px; text-align: left; }}
+            .domain-table th {{ background-color: #f2f2f2; }}
+            .available {{ color: green; }}
+            .unavailable {{ color: red; }}
+            .uncertain {{ color: orange; }}
+            .error {{ color: #ff6b6b; }}
+            .confidence {{ font-size: 12px; color: #666; }}
+            .high-confidence {{ font-weight: bold; }}
+            .medium-confidence {{ font-style: italic; }}
+            .low-confidence {{ font-style: italic; color: #999; }}
+            .sources {{ font-size: 11px; color: #666; margin-top: 3px; }}
+            .suggestions-title {{ font-weight: bold; margin-top: 15px; }}
+            .suggestions {{ margin-top: 5px; }}
+            .suggestion-item {{ display: inline-block; background-color: #f8f9fa; padding: 5px 10px; 
+                               margin-right: 5px; margin-bottom: 5px; border-radius: 3px; }}
+        </style>
+    </head>
+    <body>
+        <h1>Domain Availability Report</h1>
+        <div class="timestamp">Generated on {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}</div>
+    """
+    
+    for result in results:
+        brand = result['brand']
+        domains = result['domains']
+        suggestions = result.get('suggestions', [])
+        
+        html_content += f"""
+        <div class="brand-section">
+            <div class="brand-name">{brand}</div>
+            <table class="domain-table">
+                <tr>
+                    <th>Domain</th>
+                    <th>Status</th>
+                    <th>Confidence</th>
+                    <th>Sources</th>
+                </tr>
+        """
+        
+        for domain in domains:
+            # Determine status class
+            status_class = "unavailable"
+            status_text = "Unavailable"
+            
+            if domain.get('status') == 'error':
+                status_class = "error"
+                status_text = "Error"
+            elif domain.get('available'):
+                status_class = "available"
+                status_text = "Available"
+            elif domain.get('status') and 'uncertain' in domain.get('status'):
+                status_class = "uncertain"
+                status_text = "Uncertain"
+            
+            # Determine confidence class
+            confidence = domain.get('confidence', 0.0)
+            confidence_class = "low-confidence"
+            if confidence >= 0.8:
+                confidence_class = "high-confidence"
+            elif confidence >= 0.5:
+                confidence_class = "medium-confidence"
+            
+            # Format confidence as percentage
+            confidence_text = f"{int(confidence * 100)}%"
+            
+            # Format sources
+            sources = domain.get('sources', [])
+            sources_text = ", ".join([s.get('source', 'Unknown') for s in sources if s.get('error') is None])
+            if not sources_text:
+                sources_text = "No valid sources"
+            
+            html_content += f"""
+                <tr>
+                    <td>{domain['domain']}</td>
+                    <td class="{status_class}">{status_text}</td>
+                    <td class="confidence {confidence_class}">{confidence_text}</td>
+                    <td class="sources">{sources_text}</td>
+                </tr>
+            """
+            
+            # Add error message if present
+            if domain.get('error'):
+                html_content += f"""
+                <tr>
+                    <td colspan="4" class="error">Error: {domain['error']}</td>
+                </tr>
+                """
+        
+        html_content += """
+            </table>
+        """
+        
+        if suggestions:
+            html_content += """
+            <div class="suggestions-title">Alternative Suggestions:</div>
+            <div class="suggestions">
+            """
+            
+            for suggestion in suggestions:
+                html_content += f'<span class="suggestion-item">{suggestion}</span>'
+            
+            html_content += """
+            </div>
+            """
+        
+        html_content += """
+        </div>
+        """
+    
+    html_content += """
+    </body>
+    </html>
+    """
+    
+    return html_content
+
+
+def render_report_pdf(results: List[Dict[str, Any]]) -> BytesIO:
+    """
+    Render the availability report as a PDF.
+    
+    Args:
+        results: Results as sent by the /stream-check completion event
+        
+    Returns:
+        BytesIO: PDF document, positioned at its start
+    """
+    # WeasyPrint holds the GIL for the whole layout; render in the CPU pool
+    return BytesIO(call_cpu(_write_pdf, results))
+
+
+def _write_pdf(results: List[Dict[str, Any]]) -> bytes:
+    """Render the report to PDF bytes; runs in the CPU pool."""
+    from weasyprint import HTML
+    
+    return HTML(string=render_report_html(results)).write_pdf()
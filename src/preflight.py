@@ -0,0 +1,193 @@
+"""
+Pre-flight normalization and validation of brand names and domains.
+Runs before any network call or scheduler slot is used:
+- brand names become ASCII labels with accents transliterated ("Café" -> "cafe") or, with
+  BRAND_IDN enabled and for TLDs that accept internationalized names, IDNA A-labels
+  ("Café" -> "xn--caf-dma")
+- typed domains lose protocol, www prefix and path with one precompiled pattern and are
+  converted to A-labels when they are not ASCII
+- whole lists are validated against the label, hyphen and per-TLD rules of the TLD
+  registry, so invalid names are rejected immediately with a reason
+Labels are cached per brand, so repeated brands in large lists are normalized once.
+"""
+
+import os
+import re
+import logging
+import unicodedata
+from typing import Dict, List, Iterable, Iterator, Optional, Set, Tuple
+
+from .tld_registry import TldRegistry, get_tld_registry, validate_label
+
+try:
+    import idna
+    IDNA_AVAILABLE = True
+except ImportError:
+    IDNA_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+# Whether non-ASCII brands are checked as IDNs on TLDs that accept them instead of transliterated
+BRAND_IDN = os.environ.get('BRAND_IDN', 'false').lower() == 'true'
+
+# Protocol and www prefixes of typed domains
+_PREFIX_RE = re.compile(r'^(?:https?://)?(?:www\.)?')
+# Everything but ASCII letters and digits
+_NON_ALNUM_RE = re.compile(r'[^a-z0-9]')
+# Letters that do not decompose into an ASCII letter and combining marks
+_TRANSLITERATIONS = str.maketrans({
+    'ß': 'ss', 'æ': 'ae', 'œ': 'oe', 'ø': 'o', 'ł': 'l', 'đ': 'd', 'ð': 'd', 'þ': 'th', 'ı': 'i', 'ħ': 'h',
+})
+
+
+def ascii_label(brand: str) -> str:
+    """Lowercase ASCII letters and digits of a brand name, with accented letters transliterated."""
+    if brand.isascii():
+        return _NON_ALNUM_RE.sub('', brand.lower())
+    text = unicodedata.normalize('NFKD', brand.lower().translate(_TRANSLITERATIONS))
+    # Dropping non-ASCII after NFKD removes the combining marks and keeps their base letters
+    return _NON_ALNUM_RE.sub('', text.encode('ascii', 'ignore').decode('ascii'))
+
+
+def unicode_label(brand: str) -> str:
+    """Lowercase letters, marks and digits of a brand name, in NFC."""
+    text = unicodedata.normalize('NFKC', brand).lower()
+    return unicodedata.normalize('NFC', ''.join(ch for ch in text if unicodedata.category(ch)[0] in 'LMN'))
+
+
+def idna_label(label: str) -> str:
+    """
+    A-label of a Unicode label (ASCII labels are returned as is).
+
+    Raises:
+        ValueError: If the label is not a valid internationalized name
+    """
+    if label.isascii():
+        return label
+    try:
+        if IDNA_AVAILABLE:
+            return idna.encode(label, uts46=True).decode('ascii')
+        return label.encode('idna').decode('ascii')
+    except UnicodeError as e:
+        raise ValueError(f"'{label}' is not a valid internationalized name: {e}") from e
+
+
+def normalize_domain(domain: str) -> str:
+    """Lowercase a typed domain, drop protocol, www prefix and path, and convert it to A-labels."""
+    domain = _PREFIX_RE.sub('', domain.strip().lower()).split('/', 1)[0]
+    if not domain.isascii():
+        try:
+            domain = '.'.join(idna_label(label) for label in domain.split('.'))
+        except ValueError:
+            # Left as typed, so validation rejects it with a reason
+            pass
+    return domain
+
+
+class Preflight:
+    """Normalizes brand lists into domains and rejects invalid domains before any check."""
+
+    def __init__(self, tld_registry: Optional[TldRegistry] = None, idn: bool = BRAND_IDN):
+        """
+        Args:
+            tld_registry: TLD rules used for validation and IDN support
+            idn: Check non-ASCII brands as IDNs on TLDs that accept them
+        """
+        self.tld_registry = tld_registry if tld_registry is not None else get_tld_registry()
+        self.idn = idn
+        # Per-brand caches, so repeated brands are normalized once
+        self._ascii: Dict[str, str] = {}
+        self._a_labels: Dict[str, Optional[str]] = {}
+        # A-labels produced by idna_label, which need no decoding check
+        self._encoded: Set[str] = set()
+
+    def ascii_label(self, brand: str) -> str:
+        """ASCII label of a brand (see ascii_label)."""
+        label = self._ascii.get(brand)
+        if label is None:
+            label = self._ascii[brand] = ascii_label(brand)
+        return label
+
+    def a_label(self, brand: str) -> Optional[str]:
+        """A-label of a non-ASCII brand, or None for ASCII brands and names IDNA rejects."""
+        if brand.isascii():
+            return None
+        try:
+            return self._a_labels[brand]
+        except KeyError:
+            pass
+        try:
+            label = idna_label(unicode_label(brand))
+        except ValueError:
+            label = ''
+        # Brands made only of symbols have no letters to encode
+        label = label if label.startswith('xn--') else None
+        if label is not None:
+            self._encoded.add(label)
+        self._a_labels[brand] = label
+        return label
+
+    def plan_domains(self, brands: List[str], tlds: List[str]) -> Iterator[Tuple[str, Optional[str]]]:
+        """
+        Yield (domain, reason it is invalid or None) for each brand on every TLD, brand by brand.
+        The domain uses the A-label where the TLD accepts IDNs, else the ASCII label.
+        """
+        tlds = [tld.lower() for tld in tlds]
+        infos = [self.tld_registry.get(tld) for tld in tlds]
+        accepts_idn = [self.idn and (info is None or info.idn) for info in infos]
+        # IDNA conversion is the costly step; skip it when no TLD of the batch can use it
+        any_idn = any(accepts_idn)
+        columns = list(zip(tlds, infos, accepts_idn))
+        label_reasons: Dict[str, Optional[str]] = {}
+        for brand in brands:
+            a_label = self.a_label(brand) if any_idn else None
+            ascii_form = self.ascii_label(brand)
+            for tld, info, idn in columns:
+                label = a_label if a_label is not None and idn else ascii_form
+                try:
+                    reason = label_reasons[label]
+                except KeyError:
+                    reason = label_reasons[label] = self._label_reason(label)
+                # Only labels outside the TLD's bounds need the full per-TLD check
+                if reason is None and info is not None and not (
+                        info.min_length <= len(label) <= info.max_length and (info.idn or not label.startswith('xn--'))):
+                    reason = self.tld_registry.validate_for_tld(label, info)
+                yield label + tld, reason
+
+    def _label_reason(self, label: str) -> Optional[str]:
+        reason = validate_label(label)
+        if reason is None and IDNA_AVAILABLE and label.startswith('xn--') and label not in self._encoded:
+            try:
+                idna.decode(label)
+            except (UnicodeError, ValueError):
+                return f"Label '{label}' is not a valid internationalized name"
+        return reason
+
+    def validate(self, domain: str) -> Optional[str]:
+        """Reason a normalized domain is invalid, or None if it looks registrable."""
+        if '.' not in domain:
+            return "Domain has no TLD"
+        label, info = self.tld_registry.split(domain)
+        return self._label_reason(label) or self.tld_registry.validate_for_tld(label, info)
+
+    def reject(self, domains: Iterable[str]) -> Dict[str, str]:
+        """Validate many domains at once; return {invalid domain: reason}."""
+        split = self.tld_registry.split
+        validate_for_tld = self.tld_registry.validate_for_tld
+        # A label is checked once against the shared rules, however many TLDs it is paired with
+        label_reasons: Dict[str, Optional[str]] = {}
+        rejected = {}
+        for domain in domains:
+            if '.' not in domain:
+                rejected[domain] = "Domain has no TLD"
+                continue
+            label, info = split(domain)
+            try:
+                reason = label_reasons[label]
+            except KeyError:
+                reason = label_reasons[label] = self._label_reason(label)
+            if reason is None:
+                reason = validate_for_tld(label, info)
+            if reason is not None:
+                rejected[domain] = reason
+        return rejected
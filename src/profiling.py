@@ -0,0 +1,269 @@
+"""
+On-demand profiling of live requests.
+This module profiles one /stream-check run (or any other job) when an admin asks for it
+with the X-Profile header, or the whole process between two
+SIGUSR1 signals. A session records:
+- a cProfile of the thread driving the request, saved as a .pstats file
+- a cProfile of the shared event loop's thread, where the checks run, saved as a second
+  .pstats file; it covers every task on the loop during the run, not only the request's
+- sampled stacks of every thread (the shared event loop and worker threads included),
+  saved in the collapsed format understood by flamegraph.pl and speedscope
+Artifacts are listed on the admin page with the domain count and timing of the run.
+"""
+
+import os
+import sys
+import hmac
+import time
+import uuid
+import signal
+import cProfile
+import logging
+import tempfile
+import threading
+from collections import Counter
+from dataclasses import dataclass, asdict
+from typing import Dict, List, Any, Optional
+
+logger = logging.getLogger(__name__)
+
+# Token required to request a profile or open the admin page; profiling is off without it
+ADMIN_TOKEN = os.environ.get('ADMIN_TOKEN')
+
+PROFILE_DIR = os.environ.get('PROFILE_DIR', os.path.join(tempfile.gettempdir(), 'domain-checker-profiles'))
+PROFILE_KEEP = int(os.environ.get('PROFILE_KEEP', '50'))
+PROFILE_SAMPLE_INTERVAL = float(os.environ.get('PROFILE_SAMPLE_INTERVAL', '0.01'))
+# Seconds to wait for the event loop to stop its cProfile before storing a session without it
+LOOP_PROFILE_TIMEOUT = 10.0
+
+
+def is_admin(token: Optional[str]) -> bool:
+    """Return whether a token grants admin access."""
+    return bool(ADMIN_TOKEN) and hmac.compare_digest((token or '').encode(), ADMIN_TOKEN.encode())
+
+
+@dataclass
+class ProfileRecord:
+    """A stored profile and what it covered."""
+    id: str
+    label: str
+    trigger: str
+    started_at: float
+    duration: float
+    domain_count: Optional[int]
+    artifacts: Dict[str, str]
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+class StackSampler:
+    """Background thread sampling the stacks of every thread at a fixed interval."""
+
+    def __init__(self, interval: float = PROFILE_SAMPLE_INTERVAL):
+        self.interval = interval
+        self.samples: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self._run, name='stack-sampler', daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _run(self) -> None:
+        own_id = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                stack.append(names.get(thread_id, str(thread_id)))
+                self.samples[';'.join(reversed(stack))] += 1
+
+    def collapsed(self) -> str:
+        """Return the samples in collapsed-stack format ("frame;frame;frame count" per line)."""
+        return ''.join(f"{stack} {count}\n" for stack, count in self.samples.most_common())
+
+
+class ProfileSession:
+    """
+    One profiling run: cProfile of the calling thread and of the event loop thread, plus
+    sampled stacks of all threads.
+    """
+
+    def __init__(self, profiler: 'Profiler', label: str, trigger: str, with_cprofile: bool = True):
+        self._profiler = profiler
+        self.label = label
+        self.trigger = trigger
+        self.domain_count: Optional[int] = None
+        self._cprofile = cProfile.Profile() if with_cprofile else None
+        self._loop_cprofile: Optional[cProfile.Profile] = None
+        self._with_loop = with_cprofile
+        self._sampler = StackSampler()
+        self._started_at = 0.0
+        self._start = 0.0
+
+    def start(self) -> 'ProfileSession':
+        self._started_at = time.time()
+        self._start = time.perf_counter()
+        self._sampler.start()
+        if self._cprofile is not None:
+            self._cprofile.enable()
+        # cProfile only follows the thread that enables it, so the loop thread gets its own;
+        # one session at a time can profile it
+        if self._with_loop and self._profiler.claim_loop():
+            self._loop_cprofile = cProfile.Profile()
+            self._on_loop(self._loop_cprofile.enable)
+        return self
+
+    def stop(self) -> ProfileRecord:
+        """Stop profiling and store the artifacts."""
+        if self._cprofile is not None:
+            self._cprofile.disable()
+        if self._loop_cprofile is not None:
+            if not self._on_loop(self._loop_cprofile.disable).wait(LOOP_PROFILE_TIMEOUT):
+                logger.warning("Event loop did not stop its profile in time; storing the request thread only")
+                self._loop_cprofile = None
+            self._profiler.release_loop()
+        self._sampler.stop()
+        duration = time.perf_counter() - self._start
+        return self._profiler.store(self, duration)
+
+    @staticmethod
+    def _on_loop(function) -> threading.Event:
+        """Run a function on the shared event loop's thread; the event is set once it ran."""
+        from .async_runtime import get_event_loop
+        done = threading.Event()
+
+        def call():
+            try:
+                function()
+            finally:
+                done.set()
+
+        get_event_loop().call_soon_threadsafe(call)
+        return done
+
+    def __enter__(self) -> 'ProfileSession':
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+        return False
+
+
+class Profiler:
+    """Creates profiling sessions and keeps the most recent artifacts on disk."""
+
+    def __init__(self, directory: str = PROFILE_DIR, keep: int = PROFILE_KEEP):
+        self.directory = directory
+        self.keep = keep
+        self._records: List[ProfileRecord] = []
+        self._lock = threading.Lock()
+        self._signal_session: Optional[ProfileSession] = None
+        self._loop_claimed = False
+
+    def requested(self, headers) -> bool:
+        """Return whether a request asks for a profile with a valid admin token (X-Profile header)."""
+        return is_admin(headers.get('X-Profile'))
+
+    def session(self, label: str, trigger: str = 'request', with_cprofile: bool = True) -> ProfileSession:
+        return ProfileSession(self, label, trigger, with_cprofile)
+
+    def claim_loop(self) -> bool:
+        """Reserve the event loop thread's profiler for a session; False if another has it."""
+        with self._lock:
+            if self._loop_claimed:
+                return False
+            self._loop_claimed = True
+            return True
+
+    def release_loop(self) -> None:
+        with self._lock:
+            self._loop_claimed = False
+
+    def store(self, session: ProfileSession, duration: float) -> ProfileRecord:
+        os.makedirs(self.directory, exist_ok=True)
+        profile_id = f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}"
+        artifacts = {}
+
+        collapsed_path = os.path.join(self.directory, f"{profile_id}.collapsed")
+        with open(collapsed_path, 'w', encoding='utf-8') as f:
+            f.write(session._sampler.collapsed())
+        artifacts['collapsed'] = collapsed_path
+
+        if session._cprofile is not None:
+            pstats_path = os.path.join(self.directory, f"{profile_id}.pstats")
+            session._cprofile.dump_stats(pstats_path)
+            artifacts['pstats'] = pstats_path
+
+        if session._loop_cprofile is not None:
+            loop_path = os.path.join(self.directory, f"{profile_id}.loop.pstats")
+            session._loop_cprofile.dump_stats(loop_path)
+            artifacts['loop_pstats'] = loop_path
+
+        record = ProfileRecord(id=profile_id, label=session.label, trigger=session.trigger,
+                               started_at=session._started_at, duration=duration,
+                               domain_count=session.domain_count, artifacts=artifacts)
+        with self._lock:
+            self._records.append(record)
+            expired = self._records[:-self.keep] if len(self._records) > self.keep else []
+            self._records = self._records[len(expired):]
+        for old in expired:
+            for path in old.artifacts.values():
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+        logger.info(f"Stored profile {profile_id} ({session.label}, {duration:.2f}s)")
+        return record
+
+    def records(self) -> List[ProfileRecord]:
+        """Return the stored profiles, most recent first."""
+        with self._lock:
+            return list(reversed(self._records))
+
+    def get(self, profile_id: str) -> Optional[ProfileRecord]:
+        with self._lock:
+            return next((r for r in self._records if r.id == profile_id), None)
+
+    def toggle_process_profile(self, *_) -> None:
+        """Start a process-wide profile, or stop and store the running one (SIGUSR1 handler)."""
+        from .metrics import CHECKS
+        if self._signal_session is None:
+            # cProfile only follows the thread that enables it, so rely on stack samples here
+            session = self.session('process', trigger='signal', with_cprofile=False)
+            session.domain_count = -int(CHECKS.total())
+            self._signal_session = session.start()
+            logger.info("Process-wide profiling started")
+        else:
+            session, self._signal_session = self._signal_session, None
+            session.domain_count += int(CHECKS.total())
+            # Store from a thread: signal handlers should return quickly
+            threading.Thread(target=session.stop, name='profile-store', daemon=True).start()
+            logger.info("Process-wide profiling stopped")
+
+    def install_signal_handler(self, signum: int = getattr(signal, 'SIGUSR1', 0)) -> bool:
+        """Toggle process-wide profiling on a signal; only possible from the main thread."""
+        if not signum:
+            return False
+        try:
+            signal.signal(signum, self.toggle_process_profile)
+            return True
+        except ValueError:
+            logger.warning("Profiling signal handler not installed: not running in the main thread")
+            return False
+
+
+# Process-wide profiler
+profiler = Profiler()
@@ -0,0 +1,73 @@
+"""
+Domain source provider registry.
+Providers are named in configuration and built by factories that import their module on
+first use, so optional stacks such as Playwright are only loaded when a provider needs them.
+"""
+
+import os
+import logging
+import importlib
+import importlib.util
+from typing import Dict, List, Any, Optional, Tuple
+
+from .domain_checker import DomainChecker, DomainSourceProvider
+
+logger = logging.getLogger(__name__)
+
+# Comma-separated providers used alongside WHOIS, which DomainChecker always includes
+DEFAULT_PROVIDERS = os.environ.get('DOMAIN_PROVIDERS', 'godaddy_browser')
+
+# name -> (module, factory, factory keyword arguments, module the provider cannot run without)
+PROVIDER_FACTORIES: Dict[str, Tuple[str, str, Dict[str, Any], Optional[str]]] = {
+    'godaddy_browser': ('src.browser_providers', 'create_godaddy_browser_provider',
+                        {'headless': True, 'timeout': 60, 'max_retries': 2}, 'playwright'),
+    'godaddy_api': ('src.registrar_apis', 'create_godaddy_provider', {}, 'aiohttp'),
+}
+
+
+def register_provider(name: str, module: str, factory: str, kwargs: Optional[Dict[str, Any]] = None,
+                      requires: Optional[str] = None) -> None:
+    """Register a provider factory by dotted module path and function name."""
+    PROVIDER_FACTORIES[name] = (module, factory, kwargs or {}, requires)
+
+
+def create_provider(name: str) -> Optional[DomainSourceProvider]:
+    """
+    Build a provider by name.
+
+    Returns:
+        The provider, or None if it is unknown, its dependency is missing or its factory declined
+    """
+    entry = PROVIDER_FACTORIES.get(name)
+    if entry is None:
+        logger.error(f"Unknown domain provider: {name}")
+        return None
+    module_name, factory_name, kwargs, requires = entry
+    # find_spec locates the package without importing it
+    if requires and importlib.util.find_spec(requires) is None:
+        logger.warning(f"Provider {name} needs {requires}, which is not installed")
+        return None
+    factory = getattr(importlib.import_module(module_name), factory_name)
+    return factory(**kwargs)
+
+
+def create_domain_checker(names: Optional[List[str]] = None) -> DomainChecker:
+    """
+    Build a DomainChecker with WHOIS plus the named providers (default DOMAIN_PROVIDERS).
+    Providers that cannot be built are skipped, as WHOIS alone still answers every check.
+    """
+    if names is None:
+        names = [name.strip() for name in DEFAULT_PROVIDERS.split(',') if name.strip()]
+    checker = DomainChecker()
+    for name in names:
+        try:
+            provider = create_provider(name)
+        except Exception as e:
+            logger.error(f"Failed to create provider {name}: {str(e)}")
+            provider = None
+        if provider is None:
+            logger.warning(f"Domain checker will run without provider {name}")
+            continue
+        checker.add_provider(provider)
+        logger.info(f"{provider.source_name} provider added to domain checker")
+    return checker
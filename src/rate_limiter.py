@@ -0,0 +1,73 @@
+"""
+Rate limiting for upstream queries.
+This module spaces out queries per upstream (e.g. per WHOIS host) with token buckets,
+so checks run as fast as each registry tolerates instead of sleeping a fixed delay.
+"""
+
+import time
+import asyncio
+import logging
+import threading
+from typing import Dict, Tuple
+
+from .metrics import RATE_LIMIT_WAIT
+
+logger = logging.getLogger(__name__)
+
+
+class RateLimiter:
+    """
+    Token-bucket rate limiter keyed by upstream.
+
+    Each call reserves the next free slot of its bucket under a lock and then sleeps
+    outside it, so concurrent callers are spaced out without blocking each other.
+    The limiter is thread-safe and can be shared between event loops.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # key -> (tokens available, time of last refill)
+        self._buckets: Dict[str, Tuple[float, float]] = {}
+
+    async def acquire(self, key: str, rate: float, burst: int = 1) -> float:
+        """
+        Wait until a query to an upstream is allowed.
+
+        Args:
+            key: Upstream identifier, e.g. the WHOIS host
+            rate: Sustained queries per second allowed for the upstream
+            burst: Number of queries allowed back to back
+
+        Returns:
+            float: Seconds spent waiting
+        """
+        if rate <= 0:
+            return 0.0
+
+        with self._lock:
+            now = time.monotonic()
+            tokens, last = self._buckets.get(key, (float(burst), now))
+            tokens = min(float(burst), tokens + (now - last) * rate) - 1.0
+            self._buckets[key] = (tokens, now)
+        # A negative balance is the time we owe the bucket
+        wait = -tokens / rate if tokens < 0 else 0.0
+        RATE_LIMIT_WAIT.labels(key).observe(wait)
+
+        if wait > 0:
+            logger.debug("Rate limiting %s: waiting %.2fs", key, wait)
+            await asyncio.sleep(wait)
+        return wait
+
+    def backlog(self, key: str, rate: float, burst: int = 1) -> float:
+        """Queries already reserved beyond the bucket's tokens, i.e. still waiting for their slot."""
+        if rate <= 0:
+            return 0.0
+        with self._lock:
+            now = time.monotonic()
+            tokens, last = self._buckets.get(key, (float(burst), now))
+        tokens = min(float(burst), tokens + (now - last) * rate)
+        return -tokens if tokens < 0 else 0.0
+
+
+# Shared by every provider in the process
+rate_limiter = RateLimiter()
@@ -0,0 +1,98 @@
+"""
+RDAP lookups.
+Registries publish the same registration data over RDAP (JSON over HTTPS) as over port-43
+WHOIS, on separate infrastructure, so an RDAP endpoint can answer when the WHOIS server is
+slow. This module queries a registry's RDAP domain endpoint and maps its answer to the
+details WhoisProvider reports.
+"""
+
+import json
+import logging
+from typing import Dict, Any, Optional, Tuple
+
+import aiohttp
+
+from .egress import Egress, EgressBanned, HttpSessions
+
+logger = logging.getLogger(__name__)
+
+# Largest RDAP response read
+MAX_RESPONSE_BYTES = 256 * 1024
+
+
+def rdap_url(base_url: str, domain: str) -> str:
+    """Domain lookup URL of an RDAP base URL."""
+    return f"{base_url.rstrip('/')}/domain/{domain}"
+
+
+async def query_rdap(url: str, timeout: float = 10.0, egress: Optional[Egress] = None,
+                     sessions: Optional[HttpSessions] = None) -> Tuple[bool, Dict[str, Any]]:
+    """
+    Look a domain up on an RDAP server.
+
+    Args:
+        url: Domain lookup URL (see rdap_url)
+        timeout: Overall timeout in seconds
+        egress: Route of the request (default direct)
+        sessions: Sessions the request reuses a connection from (default: a session for this query)
+
+    Returns:
+        tuple: (available, RDAP domain object; empty when available)
+
+    Raises:
+        EgressBanned: If the server refused the egress (403 through a proxy, 429)
+        ValueError: If the answer is neither a domain object nor "not found"
+    """
+    proxy = egress.proxy_url if egress is not None else None
+    own = sessions is None
+    if own:
+        sessions = HttpSessions()
+    try:
+        async with sessions.get(egress).get(url, headers={'Accept': 'application/rdap+json'}, proxy=proxy,
+                                            timeout=aiohttp.ClientTimeout(total=timeout)) as response:
+            status = response.status
+            body = await response.content.read(MAX_RESPONSE_BYTES)
+    finally:
+        if own:
+            await sessions.close()
+    if status == 404:
+        return True, {}
+    if status == 429 or (status == 403 and proxy is not None):
+        raise EgressBanned(f"RDAP server refused the query with HTTP {status}")
+    if status != 200:
+        raise ValueError(f"RDAP error {status}: {body[:200].decode('utf-8', errors='replace').strip()!r}")
+    try:
+        data = json.loads(body)
+    except ValueError:
+        raise ValueError(f"RDAP answer is not JSON: {body[:200].decode('utf-8', errors='replace').strip()!r}")
+    if not isinstance(data, dict) or data.get('objectClassName') != 'domain':
+        raise ValueError("RDAP answer is not a domain object")
+    return False, data
+
+
+def rdap_details(data: Dict[str, Any]) -> Dict[str, Any]:
+    """Return the fields of an RDAP domain object in the shape WhoisProvider reports as details."""
+    events = {event.get('eventAction'): event.get('eventDate') for event in data.get('events', ())
+              if isinstance(event, dict)}
+    registrar = None
+    for entity in data.get('entities', ()):
+        if isinstance(entity, dict) and 'registrar' in entity.get('roles', ()):
+            registrar = _vcard_name(entity.get('vcardArray'))
+            break
+    return {
+        'status': ', '.join(data.get('status', ())) or None,
+        'registrar': registrar,
+        'creation_date': events.get('registration'),
+        'expiration_date': events.get('expiration'),
+    }
+
+
+def _vcard_name(vcard: Any) -> Optional[str]:
+    """Formatted name ("fn") of a jCard."""
+    try:
+        for prop in vcard[1]:
+            if prop[0] == 'fn':
+                return prop[3]
+    except (TypeError, IndexError, KeyError):
+        pass
+    return None
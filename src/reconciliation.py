@@ -0,0 +1,346 @@
+"""
+Reconciliation of provider answers into one result per domain.
+Answers are laid out as domains x sources matrices (availability, confidence, weight, error
+mask), so a whole batch of domains is decided in a few vectorized NumPy passes. How domains
+whose sources disagree are decided is a pluggable policy, chosen with RECONCILE_POLICY:
+- registrar_priority (default): a weighted vote among registrar sources; WHOIS alone decides
+  by majority
+- weighted_vote: a weighted vote among all sources
+- quorum: the answer of the most sources, definitive only when at least RECONCILE_QUORUM
+  sources give it
+Domains whose sources agree get the weighted mean of their confidences under every policy
+(quorum marks them uncertain below the quorum). Each policy also decides a single domain in
+plain Python, which is faster than a one-row matrix for checks reconciled as they finish.
+Sums run source by source in answer order, so the matrix and single-domain paths give
+bit-for-bit equal results.
+"""
+
+import os
+import abc
+import logging
+from typing import Dict, List, Any, Optional, Tuple, Sequence
+
+import numpy as np
+
+from .results import Status, SourceResult, DomainResult
+
+logger = logging.getLogger(__name__)
+
+# Policy deciding domains whose sources disagree
+RECONCILE_POLICY = os.environ.get('RECONCILE_POLICY', 'registrar_priority')
+# Sources that must give the same answer for it to be definitive under the quorum policy
+RECONCILE_QUORUM = int(os.environ.get('RECONCILE_QUORUM', '2'))
+
+# Weight of a source no provider declares
+DEFAULT_WEIGHT = 0.5
+
+# Answer codes: unavailable, available, no availability (None), no valid answer (error)
+UNAVAILABLE, AVAILABLE, UNDECIDED, NO_ANSWER = 0, 1, 2, -1
+_CODES = (UNAVAILABLE, AVAILABLE, UNDECIDED)
+_AVAILABILITY = (False, True, None)
+
+# Status qualifiers
+PLAIN, CONFLICTED, UNCERTAIN = 0, 1, 2
+_QUALIFIERS = ('', '_conflicted', '_uncertain')
+# Status of each (answer code, qualifier)
+_STATUSES = {(code, qualifier): Status.of(_AVAILABILITY[code], _QUALIFIERS[qualifier])
+             for code in _CODES for qualifier in (PLAIN, CONFLICTED, UNCERTAIN)}
+
+
+def _answer_code(result: SourceResult) -> int:
+    if result.error is not None:
+        return NO_ANSWER
+    if result.available is None:
+        return UNDECIDED
+    return AVAILABLE if result.available else UNAVAILABLE
+
+
+class AnswerMatrix:
+    """Answers of domains that were checked by the same sources, in the same order."""
+
+    def __init__(self, rows: Sequence[Sequence[SourceResult]], weights: np.ndarray, registrars: np.ndarray):
+        """
+        Args:
+            rows: Source results of each domain
+            weights: Weight of each source (column)
+            registrars: Whether each source (column) is a registrar
+        """
+        count, width = len(rows), len(weights)
+        self.codes = np.array([_answer_code(r) for results in rows for r in results],
+                              dtype=np.int8).reshape(count, width)
+        self.confidence = np.array([r.confidence for results in rows for r in results],
+                                   dtype=np.float64).reshape(count, width)
+        self.valid = self.codes != NO_ANSWER
+        self.weights = weights
+        self.registrars = registrars
+        self.valid_count = self.valid.sum(axis=1)
+
+    def __len__(self) -> int:
+        return self.codes.shape[0]
+
+    @staticmethod
+    def column_sum(values: np.ndarray, mask: np.ndarray) -> np.ndarray:
+        """Per-domain sum of the masked values, added source by source like a Python sum()."""
+        total = np.zeros(mask.shape[0])
+        values = np.broadcast_to(values, mask.shape)
+        for column in range(mask.shape[1]):
+            total += np.where(mask[:, column], values[:, column], 0.0)
+        return total
+
+    def votes(self, mask: np.ndarray, weighted: bool = True) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Votes per answer code among the masked answers.
+
+        Returns:
+            tuple: (votes, first) arrays of domains x codes; votes of codes nobody gave are
+            -inf, first is the column of the first answer with the code
+        """
+        votes = np.empty((len(self), len(_CODES)))
+        first = np.empty((len(self), len(_CODES)), dtype=np.int64)
+        for code in _CODES:
+            given = mask & (self.codes == code)
+            votes[:, code] = self.column_sum(self.weights if weighted else 1.0, given)
+            votes[~given.any(axis=1), code] = -np.inf
+            first[:, code] = np.where(given.any(axis=1), given.argmax(axis=1), given.shape[1])
+        return votes, first
+
+    @staticmethod
+    def winner(votes: np.ndarray, first: np.ndarray) -> np.ndarray:
+        """Code with the most votes per domain; ties go to the code answered first."""
+        best = votes == votes.max(axis=1, keepdims=True)
+        return np.where(best, first, np.iinfo(np.int64).max).argmin(axis=1)
+
+
+class Decision:
+    """Availability code, confidence and status qualifier of each domain of a matrix."""
+
+    def __init__(self, answers: AnswerMatrix):
+        count = len(answers)
+        answered = answers.valid_count > 0
+        # First valid answer of each domain, and whether the other valid answers agree with it
+        first = answers.codes[np.arange(count), answers.valid.argmax(axis=1)] if answers.codes.size else \
+            np.full(count, NO_ANSWER, dtype=np.int8)
+        agree = ((answers.codes == first[:, None]) | ~answers.valid).all(axis=1)
+
+        total_weight = answers.column_sum(answers.weights, answers.valid)
+        weighted = answers.column_sum(answers.confidence * answers.weights, answers.valid)
+        mean = np.divide(weighted, total_weight, out=np.full(count, 0.5), where=total_weight > 0)
+
+        self.answered = answered
+        self.agreeing = answered & agree
+        self.conflicting = answered & ~agree
+        self.code = np.where(answered, first, NO_ANSWER).astype(np.int8)
+        self.confidence = np.where(self.agreeing, mean, 0.0)
+        self.qualifier = np.full(count, PLAIN, dtype=np.int8)
+
+    def set(self, rows: np.ndarray, code: Any, confidence: Any, qualifier: int) -> None:
+        self.code[rows] = np.broadcast_to(code, self.code.shape)[rows]
+        self.confidence[rows] = np.broadcast_to(confidence, self.confidence.shape)[rows]
+        self.qualifier[rows] = qualifier
+
+
+def _vote(codes: List[int], weights: List[float]) -> Tuple[Dict[int, float], int]:
+    """Votes per answer code, in order of first answer, and the winner (ties go to the first answered)."""
+    votes: Dict[int, float] = {}
+    for code, weight in zip(codes, weights):
+        votes[code] = votes.get(code, 0) + weight
+    return votes, max(votes.items(), key=lambda item: item[1])[0]
+
+
+class ReconcilePolicy(abc.ABC):
+    """
+    Decides the domains whose sources disagree.
+
+    decide() works on a matrix of domains and decide_one() on a single domain; both must
+    give the same results.
+    """
+
+    name = ''
+
+    @abc.abstractmethod
+    def decide(self, answers: AnswerMatrix, decision: Decision) -> None:
+        """Decide the conflicting domains of a matrix, updating its decision in place."""
+        pass
+
+    @abc.abstractmethod
+    def decide_one(self, codes: List[int], weights: List[float], registrars: List[bool],
+                   agreed: Optional[Tuple[int, float]]) -> Tuple[int, float, int]:
+        """
+        Decide one domain from its valid answers.
+
+        Args:
+            codes: Answer code of each valid answer
+            weights: Weight of each valid answer's source
+            registrars: Whether each valid answer's source is a registrar
+            agreed: (code, weighted mean confidence) when the answers agree, else None
+
+        Returns:
+            tuple: (answer code, confidence, qualifier)
+        """
+        pass
+
+
+class RegistrarPriorityPolicy(ReconcilePolicy):
+    """Weighted vote among registrar sources (confidence 0.7); WHOIS alone decides by majority (0.5)."""
+
+    name = 'registrar_priority'
+
+    def decide(self, answers: AnswerMatrix, decision: Decision) -> None:
+        registrar_answers = answers.valid & answers.registrars
+        by_registrars = decision.conflicting & registrar_answers.any(axis=1)
+        if by_registrars.any():
+            votes, first = answers.votes(registrar_answers)
+            decision.set(by_registrars, answers.winner(votes, first), 0.7, CONFLICTED)
+
+        by_majority = decision.conflicting & ~by_registrars
+        if by_majority.any():
+            available = answers.column_sum(1.0, answers.valid & (answers.codes == AVAILABLE))
+            majority = np.where(available > answers.valid_count - available, AVAILABLE, UNAVAILABLE)
+            decision.set(by_majority, majority, 0.5, UNCERTAIN)
+
+    def decide_one(self, codes, weights, registrars, agreed):
+        if agreed is not None:
+            return agreed[0], agreed[1], PLAIN
+        registrar_codes = [code for code, registrar in zip(codes, registrars) if registrar]
+        if registrar_codes:
+            _, winner = _vote(registrar_codes, [weight for weight, registrar in zip(weights, registrars) if registrar])
+            return winner, 0.7, CONFLICTED
+        available = sum(1 for code in codes if code == AVAILABLE)
+        return (AVAILABLE if available > len(codes) - available else UNAVAILABLE), 0.5, UNCERTAIN
+
+
+class WeightedVotePolicy(ReconcilePolicy):
+    """Weighted vote among all sources; confidence is the winning share of the weight."""
+
+    name = 'weighted_vote'
+
+    def decide(self, answers: AnswerMatrix, decision: Decision) -> None:
+        if not decision.conflicting.any():
+            return
+        votes, first = answers.votes(answers.valid)
+        winner = answers.winner(votes, first)
+        total = answers.column_sum(answers.weights, answers.valid)
+        share = np.divide(votes[np.arange(len(answers)), winner], total, out=np.full(len(answers), 0.5),
+                          where=total > 0)
+        decision.set(decision.conflicting, winner, share, CONFLICTED)
+
+    def decide_one(self, codes, weights, registrars, agreed):
+        if agreed is not None:
+            return agreed[0], agreed[1], PLAIN
+        votes, winner = _vote(codes, weights)
+        total = sum(weights)
+        return winner, (votes[winner] / total if total > 0 else 0.5), CONFLICTED
+
+
+class QuorumPolicy(ReconcilePolicy):
+    """The answer given by the most sources, definitive only when at least `quorum` sources give it."""
+
+    name = 'quorum'
+
+    def __init__(self, quorum: int = RECONCILE_QUORUM):
+        self.quorum = quorum
+
+    def decide(self, answers: AnswerMatrix, decision: Decision) -> None:
+        short = decision.agreeing & (answers.valid_count < self.quorum)
+        if short.any():
+            decision.set(short, decision.code, np.minimum(decision.confidence, 0.5), UNCERTAIN)
+        if not decision.conflicting.any():
+            return
+        counts, first = answers.votes(answers.valid, weighted=False)
+        winner = answers.winner(counts, first)
+        count = counts[np.arange(len(answers)), winner]
+        share = count / np.maximum(answers.valid_count, 1)
+        reached = decision.conflicting & (count >= self.quorum)
+        decision.set(reached, winner, share, CONFLICTED)
+        decision.set(decision.conflicting & ~reached, winner, 0.5, UNCERTAIN)
+
+    def decide_one(self, codes, weights, registrars, agreed):
+        if agreed is not None:
+            if len(codes) < self.quorum:
+                return agreed[0], min(agreed[1], 0.5), UNCERTAIN
+            return agreed[0], agreed[1], PLAIN
+        counts, winner = _vote(codes, [1] * len(codes))
+        if counts[winner] >= self.quorum:
+            return winner, counts[winner] / len(codes), CONFLICTED
+        return winner, 0.5, UNCERTAIN
+
+
+POLICIES = {policy.name: policy for policy in (RegistrarPriorityPolicy, WeightedVotePolicy, QuorumPolicy)}
+
+
+def create_policy(name: str = RECONCILE_POLICY) -> ReconcilePolicy:
+    """Build a policy by name (see POLICIES)."""
+    try:
+        return POLICIES[name]()
+    except KeyError:
+        raise ValueError(f"Unknown reconciliation policy {name!r}; available: {', '.join(POLICIES)}")
+
+
+class Reconciler:
+    """Reconciles source results of domains under a policy, given each source's weight and role."""
+
+    def __init__(self, weights: Dict[str, float], registrars: Dict[str, bool],
+                 policy: Optional[ReconcilePolicy] = None):
+        """
+        Args:
+            weights: Weight of each source name (DEFAULT_WEIGHT for others)
+            registrars: Whether each source name is a registrar (others are)
+            policy: How disagreements are decided (default from RECONCILE_POLICY)
+        """
+        self.weights = weights
+        self.registrars = registrars
+        self.policy = policy if policy is not None else create_policy()
+
+    def reconcile(self, results: Sequence[SourceResult]) -> DomainResult:
+        """Reconcile one domain's source results, without its sources."""
+        valid = [r for r in results if r.error is None]
+        if not valid:
+            logger.warning("All sources had errors, cannot determine availability")
+            return DomainResult(None, 0.0, Status.UNKNOWN, len(results), len(results))
+        codes = [_answer_code(r) for r in valid]
+        weights = [self.weights.get(r.source, DEFAULT_WEIGHT) for r in valid]
+        agreed = None
+        if all(code == codes[0] for code in codes):
+            total_weight = sum(weights)
+            weighted = sum(r.confidence * weight for r, weight in zip(valid, weights))
+            agreed = (codes[0], weighted / total_weight if total_weight > 0 else 0.5)
+        code, confidence, qualifier = self.policy.decide_one(
+            codes, weights, [self.registrars.get(r.source, True) for r in valid], agreed)
+        return DomainResult(_AVAILABILITY[code], confidence, _STATUSES[(code, qualifier)], len(results),
+                            len(results) - len(valid), agreed is None)
+
+    def reconcile_many(self, rows: Sequence[Sequence[SourceResult]]) -> List[DomainResult]:
+        """Reconcile the source results of many domains, in order, without their sources."""
+        # Domains checked by the same sources in the same order share a matrix
+        groups: Dict[Tuple[str, ...], List[int]] = {}
+        for index, results in enumerate(rows):
+            groups.setdefault(tuple(r.source for r in results), []).append(index)
+        reconciled: List[Optional[DomainResult]] = [None] * len(rows)
+        for sources, indexes in groups.items():
+            for index, result in zip(indexes, self._reconcile_group(sources, [rows[i] for i in indexes])):
+                reconciled[index] = result
+        return reconciled
+
+    def _reconcile_group(self, sources: Tuple[str, ...], rows: List[Sequence[SourceResult]]) -> List[DomainResult]:
+        weights = np.array([self.weights.get(source, DEFAULT_WEIGHT) for source in sources], dtype=np.float64)
+        registrars = np.array([self.registrars.get(source, True) for source in sources], dtype=bool)
+        answers = AnswerMatrix(rows, weights, registrars)
+        decision = Decision(answers)
+        self.policy.decide(answers, decision)
+
+        unanswered = int(np.count_nonzero(~decision.answered))
+        if unanswered:
+            logger.warning("All sources had errors for %d domain(s), cannot determine availability", unanswered)
+
+        width = len(sources)
+        errors = (width - answers.valid_count).tolist()
+        results = []
+        for answered, conflicting, code, confidence, qualifier, error_count in zip(
+                decision.answered.tolist(), decision.conflicting.tolist(), decision.code.tolist(),
+                decision.confidence.tolist(), decision.qualifier.tolist(), errors):
+            if not answered:
+                results.append(DomainResult(None, 0.0, Status.UNKNOWN, width, error_count))
+                continue
+            results.append(DomainResult(_AVAILABILITY[code], confidence, _STATUSES[(code, qualifier)],
+                                        width, error_count, conflicting))
+        return results
@@ -7,8 +7,12 @@ import os
 import json
 import aiohttp
 import logging
+from urllib.parse import urlsplit
 from typing import Dict, List, Any, Optional
 from .domain_checker import DomainSourceProvider
+from .egress import EgressPool, HttpSessions, get_egress_pool
+from .metrics import PROVIDER_ERRORS, error_cause
+from .tracing import span
 
 # Import dotenv for secure credential loading
 try:
@@ -19,9 +23,6 @@ try:
 except ImportError:
     DOTENV_AVAILABLE = False
 
-# Configure logging
-logging.basicConfig(level=logging.INFO, 
-                   format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
 class GoDaddyProvider(DomainSourceProvider):
@@ -31,7 +32,8 @@ class GoDaddyProvider(DomainSourceProvider):
     OTE_BASE_URL = "https://api.ote-godaddy.com"  # Test environment
     PROD_BASE_URL = "https://api.godaddy.com"     # Production environment
     
-    def __init__(self, api_key: str, api_secret: str, use_production: bool = True):
+    def __init__(self, api_key: str, api_secret: str, use_production: bool = True, base_url: Optional[str] = None,
+                 egress_pool: Optional[EgressPool] = None):
         """
         Initialize the GoDaddy API provider.
         
@@ -39,12 +41,18 @@ class GoDaddyProvider(DomainSourceProvider):
             api_key: GoDaddy API key
             api_secret: GoDaddy API secret
             use_production: Whether to use production API (True) or OTE/test API (False)
+            base_url: API base URL overriding the production/OTE choice (e.g. a local stand-in)
+            egress_pool: Source addresses and proxies API requests are spread over
         """
         self._source_name = "GoDaddy"
         self._weight = 0.9  # Higher weight than WHOIS
         self._api_key = api_key
         self._api_secret = api_secret
-        self._base_url = self.PROD_BASE_URL if use_production else self.OTE_BASE_URL
+        self._base_url = base_url or (self.PROD_BASE_URL if use_production else self.OTE_BASE_URL)
+        self._egress_pool = egress_pool if egress_pool is not None else get_egress_pool()
+        self._upstream = urlsplit(self._base_url).netloc
+        # Pooled keep-alive connections to the API, per egress source address
+        self._sessions = HttpSessions()
         
         # Validate credentials
         if not api_key or not api_secret:
@@ -60,6 +68,9 @@ class GoDaddyProvider(DomainSourceProvider):
     def weight(self) -> float:
         return self._weight
     
+    async def close(self) -> None:
+        await self._sessions.close()
+    
     async def check_availability(self, domain: str) -> Dict[str, Any]:
         """Check domain availability using GoDaddy API."""
         result = {
@@ -73,12 +84,12 @@ class GoDaddyProvider(DomainSourceProvider):
         # Check if credentials are available
         if not self._api_key or not self._api_secret:
             error_msg = "GoDaddy API credentials not configured"
-            logger.error(error_msg)
+            logger.error(error_msg, extra={'domain': domain})
             result['error'] = error_msg
             result['confidence'] = 0.0
             return result
         
-        logger.info(f"Checking domain availability via GoDaddy API: {domain}")
+        logger.debug("Checking domain availability via GoDaddy API: %s", domain, extra={'domain': domain})
         
         try:
             # Prepare API request
@@ -91,76 +102,92 @@ class GoDaddyProvider(DomainSourceProvider):
             url = f"{self._base_url}/v1/domains/available"
             params = {'domain': domain}
             
-            logger.debug(f"Making GoDaddy API request to {url} with params {params}")
+            logger.debug("Making GoDaddy API request to %s with params %s", url, params, extra={'domain': domain})
             
-            async with aiohttp.ClientSession() as session:
-                async with session.get(url, headers=headers, params=params) as response:
-                    response_status = response.status
-                    response_text = await response.text()
-                    logger.info(f"GoDaddy API response for {domain}: Status {response_status}")
-                    logger.debug(f"GoDaddy API response body: {response_text}")
-                    
-                    # Handle rate limiting
-                    if response_status == 429:
-                        error_msg = "Rate limit exceeded for GoDaddy API"
-                        logger.error(error_msg)
-                        result['error'] = error_msg
-                        result['confidence'] = 0.0
-                        return result
-                    
-                    # Handle authentication errors
-                    if response_status == 401:
-                        error_msg = "Authentication failed for GoDaddy API"
-                        logger.error(error_msg)
-                        result['error'] = error_msg
-                        result['confidence'] = 0.0
-                        return result
+            async with self._egress_pool.lease(self._upstream) as lease:
+                await lease.wait()
+                egress = lease.egress
+                with span('godaddy_api.request', url=url):
+                    async with self._sessions.get(egress).get(url, headers=headers, params=params, proxy=egress.proxy_url) as response:
+                        response_status = response.status
+                        response_text = await response.text()
+                        logger.debug("GoDaddy API response for %s: Status %s", domain, response_status,
+                                     extra={'domain': domain})
+                        logger.debug("GoDaddy API response body: %s", response_text, extra={'domain': domain})
+                
+                        # Handle rate limiting
+                        if response_status == 429:
+                            error_msg = "Rate limit exceeded for GoDaddy API"
+                            logger.error(error_msg, extra={'domain': domain})
+                            PROVIDER_ERRORS.labels(self.source_name, 'rate_limited').inc()
+                            lease.ban(f"HTTP 429 from {self._upstream}")
+                            result['error'] = error_msg
+                            result['confidence'] = 0.0
+                            return result
+                
+                        # Addresses blocked in front of the API are refused with 403
+                        if response_status == 403 and egress.proxy_url is not None:
+                            lease.ban(f"HTTP 403 from {self._upstream} through {egress.name}")
+                
+                        # Handle authentication errors
+                        if response_status == 401:
+                            error_msg = "Authentication failed for GoDaddy API"
+                            logger.error(error_msg, extra={'domain': domain})
+                            PROVIDER_ERRORS.labels(self.source_name, 'auth').inc()
+                            result['error'] = error_msg
+                            result['confidence'] = 0.0
+                            return result
+                
+                        # Handle other errors
+                        if response_status != 200:
+                            error_msg = f"GoDaddy API error: {response_status} - {response_text}"
+                            logger.error(error_msg, extra={'domain': domain})
+                            PROVIDER_ERRORS.labels(self.source_name, 'http').inc()
+                            result['error'] = error_msg
+                            result['confidence'] = 0.0
+                            return result
+                
+                        # Parse response
+                        try:
+                            data = json.loads(response_text)
+                            logger.debug("GoDaddy API result for %s: available=%s", domain, data.get('available', False),
+                                         extra={'domain': domain})
                     
-                    # Handle other errors
-                    if response_status != 200:
-                        error_msg = f"GoDaddy API error: {response_status} - {response_text}"
-                        logger.error(error_msg)
-                        result['error'] = error_msg
-                        result['confidence'] = 0.0
-                        return result
+                            # Update result
+                            result['available'] = data.get('available', False)
+                            result['confidence'] = 0.9  # High confidence for direct API response
+                            result['details'] = {
+                                'price': data.get('price', 0),
+                                'currency': data.get('currency', 'USD'),
+                                'definitive': data.get('definitive', True)
+                            }
                     
-                    # Parse response
-                    try:
-                        data = json.loads(response_text)
-                        logger.info(f"GoDaddy API result for {domain}: available={data.get('available', False)}")
+                            # If the API specifically says the result is not definitive, lower confidence
+                            if not data.get('definitive', True):
+                                result['confidence'] = 0.7
                         
-                        # Update result
-                        result['available'] = data.get('available', False)
-                        result['confidence'] = 0.9  # High confidence for direct API response
-                        result['details'] = {
-                            'price': data.get('price', 0),
-                            'currency': data.get('currency', 'USD'),
-                            'definitive': data.get('definitive', True)
-                        }
-                        
-                        # If the API specifically says the result is not definitive, lower confidence
-                        if not data.get('definitive', True):
-                            result['confidence'] = 0.7
-                            
-                    except json.JSONDecodeError as e:
-                        error_msg = f"Failed to parse GoDaddy API response: {str(e)}"
-                        logger.error(error_msg)
-                        result['error'] = error_msg
-                        result['confidence'] = 0.0
-                        return result
-                    
+                        except json.JSONDecodeError as e:
+                            error_msg = f"Failed to parse GoDaddy API response: {str(e)}"
+                            logger.error(error_msg, extra={'domain': domain})
+                            PROVIDER_ERRORS.labels(self.source_name, 'parse').inc()
+                            result['error'] = error_msg
+                            result['confidence'] = 0.0
+                            return result
+                
         except aiohttp.ClientError as e:
             error_msg = f"GoDaddy API connection error for {domain}: {str(e)}"
-            logger.error(error_msg)
+            logger.error(error_msg, extra={'domain': domain})
+            PROVIDER_ERRORS.labels(self.source_name, 'connection').inc()
             result['error'] = error_msg
             result['confidence'] = 0.0
         except Exception as e:
             error_msg = f"Error checking domain {domain} via GoDaddy API: {str(e)}"
-            logger.error(error_msg)
+            logger.error(error_msg, extra={'domain': domain})
+            PROVIDER_ERRORS.labels(self.source_name, error_cause(e)).inc()
             result['error'] = error_msg
             result['confidence'] = 0.0
             
-        logger.info(f"Final GoDaddy result for {domain}: {result}")
+        logger.debug("Final GoDaddy result for %s: %s", domain, result, extra={'domain': domain})
         return result
 
 
@@ -227,6 +254,7 @@ def create_godaddy_provider() -> Optional[GoDaddyProvider]:
         return None
     
     use_production = os.environ.get('GODADDY_USE_PRODUCTION', 'true').lower() == 'true'
+    base_url = os.environ.get('GODADDY_API_BASE_URL')
     logger.info(f"Creating GoDaddy provider with {'production' if use_production else 'OTE'} environment")
     logger.info(f"API Key: {api_key[:5]}... API Secret: {api_secret[:5]}...")
-    return GoDaddyProvider(api_key, api_secret, use_production)
+    return GoDaddyProvider(api_key, api_secret, use_production, base_url)
@@ -0,0 +1,207 @@
+"""
+Compact result types for domain checks.
+Providers still return plain dicts; DomainChecker turns them into slotted SourceResult objects
+and reconciles those into a DomainResult. Source names are interned, statuses are an enum, and
+raw WHOIS or page text is kept out of the results, zlib-compressed in a size-bounded store, and
+only decompressed when asked for. to_dict() produces the JSON shape used by the web app.
+"""
+
+import os
+import sys
+import zlib
+import itertools
+import threading
+from enum import Enum
+from collections import OrderedDict
+from typing import Dict, Any, Optional, Tuple
+
+# Compressed raw payloads kept in memory; the least recently stored are dropped first (0 keeps none)
+RAW_STORE_MAX_BYTES = int(os.environ.get('RAW_STORE_MAX_BYTES', str(64 * 1024 * 1024)))
+# Whether streamed source results carry the raw WHOIS response (details.raw_response)
+RESULTS_INCLUDE_RAW = os.environ.get('RESULTS_INCLUDE_RAW', 'false').lower() == 'true'
+
+
+class Status(str, Enum):
+    """Reconciled availability status of a domain."""
+    AVAILABLE = 'available'
+    UNAVAILABLE = 'unavailable'
+    AVAILABLE_CONFLICTED = 'available_conflicted'
+    UNAVAILABLE_CONFLICTED = 'unavailable_conflicted'
+    AVAILABLE_UNCERTAIN = 'available_uncertain'
+    UNAVAILABLE_UNCERTAIN = 'unavailable_uncertain'
+    UNKNOWN = 'unknown'
+    INVALID = 'invalid'
+    ERROR = 'error'
+
+    def __str__(self) -> str:
+        return self.value
+
+    @classmethod
+    def of(cls, available: Any, qualifier: str = '') -> 'Status':
+        """Status for an availability answer, optionally qualified ('_conflicted' or '_uncertain')."""
+        return cls(('available' if available else 'unavailable') + qualifier)
+
+
+class RawStore:
+    """
+    Bounded in-memory store of zlib-compressed raw responses.
+
+    Each response gets its own id, so a newer check of the same domain and source does not
+    replace the text an older result points to; old texts leave only by eviction.
+    """
+
+    def __init__(self, max_bytes: int = RAW_STORE_MAX_BYTES, level: int = 6):
+        self.max_bytes = max_bytes
+        self.level = level
+        self.size = 0
+        self._entries: 'OrderedDict[int, bytes]' = OrderedDict()
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def put(self, text: str) -> Optional[int]:
+        """Compress and store a raw response; return its id, or None if it was not kept."""
+        if self.max_bytes <= 0:
+            return None
+        data = zlib.compress(text.encode('utf-8'), self.level)
+        if len(data) > self.max_bytes:
+            return None
+        with self._lock:
+            raw_id = next(self._ids)
+            self._entries[raw_id] = data
+            self.size += len(data)
+            while self.size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.size -= len(evicted)
+        return raw_id
+
+    def get(self, raw_id: int) -> Optional[str]:
+        """Return a raw response, or None if it was never stored or has been evicted."""
+        with self._lock:
+            data = self._entries.get(raw_id)
+        return zlib.decompress(data).decode('utf-8') if data is not None else None
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+# Process-wide raw response store
+raw_store = RawStore()
+
+
+class SourceResult:
+    """Answer of one provider for one domain."""
+
+    __slots__ = ('domain', 'source', 'available', 'confidence', 'details', 'error', 'raw_id', 'latency')
+
+    def __init__(self, domain: str, source: str, available: Optional[bool], confidence: float,
+                 details: Optional[Dict[str, Any]] = None, error: Optional[str] = None,
+                 raw_id: Optional[int] = None, latency: Optional[float] = None):
+        self.domain = domain
+        self.source = sys.intern(source)
+        self.available = available
+        self.confidence = confidence
+        # None rather than an empty dict for the common case of no details
+        self.details = details or None
+        self.error = error
+        # Id of the raw response in raw_store, when one was kept
+        self.raw_id = raw_id
+        # Seconds the provider took to answer, when measured
+        self.latency = latency
+
+    @classmethod
+    def from_provider(cls, domain: str, data: Dict[str, Any], store: Optional[RawStore] = None,
+                      latency: Optional[float] = None) -> 'SourceResult':
+        """Build from a provider's result dict, moving its raw_response into the raw store."""
+        details = data.get('details') or None
+        raw_id = None
+        if details and 'raw_response' in details:
+            details = dict(details)
+            raw = details.pop('raw_response')
+            if raw is not None:
+                raw_id = (store if store is not None else raw_store).put(str(raw))
+        return cls(domain, data['source'], data.get('available'), data.get('confidence', 0.0),
+                   details, data.get('error'), raw_id, latency)
+
+    @classmethod
+    def from_exception(cls, domain: str, source: str, error: BaseException,
+                       latency: Optional[float] = None) -> 'SourceResult':
+        """Result recorded for a provider that raised instead of returning a result."""
+        return cls(domain, source, None, 0.0, error=str(error), latency=latency)
+
+    @property
+    def has_raw(self) -> bool:
+        return self.raw_id is not None
+
+    @property
+    def raw_response(self) -> Optional[str]:
+        """The raw response text, decompressed on access (None if absent or evicted)."""
+        return raw_store.get(self.raw_id) if self.raw_id is not None else None
+
+    def to_dict(self, include_raw: bool = False) -> Dict[str, Any]:
+        """Provider result dict, with details.raw_response when include_raw is set and still stored."""
+        details = dict(self.details) if self.details else {}
+        if include_raw and self.has_raw:
+            raw = self.raw_response
+            if raw is not None:
+                details['raw_response'] = raw
+        return {
+            'available': self.available,
+            'confidence': self.confidence,
+            'source': self.source,
+            'details': details,
+            'error': self.error,
+        }
+
+    def __repr__(self) -> str:
+        return f"SourceResult({self.to_dict()!r})"
+
+
+class DomainResult:
+    """Reconciled result of a domain check across its providers."""
+
+    __slots__ = ('available', 'confidence', 'status', 'sources_checked', 'sources_with_errors',
+                 'conflicting_results', 'sources', 'error', 'timings', 'checked_at')
+
+    def __init__(self, available: Optional[bool] = None, confidence: float = 0.0, status: Status = Status.UNKNOWN,
+                 sources_checked: int = 0, sources_with_errors: int = 0, conflicting_results: bool = False,
+                 sources: Tuple[SourceResult, ...] = (), error: Optional[str] = None,
+                 timings: Optional[Dict[str, Any]] = None, checked_at: Optional[float] = None):
+        self.available = available
+        self.confidence = confidence
+        self.status = status
+        self.sources_checked = sources_checked
+        self.sources_with_errors = sources_with_errors
+        self.conflicting_results = conflicting_results
+        self.sources = sources
+        self.error = error
+        self.timings = timings
+        # Unix time of the check when the result was reused from history
+        self.checked_at = checked_at
+
+    @classmethod
+    def invalid(cls, reason: str) -> 'DomainResult':
+        """Result returned for a domain rejected before any network call."""
+        return cls(available=False, confidence=1.0, status=Status.INVALID, error=reason)
+
+    def to_dict(self, include_raw: bool = False) -> Dict[str, Any]:
+        """Result in the dict shape DomainChecker used to return."""
+        data = {
+            'available': self.available,
+            'confidence': self.confidence,
+            'sources_checked': self.sources_checked,
+            'sources_with_errors': self.sources_with_errors,
+            'conflicting_results': self.conflicting_results,
+            'status': self.status.value,
+        }
+        if self.error is not None:
+            data['error'] = self.error
+        data['sources'] = [source.to_dict(include_raw) for source in self.sources]
+        if self.timings is not None:
+            data['timings'] = self.timings
+        if self.checked_at is not None:
+            data['checked_at'] = self.checked_at
+        return data
+
+    def __repr__(self) -> str:
+        return f"DomainResult({self.to_dict()!r})"
+
@@ -0,0 +1,82 @@
+import os
+from datetime import datetime
+from flask import Blueprint, request, abort, send_file, render_template_string, jsonify
+from src.profiling import profiler, is_admin
+from src.egress import get_egress_pool
+from src.adaptive_limiter import adaptive_limits
+from src.hedging import hedger
+
+admin_bp = Blueprint('admin', __name__)
+
+PROFILES_PAGE = """<!DOCTYPE html>
+<html lang="en">
+<head>
+    <meta charset="UTF-8">
+    <title>Profiles</title>
+    <style>
+        body { font-family: sans-serif; margin: 2em; }
+        table { border-collapse: collapse; }
+        th, td { padding: 4px 12px; border-bottom: 1px solid #ddd; text-align: left; }
+    </style>
+</head>
+<body>
+    <h1>Profiles</h1>
+    <p>Profile a request with the <code>X-Profile: &lt;admin token&gt;</code> header; send SIGUSR1 to
+       start or stop a process-wide profile. Artifacts download with the
+       <code>X-Admin-Token</code> header, e.g. <code>curl -OJ -H 'X-Admin-Token: ...' &lt;link&gt;</code>.</p>
+    <table>
+        <tr><th>Started</th><th>Label</th><th>Trigger</th><th>Domains</th><th>Duration</th><th>Artifacts</th></tr>
+        {% for record in records %}
+        <tr>
+            <td>{{ started(record) }}</td>
+            <td>{{ record.label }}</td>
+            <td>{{ record.trigger }}</td>
+            <td>{{ record.domain_count if record.domain_count is not none else '-' }}</td>
+            <td>{{ '%.2f' % record.duration }} s</td>
+            <td>{% for kind in record.artifacts %}
+                <a href="{{ url_for('admin.download_profile', profile_id=record.id, kind=kind) }}">{{ kind }}</a>
+            {% endfor %}</td>
+        </tr>
+        {% else %}
+        <tr><td colspan="6">No profiles yet</td></tr>
+        {% endfor %}
+    </table>
+</body>
+</html>
+"""
+
+def _require_admin():
+    if not is_admin(request.headers.get('X-Admin-Token')):
+        abort(404)
+
+@admin_bp.route('/admin/profiles', methods=['GET'])
+def list_profiles():
+    _require_admin()
+    return render_template_string(
+        PROFILES_PAGE, records=profiler.records(),
+        started=lambda record: datetime.fromtimestamp(record.started_at).strftime('%Y-%m-%d %H:%M:%S'))
+
+@admin_bp.route('/admin/profiles/<profile_id>/<kind>', methods=['GET'])
+def download_profile(profile_id, kind):
+    _require_admin()
+    record = profiler.get(profile_id)
+    if record is None or kind not in record.artifacts or not os.path.exists(record.artifacts[kind]):
+        abort(404)
+    path = record.artifacts[kind]
+    return send_file(path, as_attachment=True, download_name=os.path.basename(path),
+                     mimetype='text/plain' if kind == 'collapsed' else 'application/octet-stream')
+
+@admin_bp.route('/admin/egress', methods=['GET'])
+def egress_pool_state():
+    _require_admin()
+    return jsonify(get_egress_pool().stats())
+
+@admin_bp.route('/admin/limits', methods=['GET'])
+def provider_limits():
+    _require_admin()
+    return jsonify(adaptive_limits.stats())
+
+@admin_bp.route('/admin/hedging', methods=['GET'])
+def hedging_state():
+    _require_admin()
+    return jsonify(hedger.stats())
@@ -0,0 +1,80 @@
+import io
+import json
+import time
+from flask import Blueprint, jsonify, request, Response
+from src.services import get_services
+from src.scheduler import Priority, request_tenant
+from src.tld_registry import get_tld_registry
+from src.history_store import HISTORY_MAX_AGE
+from src.async_runtime import iterate_async
+from src.bulk_api import (BulkRequestError, BodyReader, IdempotencyStore, idempotency_store, parse_items,
+                          build_request, result_line, negotiate_encoding, compress_stream)
+
+api_bp = Blueprint('api', __name__)
+
+def _line(data):
+    return (json.dumps(data, separators=(',', ':')) + '\n').encode('utf-8')
+
+def _response(chunks, encoding, status=200, headers=None):
+    response = Response(compress_stream(chunks, encoding), status=status, mimetype='application/x-ndjson',
+                        headers=headers or {})
+    if encoding is not None:
+        response.headers['Content-Encoding'] = encoding
+    response.headers['Vary'] = 'Accept-Encoding'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+@api_bp.route('/api/v1/check', methods=['POST'])
+def bulk_check():
+    tenant = request_tenant(request.headers, request.remote_addr)
+    reader = BodyReader(request.stream)
+    body = io.BufferedReader(reader)
+    domain_checker, batch_checker, _ = get_services()
+    try:
+        items, options = parse_items(body, request.content_type or '')
+        options = {**request.args.to_dict(), **options}
+        bulk = build_request(items, options, batch_checker.preflight,
+                             [p.source_name for p in domain_checker.providers],
+                             get_tld_registry().default_tlds(), HISTORY_MAX_AGE)
+    except BulkRequestError as e:
+        return jsonify({'error': str(e)}), 400
+    encoding = negotiate_encoding(request.accept_encodings)
+
+    key = request.headers.get('Idempotency-Key')
+    if key:
+        state, lines = idempotency_store.begin(tenant, key, reader.fingerprint(request.query_string))
+        if state == IdempotencyStore.REPLAY:
+            return _response(lines, encoding, headers={'Idempotent-Replayed': 'true'})
+        if state == IdempotencyStore.IN_PROGRESS:
+            return jsonify({'error': 'A request with this Idempotency-Key is in progress'}), 409
+        if state == IdempotencyStore.MISMATCH:
+            return jsonify({'error': 'Idempotency-Key was used for a different request'}), 422
+
+    def generate():
+        started = time.perf_counter()
+        counts = {}
+        finished = False
+        try:
+            stream = batch_checker.stream(bulk.domains, Priority.BATCH, tenant, bulk.max_age, bulk.rejected,
+                                          bulk.sources, bulk.deadline)
+            for domain, result, error in iterate_async(stream):
+                data = result_line(domain, result, error)
+                counts[data['status']] = counts.get(data['status'], 0) + 1
+                line = _line(data)
+                if key:
+                    idempotency_store.append(tenant, key, line)
+                yield line
+            line = _line({'done': True, 'domains': len(bulk.domains), 'counts': counts,
+                          'elapsed': round(time.perf_counter() - started, 3)})
+            if key:
+                idempotency_store.append(tenant, key, line)
+            yield line
+            finished = True
+        finally:
+            if key:
+                if finished:
+                    idempotency_store.finish(tenant, key)
+                else:
+                    idempotency_store.abort(tenant, key)
+
+    return _response(generate(), encoding)
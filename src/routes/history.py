@@ -0,0 +1,76 @@
+from datetime import datetime
+from flask import Blueprint, jsonify, request, abort
+from src.history_store import get_history_store
+from src.results import Status
+
+history_bp = Blueprint('history', __name__)
+
+MAX_LIMIT = 10000
+
+def _history():
+    history = get_history_store()
+    if history is None:
+        abort(404)
+    return history
+
+def _time_arg(name):
+    value = request.args.get(name)
+    if value is None:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        return datetime.fromisoformat(value).timestamp()
+
+def _int_arg(name, default=None):
+    value = request.args.get(name)
+    return int(value) if value is not None else default
+
+def _page():
+    return min(_int_arg('limit', 1000), MAX_LIMIT), _int_arg('offset', 0)
+
+@history_bp.route('/history/latest', methods=['POST'])
+def latest_status():
+    data = request.get_json(silent=True) or {}
+    if not isinstance(data, dict):
+        return jsonify({'error': 'Body must be a JSON object'}), 400
+    domains = data.get('domains', [])
+    if not isinstance(domains, list) or not all(isinstance(domain, str) for domain in domains):
+        return jsonify({'error': 'domains must be a list of strings'}), 400
+    max_age = data.get('max_age')
+    if max_age is not None and (isinstance(max_age, bool) or not isinstance(max_age, (int, float))):
+        return jsonify({'error': 'max_age must be a number of seconds'}), 400
+    domains = [domain.strip().lower() for domain in domains if domain.strip()]
+    return jsonify(_history().latest(domains, max_age))
+
+@history_bp.route('/history/changes', methods=['GET'])
+def changed_domains():
+    try:
+        since = _time_arg('since')
+        limit, offset = _page()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    if since is None:
+        return jsonify({'error': 'since is required (unix time or ISO 8601)'}), 400
+    return jsonify(_history().changed_since(since, limit, offset))
+
+@history_bp.route('/history/search', methods=['GET'])
+def search_domains():
+    try:
+        status = request.args.get('status')
+        limit, offset = _page()
+        rows = _history().search(tld=request.args.get('tld'), status=Status(status) if status else None,
+                                 brand=request.args.get('brand'), min_length=_int_arg('min_length'),
+                                 max_length=_int_arg('max_length'), checked_since=_time_arg('checked_since'),
+                                 limit=limit, offset=offset)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify(rows)
+
+@history_bp.route('/history/<domain>', methods=['GET'])
+def domain_history(domain):
+    try:
+        limit = min(_int_arg('limit', 100), MAX_LIMIT)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify(_history().domain_history(domain.lower(), limit))
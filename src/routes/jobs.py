@@ -0,0 +1,29 @@
+import os
+from flask import Blueprint, jsonify, send_file, abort
+from src.job_store import job_store, EXPORT_FORMATS
+
+jobs_bp = Blueprint('jobs', __name__)
+
+@jobs_bp.route('/jobs', methods=['GET'])
+def list_jobs():
+    return jsonify(job_store.jobs())
+
+@jobs_bp.route('/jobs/<job_id>', methods=['GET'])
+def job_summary(job_id):
+    if not job_store.enabled or job_store.meta(job_id) is None:
+        abort(404)
+    return jsonify(job_store.summary(job_id))
+
+@jobs_bp.route('/jobs/<job_id>/export/<fmt>', methods=['GET'])
+def export_job(job_id, fmt):
+    if fmt not in EXPORT_FORMATS:
+        return jsonify({'error': f"Unknown export format: {fmt}"}), 400
+    if not job_store.enabled or job_store.meta(job_id) is None:
+        abort(404)
+    path = job_store.export(job_id, fmt)
+    file_name, mimetype = EXPORT_FORMATS[fmt]
+    response = send_file(path, mimetype=mimetype, as_attachment=True, download_name=f"{job_id}-{file_name}")
+    if not path.endswith(file_name):
+        # Snapshot of a running job
+        response.call_on_close(lambda: os.remove(path))
+    return response
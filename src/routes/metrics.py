@@ -0,0 +1,8 @@
+from flask import Blueprint, Response
+from src.metrics import registry, CONTENT_TYPE
+
+metrics_bp = Blueprint('metrics', __name__)
+
+@metrics_bp.route('/metrics', methods=['GET'])
+def get_metrics():
+    return Response(registry.render(), content_type=CONTENT_TYPE)
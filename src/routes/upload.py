@@ -0,0 +1,91 @@
+import io
+import json
+import time
+from flask import Blueprint, jsonify, request, Response
+from src.services import get_services
+from src.scheduler import Priority, request_tenant
+from src.history_store import HISTORY_MAX_AGE
+from src.job_store import job_store
+from src.async_runtime import iterate_async
+from src.bulk_api import result_line
+from src.metrics import SSE_STREAMS_ACTIVE, SSE_STREAM_DURATION, UPLOADS, UPLOAD_BYTES
+from src.uploads import UploadError, UploadReader, UploadFeed, detect_format, iter_brands
+
+upload_bp = Blueprint('upload', __name__)
+
+def _event(data):
+    return f"data: {json.dumps(data)}\n\n"
+
+@upload_bp.route('/upload-check', methods=['POST'])
+def upload_check():
+    tenant = request_tenant(request.headers, request.remote_addr)
+    tlds = ['.' + tld.strip().lstrip('.').lower() for value in request.args.getlist('tlds')
+            for tld in value.split(',') if tld.strip().lstrip('.')]
+    if not tlds:
+        return jsonify({'error': 'Please select at least one TLD with the tlds parameter'}), 400
+    if request.mimetype.startswith('multipart/'):
+        return jsonify({'error': 'Send the file as the request body rather than as a form field'}), 415
+    try:
+        max_age = float(request.args.get('max_age', HISTORY_MAX_AGE))
+    except ValueError:
+        max_age = HISTORY_MAX_AGE
+
+    # The body is read as the checks progress, never buffered whole
+    reader = UploadReader(request.stream)
+    body = io.BufferedReader(reader, 64 * 1024)
+    try:
+        fmt = detect_format(request.args.get('format'), request.args.get('filename') or request.headers.get('X-Filename'),
+                            request.mimetype, body.peek(4)[:4])
+        brands = iter_brands(body, fmt, request.args.get('column'))
+    except UploadError as e:
+        return jsonify({'error': str(e)}), 400
+    total = request.content_length
+    domain_checker, batch_checker, _ = get_services()
+    feed = UploadFeed(brands, tlds, domain_checker.tld_registry)
+
+    def generate():
+        started = time.perf_counter()
+        SSE_STREAMS_ACTIVE.inc()
+        job = job_store.create([p.source_name for p in domain_checker.providers], {'upload': fmt, 'tlds': tlds})
+        checked, counts = 0, {}
+        outcome = 'failed'
+        try:
+            yield _event({'progress': 0, 'status': f'Reading {fmt.upper()} upload'})
+            stream = batch_checker.stream_feed(iter(feed), Priority.BATCH, tenant, max_age)
+            try:
+                for domain, result, error in iterate_async(stream):
+                    checked += 1
+                    brand, tld = feed.take(domain)
+                    line = result_line(domain, result, error)
+                    line['brand'] = brand
+                    counts[line['status']] = counts.get(line['status'], 0) + 1
+                    if job is not None:
+                        job.append(domain, [(brand, tld)], result, error)
+                    # Share of the upload read so far; 100 only once every check is done
+                    progress = min(99, reader.received * 100 // total) if total else None
+                    yield _event({'progress': progress, 'received': reader.received, 'brands': feed.brand_count,
+                                  'checked': checked, 'result': line})
+            except UploadError as e:
+                yield _event({'error': str(e)})
+                return
+
+            completion = {'progress': 100, 'status': 'Completed', 'brands': feed.brand_count,
+                          'domains': feed.domain_count, 'duplicates': feed.duplicates, 'counts': counts,
+                          'elapsed': round(time.perf_counter() - started, 3)}
+            if job is not None:
+                job.close()
+                completion['job_id'] = job.job_id
+                job = None
+            outcome = 'complete'
+            yield _event(completion)
+        finally:
+            SSE_STREAMS_ACTIVE.dec()
+            SSE_STREAM_DURATION.observe(time.perf_counter() - started)
+            UPLOADS.labels(fmt, outcome).inc()
+            UPLOAD_BYTES.labels(fmt).inc(reader.received)
+            if job is not None:
+                job.close('incomplete')
+
+    response = Response(generate(), mimetype='text/event-stream')
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
@@ -0,0 +1,43 @@
+from flask import Blueprint, jsonify, request, abort
+from src.watchlist import get_watchlist
+
+watchlist_bp = Blueprint('watchlist', __name__)
+
+MAX_LIMIT = 10000
+
+def _watchlist():
+    watchlist = get_watchlist()
+    if watchlist is None:
+        abort(404)
+    return watchlist
+
+@watchlist_bp.route('/watchlist', methods=['GET'])
+def list_watched():
+    try:
+        limit = min(int(request.args.get('limit', 1000)), MAX_LIMIT)
+        offset = int(request.args.get('offset', 0))
+        entries = _watchlist().entries(request.args.get('status'), request.args.get('phase'), limit, offset)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify(entries)
+
+@watchlist_bp.route('/watchlist', methods=['POST'])
+def add_watched():
+    data = request.get_json(silent=True) or {}
+    if not isinstance(data, dict):
+        return jsonify({'error': 'Body must be a JSON object'}), 400
+    domains = data.get('domains', [])
+    if not isinstance(domains, list) or not all(isinstance(domain, str) for domain in domains):
+        return jsonify({'error': 'domains must be a list of strings'}), 400
+    added, invalid = _watchlist().add(domains)
+    return jsonify({'added': len(added), 'invalid': invalid})
+
+@watchlist_bp.route('/watchlist/stats', methods=['GET'])
+def watchlist_stats():
+    return jsonify(_watchlist().stats())
+
+@watchlist_bp.route('/watchlist/<domain>', methods=['DELETE'])
+def remove_watched(domain):
+    if not _watchlist().remove(domain.lower()):
+        abort(404)
+    return jsonify({'removed': domain.lower()})
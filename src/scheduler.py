@@ -0,0 +1,353 @@
+"""
+Fair scheduler for domain checks.
+This module shares the process-wide check capacity (WHOIS and browser work) between
+priority classes and tenants, so small interactive requests are not stuck behind bulk jobs.
+"""
+
+import os
+import heapq
+import asyncio
+import logging
+import itertools
+import threading
+from enum import IntEnum
+from typing import Dict, List, Any, Optional, Mapping
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TENANT = 'default'
+
+
+class Priority(IntEnum):
+    """Priority classes, from most to least urgent."""
+    INTERACTIVE = 0
+    BATCH = 1
+    SPECULATIVE = 2
+
+
+class _Waiter:
+    """A queued request for a check slot."""
+
+    __slots__ = ('priority', 'tenant', 'finish_tag', 'loop', 'future', 'granted', 'cancelled')
+
+    def __init__(self, priority: Priority, tenant: str, finish_tag: float,
+                 loop: asyncio.AbstractEventLoop, future: asyncio.Future):
+        self.priority = priority
+        self.tenant = tenant
+        self.finish_tag = finish_tag
+        self.loop = loop
+        self.future = future
+        self.granted = False
+        self.cancelled = False
+
+
+class SlotRequest:
+    """
+    Claim on a check slot, shared by every caller coalesced onto the same check.
+
+    promote() moves the claim to a more urgent class while it is still queued, so a
+    check joined by an interactive caller does not keep waiting in a bulk class.
+    """
+
+    __slots__ = ('priority', 'granted', '_scheduler', '_waiter')
+
+    def __init__(self, priority: Priority = Priority.INTERACTIVE):
+        self.priority = priority
+        self.granted = False
+        self._scheduler: Optional['FairScheduler'] = None
+        self._waiter: Optional[_Waiter] = None
+
+    def promote(self, priority: Priority) -> bool:
+        """Raise the claim to a more urgent class; return whether it moved."""
+        if priority >= self.priority or self.granted:
+            return False
+        if self._scheduler is None:
+            # Not yet submitted: acquire() will use the new class
+            self.priority = priority
+            return True
+        return self._scheduler._promote(self, priority)
+
+
+class _Slot:
+    """Async context manager holding one check slot."""
+
+    def __init__(self, scheduler: 'FairScheduler', priority: Priority, tenant: str):
+        self._scheduler = scheduler
+        self._priority = priority
+        self._tenant = tenant
+
+    async def __aenter__(self):
+        self._priority = await self._scheduler.acquire(self._priority, self._tenant)
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self._scheduler.release(self._priority, self._tenant)
+        return False
+
+
+class FairScheduler:
+    """
+    Capacity scheduler with strict priority classes and weighted fair queuing per tenant.
+
+    - Classes are served in priority order. Batch and speculative work can never take
+      the slots reserved for interactive checks, so an interactive check waits at most
+      for one of those reserved slots instead of for the bulk backlog.
+    - Within a class, tenants are served by start-time fair queuing: each tenant gets
+      a share of the dispatches proportional to its weight, however much it submits.
+    - Each tenant can be capped to a number of concurrently running checks.
+
+    The scheduler is thread-safe and can be used from several event loops.
+    """
+
+    def __init__(self, capacity: int = 16, interactive_reserve: int = 4,
+                 speculative_limit: Optional[int] = None,
+                 tenant_quotas: Optional[Dict[str, int]] = None,
+                 tenant_weights: Optional[Dict[str, float]] = None,
+                 default_quota: Optional[int] = None):
+        """
+        Initialize the scheduler.
+
+        Args:
+            capacity: Total number of checks allowed to run at once
+            interactive_reserve: Slots only interactive checks may use
+            speculative_limit: Maximum slots used by speculative checks (default: a quarter of capacity)
+            tenant_quotas: Maximum concurrent checks per tenant
+            tenant_weights: Fair-queuing weight per tenant (default 1.0)
+            default_quota: Quota for tenants not listed in tenant_quotas (default: no quota)
+        """
+        self.capacity = max(1, capacity)
+        self.interactive_reserve = min(max(0, interactive_reserve), self.capacity - 1)
+        self.speculative_limit = speculative_limit if speculative_limit is not None else max(1, self.capacity // 4)
+        self.tenant_quotas = dict(tenant_quotas or {})
+        self.tenant_weights = dict(tenant_weights or {})
+        self.default_quota = default_quota
+
+        self._lock = threading.Lock()
+        self._sequence = itertools.count()
+        self._queues: Dict[Priority, List] = {priority: [] for priority in Priority}
+        self._virtual_time: Dict[Priority, float] = {priority: 0.0 for priority in Priority}
+        self._last_finish: Dict[Priority, Dict[str, float]] = {priority: {} for priority in Priority}
+        # Size of each class's finish tags above which idle tenants are forgotten
+        self._prune_at: Dict[Priority, int] = {priority: 64 for priority in Priority}
+        self._running_by_class: Dict[Priority, int] = {priority: 0 for priority in Priority}
+        self._running_by_tenant: Dict[str, int] = {}
+        self._running = 0
+
+    def slot(self, priority: Priority = Priority.INTERACTIVE, tenant: str = DEFAULT_TENANT) -> _Slot:
+        """Return an async context manager that holds a check slot for its duration."""
+        return _Slot(self, priority, tenant or DEFAULT_TENANT)
+
+    async def acquire(self, priority: Priority = Priority.INTERACTIVE, tenant: str = DEFAULT_TENANT,
+                      request: Optional[SlotRequest] = None) -> Priority:
+        """
+        Wait until a check slot is granted to this priority class and tenant.
+
+        Args:
+            priority: Class of the slot (ignored when a request is given)
+            tenant: Tenant the slot is accounted to
+            request: Claim that other callers may promote while it is queued
+
+        Returns:
+            Priority: Class the slot was granted in, to pass to release()
+        """
+        tenant = tenant or DEFAULT_TENANT
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if request is not None:
+                priority = request.priority
+                request._scheduler = self
+            if not any(self._queues[p] for p in Priority if p <= priority) and self._can_run(priority, tenant):
+                self._start(priority, tenant)
+                if request is not None:
+                    request.granted = True
+                return priority
+            waiter = _Waiter(priority, tenant, self._finish_tag(priority, tenant), loop, loop.create_future())
+            if request is not None:
+                request._waiter = waiter
+            heapq.heappush(self._queues[priority], (waiter.finish_tag, next(self._sequence), waiter))
+            self._dispatch()
+
+        try:
+            await waiter.future
+        except asyncio.CancelledError:
+            with self._lock:
+                if not waiter.granted:
+                    waiter.cancelled = True
+                    raise
+            # The slot was granted while we were being cancelled: hand it back
+            self.release(waiter.priority, tenant)
+            raise
+        return waiter.priority
+
+    def release(self, priority: Priority = Priority.INTERACTIVE, tenant: str = DEFAULT_TENANT) -> None:
+        """Release a slot held by this priority class and tenant, and dispatch waiters."""
+        tenant = tenant or DEFAULT_TENANT
+        with self._lock:
+            self._running -= 1
+            self._running_by_class[priority] -= 1
+            self._running_by_tenant[tenant] -= 1
+            if not self._running_by_tenant[tenant]:
+                del self._running_by_tenant[tenant]
+            self._dispatch()
+
+    def _promote(self, request: SlotRequest, priority: Priority) -> bool:
+        """Move a queued request to a more urgent class, keeping its tenant."""
+        with self._lock:
+            waiter = request._waiter
+            if request.granted or waiter is None or waiter.granted or waiter.cancelled or priority >= waiter.priority:
+                return False
+            # The entry left in the old class's queue is skipped as stale
+            waiter.priority = priority
+            waiter.finish_tag = self._finish_tag(priority, waiter.tenant)
+            request.priority = priority
+            heapq.heappush(self._queues[priority], (waiter.finish_tag, next(self._sequence), waiter))
+            self._dispatch()
+            return True
+
+    def stats(self) -> Dict[str, Any]:
+        """Return a snapshot of queue depths and slot usage."""
+        with self._lock:
+            return {
+                'capacity': self.capacity,
+                'running': self._running,
+                'running_by_class': {p.name.lower(): n for p, n in self._running_by_class.items()},
+                'queued_by_class': {p.name.lower(): sum(1 for *_, w in q if not w.cancelled and w.priority == p)
+                                    for p, q in self._queues.items()},
+                'running_by_tenant': dict(self._running_by_tenant),
+            }
+
+    def _finish_tag(self, priority: Priority, tenant: str) -> float:
+        """Compute the start-time fair queuing finish tag of a new request."""
+        last_finish = self._last_finish[priority]
+        start = max(self._virtual_time[priority], last_finish.get(tenant, 0.0))
+        finish = start + 1.0 / self.tenant_weights.get(tenant, 1.0)
+        last_finish[tenant] = finish
+        if len(last_finish) > self._prune_at[priority]:
+            # Forget tenants with nothing queued in this class: their next request starts at the
+            # virtual time, at most one dispatch earlier than their tag would put it. Pruning only
+            # once the table has doubled keeps the cost amortized.
+            backlogged = {w.tenant for *_, w in self._queues[priority] if not w.cancelled and w.priority == priority}
+            backlogged.add(tenant)
+            for idle in [t for t in last_finish if t not in backlogged]:
+                del last_finish[idle]
+            self._prune_at[priority] = max(64, 2 * len(last_finish))
+        return finish
+
+    def _class_limit(self, priority: Priority) -> int:
+        if priority == Priority.INTERACTIVE:
+            return self.capacity
+        limit = self.capacity - self.interactive_reserve
+        if priority == Priority.SPECULATIVE:
+            limit = min(limit, self.speculative_limit)
+        return limit
+
+    def _class_open(self, priority: Priority) -> bool:
+        """Return whether a slot is free for this priority class, regardless of tenant."""
+        if self._running >= self.capacity:
+            return False
+        # Batch and speculative work share the non-reserved slots
+        if priority != Priority.INTERACTIVE:
+            bulk_running = self._running_by_class[Priority.BATCH] + self._running_by_class[Priority.SPECULATIVE]
+            if bulk_running >= self.capacity - self.interactive_reserve:
+                return False
+        return self._running_by_class[priority] < self._class_limit(priority)
+
+    def _under_quota(self, tenant: str) -> bool:
+        quota = self.tenant_quotas.get(tenant, self.default_quota)
+        return quota is None or self._running_by_tenant.get(tenant, 0) < quota
+
+    def _can_run(self, priority: Priority, tenant: str) -> bool:
+        return self._class_open(priority) and self._under_quota(tenant)
+
+    def _start(self, priority: Priority, tenant: str) -> None:
+        self._running += 1
+        self._running_by_class[priority] += 1
+        self._running_by_tenant[tenant] = self._running_by_tenant.get(tenant, 0) + 1
+
+    def _dispatch(self) -> None:
+        """Grant free slots to waiters in priority order, fairly across tenants."""
+        for priority in Priority:
+            queue = self._queues[priority]
+            skipped = []
+            while queue and self._class_open(priority):
+                entry = heapq.heappop(queue)
+                waiter = entry[2]
+                if waiter.cancelled or waiter.priority != priority:
+                    continue
+                if not self._under_quota(waiter.tenant):
+                    skipped.append(entry)
+                    continue
+                self._virtual_time[priority] = max(self._virtual_time[priority],
+                                                   waiter.finish_tag - 1.0 / self.tenant_weights.get(waiter.tenant, 1.0))
+                self._start(priority, waiter.tenant)
+                waiter.granted = True
+                waiter.loop.call_soon_threadsafe(_resolve, waiter.future)
+            for entry in skipped:
+                heapq.heappush(queue, entry)
+
+
+def _resolve(future: asyncio.Future) -> None:
+    if not future.done():
+        future.set_result(None)
+
+
+def _parse_mapping(value: str, cast) -> Dict[str, Any]:
+    """Parse a "tenant=value,tenant=value" configuration string."""
+    mapping = {}
+    for item in value.split(','):
+        if '=' in item:
+            key, raw = item.split('=', 1)
+            mapping[key.strip()] = cast(raw.strip())
+    return mapping
+
+
+# Tenants of API keys sent in X-API-Key, as "key=tenant,key=tenant"
+TENANT_API_KEYS = _parse_mapping(os.environ.get('TENANT_API_KEYS', ''), str)
+# Client addresses (such as an authenticating gateway) whose X-Tenant-ID header is trusted
+TENANT_TRUSTED_ADDRESSES = frozenset(a.strip() for a in os.environ.get('TENANT_TRUSTED_ADDRESSES', '').split(',')
+                                     if a.strip())
+
+
+def request_tenant(headers: Mapping[str, str], remote_addr: Optional[str]) -> str:
+    """
+    Tenant a web request is accounted to.
+
+    The tenant of a known API key comes first. X-Tenant-ID is trusted only from the
+    addresses in TENANT_TRUSTED_ADDRESSES; any other client is its own tenant, by address,
+    so it cannot pick a name to escape its quota or fair share.
+    """
+    api_key = headers.get('X-API-Key')
+    if api_key and api_key in TENANT_API_KEYS:
+        return TENANT_API_KEYS[api_key]
+    if remote_addr in TENANT_TRUSTED_ADDRESSES:
+        tenant = headers.get('X-Tenant-ID')
+        if tenant:
+            return tenant
+    return remote_addr or DEFAULT_TENANT
+
+
+def create_scheduler() -> FairScheduler:
+    """
+    Create a scheduler configured from environment variables.
+
+    SCHEDULER_CAPACITY, SCHEDULER_INTERACTIVE_RESERVE and SCHEDULER_SPECULATIVE_LIMIT
+    size the slots; SCHEDULER_TENANT_QUOTAS and SCHEDULER_TENANT_WEIGHTS take
+    "tenant=value" lists, and SCHEDULER_DEFAULT_QUOTA caps unlisted tenants.
+
+    Returns:
+        FairScheduler instance
+    """
+    capacity = int(os.environ.get('SCHEDULER_CAPACITY', '16'))
+    reserve = int(os.environ.get('SCHEDULER_INTERACTIVE_RESERVE', '4'))
+    speculative_limit = os.environ.get('SCHEDULER_SPECULATIVE_LIMIT')
+    default_quota = os.environ.get('SCHEDULER_DEFAULT_QUOTA')
+    scheduler = FairScheduler(
+        capacity=capacity,
+        interactive_reserve=reserve,
+        speculative_limit=int(speculative_limit) if speculative_limit else None,
+        tenant_quotas=_parse_mapping(os.environ.get('SCHEDULER_TENANT_QUOTAS', ''), int),
+        tenant_weights=_parse_mapping(os.environ.get('SCHEDULER_TENANT_WEIGHTS', ''), float),
+        default_quota=int(default_quota) if default_quota else None,
+    )
+    logger.info(f"Scheduler created with capacity={capacity}, interactive_reserve={scheduler.interactive_reserve}")
+    return scheduler
@@ -0,0 +1,52 @@
+"""
+Process-wide services of the web application.
+The domain checker, the batch pipeline and the suggestion engine are built on the first
+request that needs them, so importing the application stays fast and every blueprint
+shares the same instances.
+"""
+
+import atexit
+import logging
+import threading
+
+from .async_runtime import run_coroutine
+from .providers import create_domain_checker
+from .batch_checker import BatchChecker
+from .watchlist import get_watchlist
+
+logger = logging.getLogger(__name__)
+
+_services = None
+_services_lock = threading.Lock()
+
+
+def get_services():
+    """Return (domain_checker, batch_checker, suggestion_engine), building them on first use."""
+    global _services
+    if _services is None:
+        with _services_lock:
+            if _services is None:
+                from .suggestion_engine import create_suggestion_engine
+                domain_checker = create_domain_checker()
+                # Batch pipeline shared by all streaming requests
+                batch_checker = BatchChecker(domain_checker)
+                # Ranks alternative domains and checks the most promising ones in the background
+                _services = (domain_checker, batch_checker, create_suggestion_engine(batch_checker))
+                # Watched domains are rechecked in the background on their own schedule
+                watchlist = get_watchlist()
+                if watchlist is not None:
+                    watchlist.start(batch_checker)
+    return _services
+
+
+def close_services() -> None:
+    """Close the providers' pooled connections on the shared event loop (at exit)."""
+    if _services is None:
+        return
+    try:
+        run_coroutine(_services[0].close(), timeout=5)
+    except Exception as e:
+        logger.warning("Could not close the providers: %s", e)
+
+
+atexit.register(close_services)
@@ -0,0 +1,278 @@
+"""
+Ranked domain suggestion engine.
+This module generates a large space of alternative domains for a brand, scores every
+candidate in one vectorized pass and speculatively checks only the most promising ones.
+"""
+
+import os
+import hashlib
+import logging
+import threading
+from typing import List, Optional, Iterable
+
+import numpy as np
+
+from .batch_checker import BatchChecker
+from .scheduler import Priority, DEFAULT_TENANT
+from .tld_registry import TldRegistry, get_tld_registry
+
+logger = logging.getLogger(__name__)
+
+# Number of top-ranked candidates checked per brand
+DEFAULT_TOP_K = int(os.environ.get('SUGGESTION_CHECK_TOP_K', '8'))
+
+# Concurrency of the speculative checks, kept low so they never crowd out user checks
+SPECULATIVE_CONCURRENCY = int(os.environ.get('SUGGESTION_CHECK_CONCURRENCY', '2'))
+
+# Seconds a brand's speculative checks may take; candidates not checked by then are left out
+SUGGESTION_DEADLINE = float(os.environ.get('SUGGESTION_DEADLINE', '2'))
+
+PREFIXES = ['get', 'try', 'use', 'my', 'the', 'go', 'hey', 'join', 'meet', 'hello']
+SUFFIXES = ['app', 'site', 'online', 'digital', 'web', 'hq', 'labs', 'hub', 'now', 'ly']
+
+# Alternative TLDs offered in addition to the ones selected by the user
+SWAP_TLDS = ['.co', '.app', '.dev', '.io', '.ai', '.net', '.org']
+
+# Rough share of already-registered names per TLD, used as a prior
+TLD_CROWDING = {
+    '.com': 0.9, '.net': 0.7, '.org': 0.65, '.io': 0.6, '.ai': 0.55,
+    '.co': 0.55, '.com.br': 0.5, '.app': 0.35, '.dev': 0.3,
+}
+DEFAULT_TLD_CROWDING = 0.4
+
+# Common English words: source of the character n-gram model and of the
+# seed entries of the "probably registered" Bloom filter
+COMMON_WORDS = """
+the be to of and in that have it for not on with he as you do at this but his by from they we say
+her she or an will my one all would there their what so up out if about who get which go me when make
+can like time no just him know take people into year your good some could them see other than then now
+look only come its over think also back after use two how our work first well way even new want because
+any these give day most us cloud data smart home shop store market money pay bank health care food fresh
+green blue red gold star sun moon sky light fire water earth wind stone wood tech soft net web app code
+dev labs hub base point line link sign mind life love team group world global local city town travel
+trip book page note mail chat talk voice music sound video photo image art design studio craft build
+make maker works solutions systems digital online media social news daily life coffee pizza burger
+fit sport run bike car auto drive fly jet air ship box pack deal sale buy sell trade invest capital fund
+""".split()
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter backed by a NumPy bit array."""
+
+    def __init__(self, size: int = 1 << 20, hashes: int = 4):
+        self.size = size
+        self.hashes = hashes
+        self._bits = np.zeros(size, dtype=bool)
+        self._lock = threading.Lock()
+
+    def _positions(self, item: str) -> np.ndarray:
+        digest = hashlib.blake2b(item.encode('utf-8'), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return np.array([(h1 + i * h2) % self.size for i in range(self.hashes)], dtype=np.int64)
+
+    def add(self, item: str) -> None:
+        """Add an item to the filter."""
+        positions = self._positions(item)
+        with self._lock:
+            self._bits[positions] = True
+
+    def contains_many(self, items: List[str]) -> np.ndarray:
+        """Return a boolean array telling which items are (probably) in the filter."""
+        if not items:
+            return np.zeros(0, dtype=bool)
+        positions = np.stack([self._positions(item) for item in items])
+        return self._bits[positions].all(axis=1)
+
+    def __contains__(self, item: str) -> bool:
+        return bool(self._bits[self._positions(item)].all())
+
+
+def _build_bigram_table(words: Iterable[str]) -> np.ndarray:
+    """Build a log-probability table of character bigrams, including word boundaries."""
+    counts = np.ones((len(_ALPHABET) + 1, len(_ALPHABET) + 1), dtype=np.float64)  # Laplace smoothing
+    for word in words:
+        codes = [_BOUNDARY] + [_CHAR_CODES[c] for c in word if c in _CHAR_CODES] + [_BOUNDARY]
+        for a, b in zip(codes, codes[1:]):
+            counts[a, b] += 1
+    return np.log(counts / counts.sum(axis=1, keepdims=True))
+
+
+_ALPHABET = 'abcdefghijklmnopqrstuvwxyz0123456789-'
+_CHAR_CODES = {c: i for i, c in enumerate(_ALPHABET)}
+_BOUNDARY = len(_ALPHABET)
+_BIGRAM_LOGPROB = _build_bigram_table(COMMON_WORDS)
+_VOWELS = set('aeiou')
+
+
+class DomainSuggestionEngine:
+    """Generate, rank and speculatively check alternative domain suggestions."""
+
+    def __init__(self, batch_checker: BatchChecker, top_k: int = DEFAULT_TOP_K,
+                 registered_filter: Optional[BloomFilter] = None, tld_registry: Optional[TldRegistry] = None):
+        """
+        Initialize the suggestion engine.
+
+        Args:
+            batch_checker: Batch checker used for the speculative checks
+            top_k: Number of top-ranked candidates to check per brand
+            registered_filter: Bloom filter of domains known to be registered
+            tld_registry: Registry splitting candidates into label and TLD (default: the shared one)
+        """
+        self.batch_checker = batch_checker
+        self.top_k = top_k
+        self.registered_filter = registered_filter if registered_filter is not None else BloomFilter()
+        self.tld_registry = tld_registry if tld_registry is not None else get_tld_registry()
+        for word in COMMON_WORDS:
+            for tld in ('.com', '.net', '.org', '.io'):
+                self.registered_filter.add(f"{word}{tld}")
+
+    def observe(self, domain: str, available: Optional[bool]) -> None:
+        """Record the outcome of a check so later rankings avoid names known to be taken."""
+        if available is False:
+            self.registered_filter.add(domain)
+
+    def generate_candidates(self, brand: str, tlds: List[str]) -> List[str]:
+        """
+        Generate the full candidate space for a brand.
+
+        Args:
+            brand: The normalized brand name
+            tlds: TLDs selected by the user
+
+        Returns:
+            List of unique candidate domains, excluding the brand's own domains
+        """
+        if not brand:
+            return []
+
+        labels = []
+        labels.extend(f"{prefix}{brand}" for prefix in PREFIXES)
+        labels.extend(f"{brand}{suffix}" for suffix in SUFFIXES)
+        labels.extend(f"{prefix}-{brand}" for prefix in PREFIXES[:3])
+        labels.extend(f"{brand}-{suffix}" for suffix in SUFFIXES[:3])
+
+        # Hyphenate at syllable-like boundaries (vowel followed by consonant)
+        for i in range(2, len(brand) - 1):
+            if brand[i - 1] in _VOWELS and brand[i] not in _VOWELS:
+                labels.append(f"{brand[:i]}-{brand[i:]}")
+
+        # Abbreviations: drop inner vowels, and truncate long names
+        consonants = brand[0] + ''.join(c for c in brand[1:] if c not in _VOWELS)
+        if 2 < len(consonants) < len(brand):
+            labels.append(consonants)
+        if len(brand) > 6:
+            labels.append(brand[:4])
+            labels.append(brand[:5])
+
+        candidate_tlds = list(dict.fromkeys(list(tlds) + SWAP_TLDS))
+        own_domains = {f"{brand}{tld}" for tld in tlds}
+        candidates = []
+        for label in dict.fromkeys(labels):
+            for tld in candidate_tlds:
+                candidates.append(f"{label}{tld}")
+        # TLD swaps of the brand itself
+        candidates.extend(f"{brand}{tld}" for tld in SWAP_TLDS)
+
+        return [c for c in dict.fromkeys(candidates) if c not in own_domains]
+
+    def score_candidates(self, candidates: List[str], preferred_tlds: Optional[List[str]] = None) -> np.ndarray:
+        """
+        Score candidates in one vectorized pass (higher is better).
+
+        The score combines label length, character bigram pronounceability, the
+        estimated probability that the domain is not registered yet and a bonus
+        for the TLDs the user asked for.
+        """
+        if not candidates:
+            return np.zeros(0)
+
+        labels, tlds = zip(*(self._split(c) for c in candidates))
+        max_len = max(len(label) for label in labels) + 2
+
+        # Encode labels as padded code matrices framed by boundary markers
+        codes = np.full((len(labels), max_len), -1, dtype=np.int64)
+        for row, label in enumerate(labels):
+            encoded = [_BOUNDARY] + [_CHAR_CODES.get(c, _CHAR_CODES['-']) for c in label] + [_BOUNDARY]
+            codes[row, :len(encoded)] = encoded
+
+        left, right = codes[:, :-1], codes[:, 1:]
+        mask = (left >= 0) & (right >= 0)
+        logprob = _BIGRAM_LOGPROB[np.where(mask, left, 0), np.where(mask, right, 0)]
+        pronounceability = np.where(mask, logprob, 0.0).sum(axis=1) / mask.sum(axis=1)
+
+        lengths = np.array([len(label) for label in labels], dtype=np.float64)
+        hyphens = np.array([label.count('-') for label in labels], dtype=np.float64)
+        length_score = np.exp(-np.square(lengths - 8.0) / 32.0)
+
+        # Probability of already being registered: Bloom hit, else a length and TLD prior
+        known = self.registered_filter.contains_many(list(candidates))
+        crowding = np.array([TLD_CROWDING.get(tld, DEFAULT_TLD_CROWDING) for tld in tlds])
+        prior = crowding * np.clip(np.exp(-(lengths - 4.0) / 4.0), 0.05, 1.0)
+        registered = np.where(known, 0.95, prior)
+
+        # Normalize pronounceability to roughly 0..1 (log-probabilities are negative)
+        pron_score = np.clip(1.0 + pronounceability / 5.0, 0.0, 1.0)
+
+        preferred = np.array([tld in (preferred_tlds or ()) for tld in tlds], dtype=np.float64)
+
+        return 0.3 * length_score + 0.3 * pron_score + 0.4 * (1.0 - registered) + 0.2 * preferred - 0.1 * hyphens
+
+    def rank(self, brand: str, tlds: List[str]) -> List[str]:
+        """Return the candidate space for a brand ordered from best to worst."""
+        candidates = self.generate_candidates(brand, tlds)
+        scores = self.score_candidates(candidates, tlds)
+        order = np.argsort(-scores, kind='stable')
+        return [candidates[i] for i in order]
+
+    async def suggest(self, brand: str, tlds: List[str], max_suggestions: int = 10,
+                      tenant: str = DEFAULT_TENANT, deadline: Optional[float] = SUGGESTION_DEADLINE,
+                      max_age: float = 0) -> List[str]:
+        """
+        Check the top-ranked candidates and return the ones that are available.
+
+        Args:
+            brand: The normalized brand name
+            tlds: TLDs selected by the user
+            max_suggestions: Maximum number of suggestions to return
+            tenant: Client or tenant the speculative checks are accounted to
+            deadline: Seconds after which the candidates not yet checked are left out (None waits for all)
+            max_age: Reuse results from the check history that are at most this many seconds old (0 = never)
+
+        Returns:
+            List of available domain suggestions, best first
+        """
+        top = self.rank(brand, tlds)[:self.top_k]
+        if not top:
+            return []
+
+        available = {}
+        async for domain, result, error in self.batch_checker.stream(top, tenant=tenant, max_age=max_age,
+                                                                  deadline=deadline):
+            if error is None:
+                self.observe(domain, result.available)
+                if result.available:
+                    available[domain] = result
+
+        logger.info("Speculative suggestion checks for %s: %d/%d available", brand, len(available), len(top))
+        return [domain for domain in top if domain in available][:max_suggestions]
+
+    def _split(self, domain: str):
+        """Split a domain into label and TLD, honouring multi-level TLDs such as .com.br."""
+        label, info = self.tld_registry.split(domain)
+        return label, info.tld if info is not None else '.' + domain.rsplit('.', 1)[-1]
+
+
+def create_suggestion_engine(batch_checker: BatchChecker) -> DomainSuggestionEngine:
+    """
+    Create a suggestion engine whose speculative checks run at low concurrency and priority.
+
+    Args:
+        batch_checker: Batch checker whose domain checker and in-flight registry are shared
+
+    Returns:
+        DomainSuggestionEngine instance
+    """
+    speculative_checker = BatchChecker(batch_checker.checker, batch_checker.registry,
+                                       concurrency=SPECULATIVE_CONCURRENCY, priority=Priority.SPECULATIVE)
+    return DomainSuggestionEngine(speculative_checker)
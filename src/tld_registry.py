@@ -0,0 +1,203 @@
+"""
+Per-TLD registry metadata.
+This module loads, once per process, what we know about each TLD (WHOIS hosts, RDAP
+endpoint, "not found" patterns, safe query rate, label rules, IDN support and supported
+providers) so providers and the rate limiter can look it up in O(1), and obviously
+invalid domains can be rejected before any network call.
+"""
+
+import os
+import re
+import json
+import logging
+import threading
+from dataclasses import dataclass
+from typing import Dict, List, Any, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+DATA_FILE = os.path.join(os.path.dirname(__file__), 'data', 'tlds.json')
+
+# Letters, digits and hyphens only (A-labels included)
+_LABEL_RE = re.compile(r'^[a-z0-9-]+$')
+
+
+@dataclass(frozen=True)
+class TldInfo:
+    """Registry metadata for a single TLD."""
+    tld: str
+    whois_hosts: Tuple[str, ...] = ()
+    whois_parser: Optional[str] = None
+    rdap_base_url: Optional[str] = None
+    not_found_patterns: Tuple[str, ...] = ()
+    query_rate: float = 1.0
+    burst: int = 1
+    min_length: int = 1
+    max_length: int = 63
+    idn: bool = False
+    providers: Tuple[str, ...] = ()
+    default: bool = False
+
+    @property
+    def whois_host(self) -> Optional[str]:
+        """Primary WHOIS host of the TLD."""
+        return self.whois_hosts[0] if self.whois_hosts else None
+
+    def supports(self, source_name: str) -> bool:
+        """Return whether a provider can answer for this TLD (unknown means yes)."""
+        return not self.providers or source_name in self.providers
+
+
+class TldRegistry:
+    """In-memory table of TLD metadata with longest-suffix lookups."""
+
+    def __init__(self, entries: Dict[str, Dict[str, Any]]):
+        self._tlds: Dict[str, TldInfo] = {}
+        for tld, data in entries.items():
+            tld = _normalize_tld(tld)
+            self._tlds[tld] = TldInfo(
+                tld=tld,
+                whois_hosts=tuple(data.get('whois_hosts', ())),
+                whois_parser=data.get('whois_parser'),
+                rdap_base_url=data.get('rdap_base_url'),
+                not_found_patterns=tuple(data.get('not_found_patterns', ())),
+                query_rate=float(data.get('query_rate', 1.0)),
+                burst=int(data.get('burst', 1)),
+                min_length=int(data.get('min_length', 1)),
+                max_length=int(data.get('max_length', 63)),
+                idn=bool(data.get('idn', False)),
+                providers=tuple(data.get('providers', ())),
+                default=bool(data.get('default', False)),
+            )
+        self._max_levels = max((tld.count('.') for tld in self._tlds), default=1)
+
+    def __contains__(self, tld: str) -> bool:
+        return _normalize_tld(tld) in self._tlds
+
+    def __len__(self) -> int:
+        return len(self._tlds)
+
+    def get(self, tld: str) -> Optional[TldInfo]:
+        """Return the metadata of a TLD, or None if it is unknown."""
+        return self._tlds.get(_normalize_tld(tld))
+
+    def tlds(self) -> List[str]:
+        """Return every known TLD in file order."""
+        return list(self._tlds)
+
+    def default_tlds(self) -> List[str]:
+        """Return the TLDs offered by default in the UI."""
+        return [tld for tld, info in self._tlds.items() if info.default]
+
+    def split(self, domain: str) -> Tuple[str, Optional[TldInfo]]:
+        """
+        Split a domain into its registrable label and TLD metadata.
+
+        The longest known suffix wins, so "example.com.br" resolves to .com.br.
+        For unknown TLDs the last label is used and the metadata is None.
+
+        Args:
+            domain: Normalized domain name
+
+        Returns:
+            tuple: (label, TldInfo or None)
+        """
+        parts = domain.split('.')
+        for levels in range(min(self._max_levels, len(parts) - 1), 0, -1):
+            info = self._tlds.get('.' + '.'.join(parts[-levels:]))
+            if info is not None:
+                return '.'.join(parts[:-levels]), info
+        return '.'.join(parts[:-1]), None
+
+    def validate(self, domain: str) -> Optional[str]:
+        """
+        Check a domain against the label and TLD rules without any network call.
+
+        Args:
+            domain: Normalized (lowercase, ASCII or A-label) domain name
+
+        Returns:
+            str: Reason the domain is invalid, or None if it looks registrable
+        """
+        if '.' not in domain:
+            return "Domain has no TLD"
+        label, info = self.split(domain)
+        return validate_label(label) or self.validate_for_tld(label, info)
+
+    @staticmethod
+    def validate_for_tld(label: str, info: Optional[TldInfo]) -> Optional[str]:
+        """Check a label that passed validate_label against the rules of its TLD."""
+        min_length = info.min_length if info else 1
+        max_length = info.max_length if info else 63
+        if len(label) < min_length:
+            return f"Label '{label}' is shorter than {min_length} characters allowed for {info.tld}"
+        if len(label) > max_length:
+            return f"Label '{label}' is longer than {max_length} characters allowed for {info.tld if info else 'this TLD'}"
+        if label.startswith('xn--') and info is not None and not info.idn:
+            return f"{info.tld} does not accept internationalized domain names"
+        return None
+
+
+def validate_label(label: str) -> Optional[str]:
+    """Check a second-level label against the rules shared by every TLD; return the reason it is invalid."""
+    if not label:
+        return "Domain label is empty"
+    if '.' in label:
+        return f"Only second-level registrations are supported, got '{label}'"
+    if not _LABEL_RE.match(label):
+        return f"Label '{label}' contains characters other than letters, digits and hyphens"
+    if label.startswith('-') or label.endswith('-'):
+        return f"Label '{label}' starts or ends with a hyphen"
+    if label[2:4] == '--' and not label.startswith('xn--'):
+        return f"Label '{label}' has hyphens in the third and fourth positions"
+    return None
+
+
+def _normalize_tld(tld: str) -> str:
+    tld = tld.strip().lower()
+    return tld if tld.startswith('.') else f".{tld}"
+
+
+def load_tld_registry(path: str = DATA_FILE, overrides_path: Optional[str] = None) -> TldRegistry:
+    """
+    Load the TLD registry from the bundled data file and optional overrides.
+
+    Overrides are merged field by field, so an overrides file only needs the
+    fields it changes; it may also add new TLDs.
+
+    Args:
+        path: Path of the bundled JSON data file
+        overrides_path: Path of a JSON file with per-TLD overrides
+
+    Returns:
+        TldRegistry instance
+    """
+    with open(path, encoding='utf-8') as f:
+        entries = {_normalize_tld(tld): data for tld, data in json.load(f).items()}
+
+    if overrides_path:
+        try:
+            with open(overrides_path, encoding='utf-8') as f:
+                overrides = json.load(f)
+            for tld, data in overrides.items():
+                entries.setdefault(_normalize_tld(tld), {}).update(data)
+            logger.info(f"Applied TLD registry overrides from {overrides_path}")
+        except (OSError, ValueError) as e:
+            logger.error(f"Could not load TLD registry overrides from {overrides_path}: {str(e)}")
+
+    return TldRegistry(entries)
+
+
+_registry: Optional[TldRegistry] = None
+_registry_lock = threading.Lock()
+
+
+def get_tld_registry() -> TldRegistry:
+    """Return the process-wide TLD registry, loading it on first use."""
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                _registry = load_tld_registry(overrides_path=os.environ.get('TLD_REGISTRY_OVERRIDES'))
+                logger.info(f"Loaded TLD registry with {len(_registry)} TLDs")
+    return _registry
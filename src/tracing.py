@@ -0,0 +1,309 @@
+"""
+Span tracing for domain checks.
+This module records a timeline of spans for each domain check (scheduler wait, each
+provider, rate-limit sleeps, WHOIS exchanges, browser steps, reconciliation), exports
+them in the OpenTelemetry OTLP/JSON format to a file or a local collector, and can
+attach a compact timing breakdown to each check result.
+
+Tracing is off unless TRACE_EXPORTER or TRACE_TIMINGS is set; when it is off, span()
+returns a shared no-op context manager.
+"""
+
+import os
+import json
+import time
+import queue
+import logging
+import threading
+import contextvars
+import urllib.request
+from typing import Dict, List, Any, Optional
+
+logger = logging.getLogger(__name__)
+
+SERVICE_NAME = os.environ.get('OTEL_SERVICE_NAME', 'domain-checker')
+
+# OTLP span status codes
+STATUS_UNSET = 0
+STATUS_ERROR = 2
+
+_current_span: contextvars.ContextVar[Optional['Span']] = contextvars.ContextVar('current_span', default=None)
+
+
+class _Trace:
+    """Spans finished so far in one trace, collected until the root span ends."""
+
+    __slots__ = ('trace_id', 'spans')
+
+    def __init__(self):
+        self.trace_id = os.urandom(16).hex()
+        self.spans: List['Span'] = []
+
+
+class Span:
+    """A timed operation within a trace."""
+
+    __slots__ = ('name', 'trace', 'span_id', 'parent', 'attributes', 'start_ns', 'end_ns',
+                 'status', 'status_message', '_perf_start', 'duration', '_token')
+
+    def __init__(self, name: str, parent: Optional['Span'], attributes: Dict[str, Any]):
+        self.name = name
+        self.parent = parent
+        self.trace = parent.trace if parent is not None else _Trace()
+        self.span_id = os.urandom(8).hex()
+        self.attributes = attributes
+        self.status = STATUS_UNSET
+        self.status_message = None
+        self.start_ns = 0
+        self.end_ns = 0
+        self.duration = 0.0
+        self._perf_start = 0.0
+        self._token = None
+
+    @property
+    def is_root(self) -> bool:
+        return self.parent is None
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    def set_error(self, message: str) -> None:
+        self.status = STATUS_ERROR
+        self.status_message = message
+
+    def __enter__(self) -> 'Span':
+        self.start_ns = time.time_ns()
+        self._perf_start = time.perf_counter()
+        self._token = _current_span.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.duration = time.perf_counter() - self._perf_start
+        self.end_ns = self.start_ns + int(self.duration * 1e9)
+        _current_span.reset(self._token)
+        if exc is not None:
+            self.set_error(f"{exc_type.__name__}: {exc}")
+        self.trace.spans.append(self)
+        if self.is_root:
+            tracer.finish(self.trace)
+        return False
+
+    def timings(self) -> Dict[str, Any]:
+        """
+        Return a compact breakdown of this span and the spans finished under it.
+
+        Returns:
+            dict: {'total_ms': float, 'spans': [[name, start offset ms, duration ms], ...]}
+        """
+        spans = []
+        for span in sorted(self.trace.spans, key=lambda s: s._perf_start):
+            if span is self or not span._is_under(self):
+                continue
+            entry = [span.name, round((span._perf_start - self._perf_start) * 1000, 1),
+                     round(span.duration * 1000, 1)]
+            if span.status == STATUS_ERROR:
+                entry.append('error')
+            spans.append(entry)
+        return {'total_ms': round(self.duration * 1000, 1), 'spans': spans}
+
+    def _is_under(self, ancestor: 'Span') -> bool:
+        span = self.parent
+        while span is not None:
+            if span is ancestor:
+                return True
+            span = span.parent
+        return False
+
+    def to_otlp(self) -> Dict[str, Any]:
+        """Return the span in OTLP/JSON form."""
+        data = {
+            'traceId': self.trace.trace_id,
+            'spanId': self.span_id,
+            'name': self.name,
+            'kind': 1,  # SPAN_KIND_INTERNAL
+            'startTimeUnixNano': str(self.start_ns),
+            'endTimeUnixNano': str(self.end_ns),
+            'attributes': [_otlp_attribute(k, v) for k, v in self.attributes.items()],
+            'status': {'code': self.status},
+        }
+        if self.parent is not None:
+            data['parentSpanId'] = self.parent.span_id
+        if self.status_message:
+            data['status']['message'] = self.status_message
+        return data
+
+
+class _NoopSpan:
+    """Stand-in returned when tracing is off."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        pass
+
+    def set_error(self, message: str) -> None:
+        pass
+
+    def timings(self) -> Optional[Dict[str, Any]]:
+        return None
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+def _otlp_attribute(key: str, value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {'key': key, 'value': {'boolValue': value}}
+    if isinstance(value, int):
+        return {'key': key, 'value': {'intValue': str(value)}}
+    if isinstance(value, float):
+        return {'key': key, 'value': {'doubleValue': value}}
+    return {'key': key, 'value': {'stringValue': str(value)}}
+
+
+class FileSpanExporter:
+    """Append OTLP/JSON export requests to a file, one per line."""
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def export(self, payload: Dict[str, Any]) -> None:
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(payload, separators=(',', ':')) + '\n')
+
+
+class OtlpHttpSpanExporter:
+    """POST OTLP/JSON export requests to a collector's /v1/traces endpoint."""
+
+    def __init__(self, endpoint: str, timeout: float = 5.0):
+        self.url = endpoint.rstrip('/')
+        if not self.url.endswith('/v1/traces'):
+            self.url += '/v1/traces'
+        self.timeout = timeout
+
+    def export(self, payload: Dict[str, Any]) -> None:
+        request = urllib.request.Request(self.url, data=json.dumps(payload).encode('utf-8'),
+                                         headers={'Content-Type': 'application/json'}, method='POST')
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            response.read()
+
+
+class Tracer:
+    """Creates spans and hands finished traces to an exporter on a background thread."""
+
+    def __init__(self, exporter=None, timings: bool = False, batch_size: int = 256, flush_interval: float = 2.0):
+        """
+        Initialize the tracer.
+
+        Args:
+            exporter: Object with an export(payload) method, or None to only keep timings
+            timings: Whether check results get a compact timing breakdown
+            batch_size: Maximum number of spans per export request
+            flush_interval: Seconds between exports of a partial batch
+        """
+        self.exporter = exporter
+        self.timings = timings
+        self.active = exporter is not None or timings
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue: 'queue.Queue[Span]' = queue.Queue(maxsize=100000)
+        self._thread: Optional[threading.Thread] = None
+        self._thread_lock = threading.Lock()
+
+    def span(self, name: str, **attributes: Any):
+        """Return a context manager timing a span under the current one."""
+        if not self.active:
+            return _NOOP_SPAN
+        return Span(name, _current_span.get(), attributes)
+
+    def finish(self, trace: _Trace) -> None:
+        """Queue the spans of a finished trace for export."""
+        if self.exporter is None:
+            return
+        self._ensure_thread()
+        for span in trace.spans:
+            try:
+                self._queue.put_nowait(span)
+            except queue.Full:
+                logger.warning("Span export queue is full, dropping spans")
+                return
+
+    def _ensure_thread(self) -> None:
+        if self._thread is None:
+            with self._thread_lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name='span-exporter', daemon=True)
+                    self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            try:
+                self.exporter.export(_export_request(batch))
+            except Exception as e:
+                logger.warning(f"Could not export {len(batch)} spans: {str(e)}")
+
+
+def _export_request(spans: List[Span]) -> Dict[str, Any]:
+    """Wrap spans in an OTLP ExportTraceServiceRequest."""
+    return {
+        'resourceSpans': [{
+            'resource': {'attributes': [_otlp_attribute('service.name', SERVICE_NAME)]},
+            'scopeSpans': [{
+                'scope': {'name': 'domain-checker'},
+                'spans': [span.to_otlp() for span in spans],
+            }],
+        }]
+    }
+
+
+def create_tracer() -> Tracer:
+    """
+    Create a tracer configured from environment variables.
+
+    TRACE_EXPORTER selects "file" (OTLP/JSON lines appended to TRACE_EXPORT_PATH, default
+    traces.jsonl) or "otlp" (POST to OTEL_EXPORTER_OTLP_ENDPOINT, default
+    http://localhost:4318). TRACE_TIMINGS=true attaches a timing breakdown to results.
+
+    Returns:
+        Tracer instance
+    """
+    kind = os.environ.get('TRACE_EXPORTER', '').lower()
+    exporter = None
+    if kind == 'file':
+        exporter = FileSpanExporter(os.environ.get('TRACE_EXPORT_PATH', 'traces.jsonl'))
+    elif kind == 'otlp':
+        exporter = OtlpHttpSpanExporter(os.environ.get('OTEL_EXPORTER_OTLP_ENDPOINT', 'http://localhost:4318'))
+    elif kind:
+        logger.error(f"Unknown TRACE_EXPORTER '{kind}', spans will not be exported")
+    timings = os.environ.get('TRACE_TIMINGS', 'false').lower() == 'true'
+    if exporter is not None or timings:
+        logger.info(f"Tracing enabled with exporter={kind or 'none'}, timings={timings}")
+    return Tracer(exporter, timings)
+
+
+# Process-wide tracer
+tracer = create_tracer()
+
+
+def span(name: str, **attributes: Any):
+    """Return a context manager timing a span under the current one."""
+    return tracer.span(name, **attributes)
+
+
+def current_span() -> Optional[Span]:
+    """Return the span active in the current context, if any."""
+    return _current_span.get()
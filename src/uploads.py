@@ -0,0 +1,241 @@
+"""
+Brand-list uploads.
+Reads an uploaded CSV, TXT or XLSX file of brand names as a stream, with one brand per line
+(TXT) or per row (CSV, XLSX), and turns it into chunks of domains for
+BatchChecker.stream_feed(). Only the chunk being planned and the domains still being
+checked are held in memory. Up to UPLOAD_DEDUP_DOMAINS of the domains already seen are
+kept to deduplicate the upload; a repeat of a domain not among them is checked again.
+XLSX files are zip archives whose index comes last, so they are spooled (to disk when
+large) before being read with openpyxl in read-only mode.
+"""
+
+import io
+import os
+import csv
+import logging
+import tempfile
+from typing import Dict, List, Any, Optional, Iterator, Iterable, Tuple
+
+from .preflight import Preflight
+from .tld_registry import TldRegistry
+
+logger = logging.getLogger(__name__)
+
+# Largest upload accepted, in bytes
+UPLOAD_MAX_BYTES = int(os.environ.get('UPLOAD_MAX_BYTES', str(512 * 1024 * 1024)))
+# Brands planned at a time; each chunk is handed to the checks as a whole
+UPLOAD_CHUNK_BRANDS = int(os.environ.get('UPLOAD_CHUNK_BRANDS', '500'))
+# XLSX uploads up to this size are spooled in memory, larger ones to a temporary file
+UPLOAD_SPOOL_BYTES = int(os.environ.get('UPLOAD_SPOOL_BYTES', str(8 * 1024 * 1024)))
+# Unique domains remembered per upload to skip repeats (about 100 bytes each)
+UPLOAD_DEDUP_DOMAINS = int(os.environ.get('UPLOAD_DEDUP_DOMAINS', '200000'))
+
+FORMATS = ('csv', 'txt', 'xlsx')
+_EXTENSIONS = {'.csv': 'csv', '.txt': 'txt', '.xlsx': 'xlsx'}
+_CONTENT_TYPES = {
+    'text/csv': 'csv',
+    'application/csv': 'csv',
+    'text/plain': 'txt',
+    'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet': 'xlsx',
+}
+# Header cells naming the brand column of a CSV or XLSX file
+_BRAND_HEADERS = ('brand', 'brands', 'brand_name', 'brand name', 'name')
+# Longest TXT line read as one brand; the rest of a longer line is read as further brands
+_MAX_LINE = 4096
+
+
+class UploadError(ValueError):
+    """Upload that cannot be read; the message is returned to the client."""
+
+
+class UploadReader(io.RawIOBase):
+    """Request body read in place, counting bytes and enforcing UPLOAD_MAX_BYTES."""
+
+    def __init__(self, stream: Any, max_bytes: int = UPLOAD_MAX_BYTES):
+        self._stream = stream
+        self.max_bytes = max_bytes
+        self.received = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        data = self._stream.read(len(buffer))
+        if not data:
+            return 0
+        self.received += len(data)
+        if self.received > self.max_bytes:
+            raise UploadError(f"Upload exceeds {self.max_bytes} bytes")
+        buffer[:len(data)] = data
+        return len(data)
+
+
+def detect_format(requested: Optional[str], filename: Optional[str], content_type: Optional[str],
+                  head: bytes) -> str:
+    """
+    Format of an upload: the one requested, else from the file name's extension, else from the
+    content type, else sniffed from its first bytes (a zip archive is XLSX, anything else TXT).
+    """
+    if requested:
+        fmt = requested.lower().lstrip('.')
+        if fmt not in FORMATS:
+            raise UploadError(f"Unknown upload format: {requested} (expected one of {', '.join(FORMATS)})")
+        return fmt
+    if filename:
+        fmt = _EXTENSIONS.get(os.path.splitext(filename)[1].lower())
+        if fmt is not None:
+            return fmt
+    if content_type:
+        fmt = _CONTENT_TYPES.get(content_type.split(';')[0].strip().lower())
+        if fmt is not None:
+            return fmt
+    return 'xlsx' if head.startswith(b'PK\x03\x04') else 'txt'
+
+
+def iter_brands(body: io.BufferedReader, fmt: str, column: Optional[str] = None) -> Iterator[str]:
+    """
+    Yield the brand names of an upload as it is read.
+
+    Args:
+        body: Buffered reader over the request body
+        fmt: One of FORMATS
+        column: Brand column of a CSV or XLSX file, by header or 1-based number (default: the
+            column headed brand/name, else the first)
+    """
+    if fmt == 'xlsx':
+        rows = _xlsx_rows(body)
+    else:
+        text = io.TextIOWrapper(body, encoding='utf-8-sig', errors='replace', newline='')
+        if fmt == 'txt':
+            return (line.strip() for line in iter(lambda: text.readline(_MAX_LINE), '') if line.strip())
+        rows = _csv_rows(text)
+    return _column(rows, column)
+
+
+def _csv_rows(text: io.TextIOWrapper) -> Iterator[List[str]]:
+    # csv's field size limit bounds a row with an unterminated quote
+    try:
+        yield from csv.reader(text)
+    except csv.Error as e:
+        raise UploadError(f"Invalid CSV: {e}")
+
+
+def _xlsx_rows(body: io.BufferedReader) -> Iterator[List[Any]]:
+    try:
+        import openpyxl
+    except ImportError:
+        raise UploadError("XLSX uploads require openpyxl")
+    from zipfile import BadZipFile
+
+    with tempfile.SpooledTemporaryFile(UPLOAD_SPOOL_BYTES) as spool:
+        while True:
+            data = body.read(1024 * 1024)
+            if not data:
+                break
+            spool.write(data)
+        spool.seek(0)
+        try:
+            workbook = openpyxl.load_workbook(spool, read_only=True, data_only=True)
+        except (BadZipFile, KeyError, ValueError, OSError) as e:
+            raise UploadError(f"Invalid XLSX file: {e}")
+        try:
+            for row in workbook.active.iter_rows(values_only=True):
+                yield row
+        finally:
+            workbook.close()
+
+
+def _column(rows: Iterator[Any], column: Optional[str]) -> Iterator[str]:
+    """Brand cell of each row; the header row, when there is one, is skipped."""
+    first = next(rows, None)
+    if first is None:
+        return
+    header = [str(cell).strip().lower() if cell is not None else '' for cell in first]
+    if column:
+        if column.isdigit() and int(column) >= 1:
+            index = int(column) - 1
+            skip = index < len(header) and header[index] in _BRAND_HEADERS
+        elif column.strip().lower() in header:
+            index, skip = header.index(column.strip().lower()), True
+        else:
+            raise UploadError(f"Column not found: {column}")
+    else:
+        index = next((header.index(name) for name in _BRAND_HEADERS if name in header), None)
+        index, skip = (0, False) if index is None else (index, True)
+
+    for row in rows if skip else _prepend(first, rows):
+        if index < len(row) and row[index] is not None:
+            brand = str(row[index]).strip()
+            if brand:
+                yield brand
+
+
+def _prepend(first: Any, rows: Iterator[Any]) -> Iterator[Any]:
+    yield first
+    yield from rows
+
+
+class UploadFeed:
+    """
+    Chunks of domains of an uploaded brand list, for BatchChecker.stream_feed().
+
+    Each brand is paired with every TLD; a domain already given by an earlier brand counts
+    as a duplicate. The first `dedup_domains` domains are remembered for the whole upload;
+    after that, only repeats within a chunk are skipped, so memory stays bounded. The brand
+    and TLD of every domain given is kept until take() is called with its result.
+    """
+
+    def __init__(self, brands: Iterable[str], tlds: List[str], tld_registry: TldRegistry,
+                 chunk_brands: int = UPLOAD_CHUNK_BRANDS, dedup_domains: int = UPLOAD_DEDUP_DOMAINS):
+        self.brands = brands
+        self.tlds = tlds
+        self.tld_registry = tld_registry
+        self.chunk_brands = max(1, chunk_brands)
+        self.dedup_domains = max(0, dedup_domains)
+        self.brand_count = 0
+        self.domain_count = 0
+        self.duplicates = 0
+        self._seen = set()
+        self._owners: Dict[str, Tuple[str, str]] = {}
+
+    def __iter__(self) -> Iterator[Tuple[List[str], Dict[str, str]]]:
+        chunk: List[str] = []
+        for brand in self.brands:
+            chunk.append(brand)
+            if len(chunk) >= self.chunk_brands:
+                yield self._plan(chunk)
+                chunk = []
+        if chunk:
+            yield self._plan(chunk)
+
+    def take(self, domain: str) -> Tuple[str, str]:
+        """Brand and TLD of a domain given by the feed, forgotten once its result is handled."""
+        return self._owners.pop(domain, ('', ''))
+
+    def _plan(self, brands: List[str]) -> Tuple[List[str], Dict[str, str]]:
+        domains, rejected = [], {}
+        seen, owners, width = self._seen, self._owners, len(self.tlds)
+        # Once the upload-wide set is full, new domains are remembered for this chunk only
+        room = self.dedup_domains - len(seen)
+        chunk_seen = set()
+        # A Preflight per chunk, so its label caches do not grow with the upload
+        preflight = Preflight(self.tld_registry)
+        for slot, (domain, reason) in enumerate(preflight.plan_domains(brands, self.tlds)):
+            if domain in seen or domain in chunk_seen or domain in owners:
+                self.duplicates += 1
+                continue
+            if room > 0:
+                seen.add(domain)
+                room -= 1
+                if room == 0:
+                    logger.info("Upload has %d unique domains; later repeats are only skipped within a chunk",
+                                len(seen))
+            else:
+                chunk_seen.add(domain)
+            owners[domain] = (brands[slot // width], self.tlds[slot % width])
+            domains.append(domain)
+            if reason is not None:
+                rejected[domain] = reason
+        self.brand_count += len(brands)
+        self.domain_count += len(domains)
+        return domains, rejected
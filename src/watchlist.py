@@ -0,0 +1,481 @@
+"""
+Watchlist monitoring of taken domains.
+Watched domains are rechecked in the background on their own schedule instead of all at
+once: a priority queue orders them by next check time, and each check sets the next one
+from the domain's expiry date (read from WHOIS), the phase of the expiry lifecycle it is in
+and how often its status has flipped. Names far from expiry are rechecked rarely, names in
+their grace, redemption or pending-delete window aggressively. A daily budget caps the total
+number of rechecks; when the planned schedule needs more, every interval is stretched.
+The schedule lives in memory and SQLite keeps the durable copy. The in-memory lock is never
+held across database work, so a slow disk does not stall the event loop the scheduler runs on.
+Only one process per database runs the scheduler: the first to take a lock file next to the
+database. Other workers only add and remove domains, and the scheduler picks up their
+changes from the database.
+"""
+
+import os
+import math
+import time
+import heapq
+import asyncio
+import sqlite3
+import calendar
+import logging
+import fcntl
+import threading
+import concurrent.futures
+from typing import Dict, List, Any, Optional, Iterable, Tuple
+
+from .results import DomainResult, Status
+from .scheduler import Priority
+from .rate_limiter import rate_limiter
+from .tld_registry import TldRegistry, get_tld_registry
+from .whois_parsers import parse_whois_date
+from .async_runtime import submit_coroutine
+from .metrics import WATCHLIST_CHECKS, WATCHLIST_DUE
+
+logger = logging.getLogger(__name__)
+
+DAY = 86400.0
+
+# SQLite database of watched domains; the watchlist is disabled when empty
+WATCHLIST_DB_PATH = os.environ.get('WATCHLIST_DB_PATH', '')
+# Maximum number of rechecks per UTC day
+WATCHLIST_DAILY_BUDGET = int(os.environ.get('WATCHLIST_DAILY_BUDGET', '10000'))
+# Rechecks running at once
+WATCHLIST_CONCURRENCY = int(os.environ.get('WATCHLIST_CONCURRENCY', '4'))
+# Longest time between two checks of a domain far from expiry, in seconds
+WATCHLIST_MAX_INTERVAL = float(os.environ.get('WATCHLIST_MAX_INTERVAL', str(30 * DAY)))
+
+# Tenant the rechecks are accounted to in the scheduler
+WATCHLIST_TENANT = 'watchlist'
+
+# Expiry lifecycle of a gTLD domain as (phase, start, end, recheck interval), with start and
+# end in days after the expiry date; None is WATCHLIST_MAX_INTERVAL
+EXPIRY_PHASES = (
+    ('registered', -math.inf, -30, None),
+    ('expiring', -30, 0, DAY),
+    ('grace', 0, 45, DAY / 2),
+    ('redemption', 45, 75, 6 * 3600.0),
+    ('pending_delete', 75, 80, 3600.0),
+    # Past the expected drop date, the registry has usually not published the renewal yet
+    ('overdue', 80, math.inf, 6 * 3600.0),
+)
+# Recheck interval of domains without a known expiry date
+UNKNOWN_EXPIRY_INTERVAL = 7 * DAY
+# Recheck interval of watched domains that have become available
+AVAILABLE_INTERVAL = DAY
+# Shortest interval between two checks of a domain
+MIN_INTERVAL = 900.0
+# Each status flip adds 1 to a domain's volatility, which halves over this period
+VOLATILITY_HALF_LIFE = 30 * DAY
+# Longest sleep of the scheduler loop when nothing is due
+MAX_IDLE = 60.0
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS watchlist (
+    domain TEXT PRIMARY KEY,
+    added_at REAL NOT NULL,
+    expires_at REAL,
+    status TEXT,
+    available INTEGER,
+    checked_at REAL,
+    next_check REAL NOT NULL,
+    interval REAL NOT NULL,
+    volatility REAL NOT NULL DEFAULT 0,
+    changes INTEGER NOT NULL DEFAULT 0
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_watchlist_next_check ON watchlist (next_check);
+CREATE INDEX IF NOT EXISTS idx_watchlist_status ON watchlist (status);
+CREATE TABLE IF NOT EXISTS watchlist_budget (
+    day INTEGER PRIMARY KEY,
+    checks INTEGER NOT NULL
+);
+"""
+
+
+def expiry_phase(expires_at: Optional[float], available: Optional[bool],
+                 now: float) -> Tuple[str, float, Optional[float]]:
+    """
+    Lifecycle phase of a watched domain.
+
+    Returns:
+        tuple: (phase, recheck interval in seconds, time the phase ends or None)
+    """
+    if available:
+        return 'available', AVAILABLE_INTERVAL, None
+    if expires_at is None:
+        return 'unknown', UNKNOWN_EXPIRY_INTERVAL, None
+    days = (now - expires_at) / DAY
+    for phase, start, end, interval in EXPIRY_PHASES:
+        if start <= days < end:
+            boundary = expires_at + end * DAY if end != math.inf else None
+            return phase, interval if interval is not None else WATCHLIST_MAX_INTERVAL, boundary
+    return 'unknown', UNKNOWN_EXPIRY_INTERVAL, None
+
+
+def expiry_time(result: DomainResult) -> Optional[float]:
+    """Expiry date reported by any source of a result, as Unix time."""
+    for source in result.sources:
+        value = source.details.get('expiration_date') if source.details else None
+        expires = parse_whois_date(value)
+        if expires is not None:
+            return float(calendar.timegm(expires.timetuple()))
+    return None
+
+
+class Watchlist:
+    """Watched domains with an expiry-driven, budgeted recheck schedule."""
+
+    def __init__(self, path: str, tld_registry: Optional[TldRegistry] = None,
+                 daily_budget: int = WATCHLIST_DAILY_BUDGET, concurrency: int = WATCHLIST_CONCURRENCY):
+        self.path = path
+        self.tld_registry = tld_registry if tld_registry is not None else get_tld_registry()
+        self.daily_budget = max(1, daily_budget)
+        self.concurrency = max(1, concurrency)
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        # Guards the in-memory schedule only; never held while the database is used
+        self._lock = threading.Lock()
+        # Serializes use of the SQLite connection
+        self._db_lock = threading.Lock()
+        self._connection = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._connection.execute('PRAGMA journal_mode=WAL')
+        self._connection.executescript(_SCHEMA)
+
+        # Priority queue of (next check, domain); entries are stale when _next disagrees
+        self._heap: List[Tuple[float, str]] = []
+        self._next: Dict[str, float] = {}
+        # Planned checks per day for each domain, before stretching to the budget
+        self._rates: Dict[str, float] = {}
+        self._demand = 0.0
+        # Changes committed by other processes show up as a new data_version
+        self._data_version = None
+        self._load(self._read_schedule())
+
+        self._day = int(time.time() // DAY)
+        row = self._connection.execute('SELECT checks FROM watchlist_budget WHERE day = ?', (self._day,)).fetchone()
+        self.checks_today = row[0] if row else 0
+
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._runner: Optional[concurrent.futures.Future] = None
+        self._scheduler_lock_file = None
+        WATCHLIST_DUE.set_function(self.due_count)
+
+    def __len__(self) -> int:
+        return len(self._next)
+
+    @property
+    def stretch(self) -> float:
+        """Factor applied to every interval so the planned checks fit the daily budget."""
+        return max(1.0, self._demand / self.daily_budget)
+
+    def add(self, domains: Iterable[str]) -> Tuple[List[str], Dict[str, str]]:
+        """
+        Watch domains; they are first checked as soon as the budget allows.
+
+        Returns:
+            tuple: (domains added, {invalid domain: reason})
+        """
+        added, invalid = [], {}
+        now = time.time()
+        with self._lock:
+            watched = [domain.strip().lower() for domain in domains]
+            watched = list(dict.fromkeys(domain for domain in watched if domain and domain not in self._next))
+        for domain in watched:
+            reason = self.tld_registry.validate(domain)
+            if reason is not None:
+                invalid[domain] = reason
+            else:
+                added.append(domain)
+        with self._db_lock, self._connection:
+            self._connection.executemany(
+                'INSERT OR IGNORE INTO watchlist (domain, added_at, next_check, interval) VALUES (?, ?, ?, ?)',
+                [(domain, now, now, UNKNOWN_EXPIRY_INTERVAL) for domain in added])
+        with self._lock:
+            for domain in added:
+                if domain not in self._next:
+                    self._set_rate(domain, DAY / UNKNOWN_EXPIRY_INTERVAL)
+                    self._push(domain, now)
+        if added:
+            logger.info("Added %d domains to the watchlist", len(added))
+            self._wake()
+        return added, invalid
+
+    def remove(self, domain: str) -> bool:
+        """Stop watching a domain; return whether it was watched."""
+        with self._lock:
+            scheduled = self._next.pop(domain, None) is not None
+            self._set_rate(domain, 0.0)
+        with self._db_lock, self._connection:
+            deleted = self._connection.execute('DELETE FROM watchlist WHERE domain = ?', (domain,)).rowcount
+        return scheduled or deleted > 0
+
+    def entries(self, status: Optional[str] = None, phase: Optional[str] = None,
+                limit: int = 1000, offset: int = 0) -> List[Dict[str, Any]]:
+        """Watched domains in order of their next check, optionally filtered by status or phase."""
+        now = time.time()
+        sql = ('SELECT domain, added_at, expires_at, status, available, checked_at, next_check, volatility, changes '
+               'FROM watchlist')
+        clauses: List[str] = []
+        params: List[Any] = []
+        if status is not None:
+            clauses.append('status = ?')
+            params.append(status)
+        if phase == 'available':
+            clauses.append('available = 1')
+        elif phase == 'unknown':
+            clauses.append('available IS NOT 1 AND expires_at IS NULL')
+        elif phase is not None:
+            bounds = {name: (start, end) for name, start, end, _ in EXPIRY_PHASES}
+            if phase not in bounds:
+                raise ValueError(f"Unknown phase: {phase}")
+            start, end = bounds[phase]
+            clauses.append('available IS NOT 1 AND expires_at IS NOT NULL')
+            if end != math.inf:
+                clauses.append('expires_at > ?')
+                params.append(now - end * DAY)
+            if start != -math.inf:
+                clauses.append('expires_at <= ?')
+                params.append(now - start * DAY)
+        if clauses:
+            sql += f" WHERE {' AND '.join(clauses)}"
+        sql += ' ORDER BY next_check LIMIT ? OFFSET ?'
+        params += [limit, offset]
+        entries = []
+        with self._db_lock:
+            for domain, added_at, expires_at, status_, available, checked_at, next_check, volatility, changes in \
+                    self._connection.execute(sql, params):
+                available = None if available is None else bool(available)
+                entries.append({'domain': domain, 'phase': expiry_phase(expires_at, available, now)[0],
+                                'status': status_, 'available': available, 'expires_at': expires_at,
+                                'added_at': added_at, 'checked_at': checked_at, 'next_check': next_check,
+                                'volatility': round(volatility, 3), 'changes': changes})
+        return entries
+
+    def due_count(self) -> int:
+        """Number of watched domains whose recheck is due."""
+        with self._db_lock:
+            return self._connection.execute('SELECT COUNT(*) FROM watchlist WHERE next_check <= ?',
+                                            (time.time(),)).fetchone()[0]
+
+    def stats(self) -> Dict[str, Any]:
+        """Size, due domains and budget use of the watchlist."""
+        if self._runner is None:
+            # The scheduler runs in another process, which this one's schedule may lag behind
+            self.sync()
+        return {
+            'domains': len(self),
+            'due': self.due_count(),
+            'daily_budget': self.daily_budget,
+            'checks_today': self.checks_today,
+            'planned_daily_checks': round(self._demand, 1),
+            'stretch': round(self.stretch, 3),
+            'running': self._runner is not None and not self._runner.done(),
+        }
+
+    def start(self, batch_checker) -> bool:
+        """
+        Start rechecking on the shared event loop with the given BatchChecker, unless another
+        process already runs the scheduler of this database; return whether it runs here.
+        """
+        if self._runner is not None and not self._runner.done():
+            return True
+        if self._scheduler_lock_file is None:
+            lock_file = open(f"{self.path}.scheduler.lock", 'a')
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                lock_file.close()
+                logger.info("Watchlist scheduler runs in another process; this one only edits the watchlist")
+                return False
+            self._scheduler_lock_file = lock_file
+        self._runner = submit_coroutine(self.run(batch_checker))
+        logger.info("Watchlist scheduler started: %d domains, budget %d checks per day",
+                    len(self), self.daily_budget)
+        return True
+
+    async def run(self, batch_checker) -> None:
+        """Recheck due domains forever, within the daily budget."""
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        slots = asyncio.Semaphore(self.concurrency)
+        # Spread the budget over the day, allowing a quarter hour's worth back to back
+        rate = self.daily_budget / DAY
+        burst = max(1, self.daily_budget // 96)
+        tasks = set()
+        while True:
+            now = time.time()
+            domain = None
+            with self._lock:
+                due = self._peek()
+                ready = due is not None and due[0] <= now
+                exhausted = ready and not self._take_budget(now)
+                if ready and not exhausted:
+                    domain = self._pop()
+            if exhausted:
+                tomorrow = (int(now // DAY) + 1) * DAY
+                logger.warning("Watchlist budget of %d checks used up; resuming at %s UTC", self.daily_budget,
+                               time.strftime('%Y-%m-%d %H:%M', time.gmtime(tomorrow)))
+                await asyncio.sleep(tomorrow - now)
+                continue
+            if domain is None:
+                self._wakeup.clear()
+                timeout = MAX_IDLE if due is None else min(due[0] - now, MAX_IDLE)
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout)
+                except asyncio.TimeoutError:
+                    # Pick up the domains other worker processes added or removed
+                    await self._loop.run_in_executor(None, self.sync)
+                continue
+            await rate_limiter.acquire('watchlist', rate, burst)
+            await slots.acquire()
+            task = asyncio.ensure_future(self._recheck(batch_checker, domain))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+            task.add_done_callback(lambda _: slots.release())
+
+    async def _recheck(self, batch_checker, domain: str) -> None:
+        try:
+            result = await batch_checker.check(domain, Priority.SPECULATIVE, WATCHLIST_TENANT)
+        except Exception as e:
+            logger.error("Watchlist check failed for %s: %s", domain, e, extra={'domain': domain})
+            result = None
+        phase = await asyncio.get_running_loop().run_in_executor(None, self.update, domain, result, time.time())
+        if phase is not None:
+            WATCHLIST_CHECKS.labels(phase).inc()
+
+    def update(self, domain: str, result: Optional[DomainResult], now: float) -> Optional[str]:
+        """Record a recheck and schedule the next one; return the domain's phase (None if no longer watched)."""
+        with self._db_lock, self._connection:
+            row = self._connection.execute(
+                'SELECT expires_at, status, available, checked_at, volatility, changes FROM watchlist '
+                'WHERE domain = ?', (domain,)).fetchone()
+            with self._lock:
+                if row is None or domain not in self._next:
+                    return None
+            expires_at, status, available, checked_at, volatility, changes = row
+            available = None if available is None else bool(available)
+            if checked_at is not None:
+                volatility *= 0.5 ** ((now - checked_at) / VOLATILITY_HALF_LIFE)
+            # Errors and unknown answers keep the previous state and schedule
+            if result is not None and result.available is not None and \
+                    result.status not in (Status.UNKNOWN, Status.ERROR):
+                if available is not None and bool(result.available) != available:
+                    volatility += 1.0
+                    changes += 1
+                    logger.info("Watched domain %s is now %s", domain, result.status, extra={'domain': domain})
+                available = bool(result.available)
+                status = result.status.value
+                expires_at = expiry_time(result) or expires_at
+
+            phase, interval, boundary = expiry_phase(expires_at, available, now)
+            interval = max(MIN_INTERVAL, interval / (1.0 + volatility))
+            with self._lock:
+                self._set_rate(domain, DAY / interval)
+                stretch, day, checks_today = self.stretch, self._day, self.checks_today
+            next_check = now + interval * stretch
+            # Check again as soon as the domain enters its next phase
+            if boundary is not None and now < boundary < next_check:
+                next_check = boundary
+            self._connection.execute(
+                'UPDATE watchlist SET expires_at = ?, status = ?, available = ?, checked_at = ?, next_check = ?, '
+                'interval = ?, volatility = ?, changes = ? WHERE domain = ?',
+                (expires_at, status, available, now, next_check, interval, volatility, changes, domain))
+            self._connection.execute('INSERT OR REPLACE INTO watchlist_budget VALUES (?, ?)', (day, checks_today))
+        with self._lock:
+            # Removed while the row was being written
+            if domain not in self._next:
+                self._set_rate(domain, 0.0)
+                return None
+            self._push(domain, next_check)
+        return phase
+
+    def sync(self) -> bool:
+        """Reload the schedule when another process changed the database; return whether it did."""
+        with self._db_lock:
+            version = self._connection.execute('PRAGMA data_version').fetchone()[0]
+            if version == self._data_version:
+                return False
+            rows = self._read_schedule()
+        self._load(rows)
+        logger.info("Watchlist schedule reloaded after changes from another process: %d domains", len(self))
+        return True
+
+    def _read_schedule(self) -> List[Tuple[str, float, float]]:
+        """Rows of the schedule. Called with the database lock held (or before the watchlist is shared)."""
+        self._data_version = self._connection.execute('PRAGMA data_version').fetchone()[0]
+        return self._connection.execute('SELECT domain, next_check, interval FROM watchlist').fetchall()
+
+    def _load(self, rows: List[Tuple[str, float, float]]) -> None:
+        """
+        Replace the in-memory schedule with the database's domains. Domains already scheduled
+        here keep their schedule, which can be newer than the row read (or being checked).
+        """
+        with self._lock:
+            scheduled, rates = self._next, self._rates
+            self._next, self._rates, self._demand = {}, {}, 0.0
+            for domain, next_check, interval in rows:
+                self._next[domain] = scheduled.get(domain, next_check)
+                self._rates[domain] = rates.get(domain, DAY / interval)
+                self._demand += self._rates[domain]
+            self._heap = [(next_check, domain) for domain, next_check in self._next.items()
+                          if not math.isnan(next_check)]
+            heapq.heapify(self._heap)
+
+    def _take_budget(self, now: float) -> bool:
+        """Count a check against today's budget; False when it is used up. Called with the lock held."""
+        day = int(now // DAY)
+        if day != self._day:
+            self._day, self.checks_today = day, 0
+        if self.checks_today >= self.daily_budget:
+            return False
+        self.checks_today += 1
+        return True
+
+    def _set_rate(self, domain: str, rate: float) -> None:
+        """Called with the lock held."""
+        self._demand += rate - self._rates.pop(domain, 0.0)
+        if rate:
+            self._rates[domain] = rate
+
+    def _push(self, domain: str, next_check: float) -> None:
+        self._next[domain] = next_check
+        heapq.heappush(self._heap, (next_check, domain))
+
+    def _peek(self) -> Optional[Tuple[float, str]]:
+        """Earliest scheduled check, dropping stale queue entries."""
+        while self._heap:
+            next_check, domain = self._heap[0]
+            if self._next.get(domain) == next_check:
+                return next_check, domain
+            heapq.heappop(self._heap)
+        return None
+
+    def _pop(self) -> str:
+        """Take the earliest domain off the queue until its recheck reschedules it."""
+        _, domain = heapq.heappop(self._heap)
+        # NaN never matches, so the domain stays watched but unscheduled while it is checked
+        self._next[domain] = math.nan
+        return domain
+
+    def _wake(self) -> None:
+        if self._loop is not None and self._wakeup is not None:
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+
+
+_watchlist: Optional[Watchlist] = None
+_watchlist_lock = threading.Lock()
+
+
+def get_watchlist() -> Optional[Watchlist]:
+    """Return the process-wide watchlist, or None when WATCHLIST_DB_PATH is not set."""
+    global _watchlist
+    if not WATCHLIST_DB_PATH:
+        return None
+    if _watchlist is None:
+        with _watchlist_lock:
+            if _watchlist is None:
+                _watchlist = Watchlist(WATCHLIST_DB_PATH)
+    return _watchlist
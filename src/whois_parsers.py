@@ -0,0 +1,240 @@
+"""
+Native WHOIS client and per-registry response parsers.
+This module queries a registry's port-43 WHOIS server directly and parses the answer
+with small parsers specialized for the registries we actually hit, instead of running
+python-whois' generic regex set over every response.
+"""
+
+import asyncio
+import logging
+from datetime import datetime
+from typing import Dict, List, Any, Optional, Tuple
+
+from .egress import Egress, open_connection
+
+logger = logging.getLogger(__name__)
+
+WHOIS_PORT = 43
+
+# Responses larger than this are truncated; real registry answers are a few KB
+MAX_RESPONSE_BYTES = 256 * 1024
+
+# "No match" answers are short, so markers only need to be searched near the top
+NOT_FOUND_SCAN_CHARS = 1024
+
+# ICANN-style keys shared by most gTLD registries
+ICANN_FIELDS = {
+    'registrar': ('Registrar:',),
+    'creation_date': ('Creation Date:',),
+    'expiration_date': ('Registry Expiry Date:', 'Registrar Registration Expiration Date:'),
+    'updated_date': ('Updated Date:',),
+    'status': ('Domain Status:',),
+    'name_servers': ('Name Server:',),
+}
+
+
+class WhoisParser:
+    """
+    Parser for the WHOIS responses of one registry.
+
+    Subclasses only declare the registry's markers and field keys; parsing itself is
+    plain string scanning.
+    """
+
+    name = 'generic'
+    query_format = '{domain}\r\n'
+    not_found_markers: Tuple[str, ...] = ()
+    registered_markers: Tuple[str, ...] = ('Domain Name:',)
+    fields: Dict[str, Tuple[str, ...]] = ICANN_FIELDS
+
+    def __init__(self, not_found_markers: Optional[Tuple[str, ...]] = None):
+        if not_found_markers:
+            self.not_found_markers = tuple(not_found_markers)
+        # Lowercased "key:" -> field name, for single-pass line scanning
+        self._wanted = {key.lower(): field for field, keys in self.fields.items() for key in keys}
+
+    def query(self, domain: str) -> bytes:
+        """Return the bytes to send to the WHOIS server for a domain."""
+        return self.query_format.format(domain=domain).encode('utf-8')
+
+    def classify(self, text: str) -> Optional[bool]:
+        """
+        Classify a response by looking only at its head.
+
+        Returns:
+            True for a "no match" answer, False for a registration record and
+            None for anything else (rate-limit notices, malformed answers)
+        """
+        head = text[:NOT_FOUND_SCAN_CHARS]
+        if any(marker in head for marker in self.not_found_markers):
+            return True
+        if any(marker in text for marker in self.registered_markers):
+            return False
+        return None
+
+    def parse(self, text: str) -> 'ParsedWhois':
+        """Classify a response; the remaining fields are parsed lazily on access."""
+        return ParsedWhois(self, text, available=self.classify(text))
+
+    def parse_fields(self, text: str) -> Dict[str, List[str]]:
+        """Extract the declared fields from a response in a single pass over its lines."""
+        wanted = self._wanted
+        values: Dict[str, List[str]] = {}
+        for line in text.splitlines():
+            key, sep, value = line.strip().partition(':')
+            if not sep:
+                continue
+            field = wanted.get(f"{key.lower()}:")
+            if field is not None:
+                value = value.strip()
+                if value:
+                    values.setdefault(field, []).append(value)
+        return values
+
+
+class VerisignParser(WhoisParser):
+    """Verisign thin WHOIS (.com, .net)."""
+    name = 'verisign'
+    # "domain" restricts the lookup to domain records (no name server or registrar matches)
+    query_format = 'domain {domain}\r\n'
+    not_found_markers = ('No match for "',)
+
+
+class PirParser(WhoisParser):
+    """Public Interest Registry (.org)."""
+    name = 'pir'
+    not_found_markers = ('NOT FOUND', 'Domain not found.')
+
+
+class IdentityDigitalParser(WhoisParser):
+    """Identity Digital back end (.io, .ai)."""
+    name = 'identity_digital'
+    not_found_markers = ('NOT FOUND', 'Domain not found.', 'No Object Found')
+
+
+class RegistroBrParser(WhoisParser):
+    """registro.br (.br)."""
+    name = 'registro_br'
+    not_found_markers = ('% No match for domain',)
+    registered_markers = ('domain:',)
+    fields = {
+        'registrar': ('owner:',),
+        'creation_date': ('created:',),
+        'expiration_date': ('expires:',),
+        'updated_date': ('changed:',),
+        'status': ('status:',),
+        'name_servers': ('nserver:',),
+    }
+
+
+# Parsers by WHOIS host
+PARSERS_BY_HOST = {
+    'whois.verisign-grs.com': VerisignParser(),
+    'whois.publicinterestregistry.org': PirParser(),
+    'whois.nic.io': IdentityDigitalParser(),
+    'whois.nic.ai': IdentityDigitalParser(),
+    'whois.registro.br': RegistroBrParser(),
+}
+
+
+# Parsers by name, for TLDs whose metadata names the parser explicitly
+PARSERS_BY_NAME = {parser.name: parser for parser in PARSERS_BY_HOST.values()}
+
+
+def get_parser(host: str, not_found_patterns: Optional[Tuple[str, ...]] = None,
+               name: Optional[str] = None) -> WhoisParser:
+    """
+    Return the parser for a WHOIS host, or the parser named in the TLD metadata.
+
+    Unknown hosts get a generic ICANN-style parser using the TLD's "not found" patterns.
+    """
+    parser = PARSERS_BY_NAME.get(name) if name else PARSERS_BY_HOST.get(host)
+    if parser is not None:
+        return parser
+    return WhoisParser(not_found_markers=tuple(not_found_patterns or ('No match for', 'NOT FOUND')))
+
+
+class ParsedWhois:
+    """A classified WHOIS response whose fields are only parsed when asked for."""
+
+    __slots__ = ('parser', 'raw', 'available', '_fields')
+
+    def __init__(self, parser: WhoisParser, raw: str, available: Optional[bool]):
+        self.parser = parser
+        self.raw = raw
+        self.available = available
+        self._fields: Optional[Dict[str, List[str]]] = None
+
+    @property
+    def fields(self) -> Dict[str, List[str]]:
+        """All declared fields of the response, parsed on first access."""
+        if self._fields is None:
+            self._fields = self.parser.parse_fields(self.raw) if self.available is False else {}
+        return self._fields
+
+    def first(self, field: str) -> Optional[str]:
+        """Return the first value of a field, or None."""
+        values = self.fields.get(field)
+        return values[0] if values else None
+
+    def details(self) -> Dict[str, Any]:
+        """Return the fields in the shape WhoisProvider reports as details."""
+        return {
+            'status': ', '.join(self.fields.get('status', [])) or None,
+            'registrar': self.first('registrar'),
+            'creation_date': self.first('creation_date'),
+            'expiration_date': self.first('expiration_date'),
+        }
+
+
+def parse_whois_date(value: Optional[str]) -> Optional[datetime]:
+    """Parse the date formats used by the supported registries (ISO 8601 and registro.br's YYYYMMDD)."""
+    if not value:
+        return None
+    value = value.strip().split(' ')[0]
+    for fmt in ('%Y-%m-%dT%H:%M:%SZ', '%Y-%m-%dT%H:%M:%S.%fZ', '%Y-%m-%dT%H:%M:%S', '%Y-%m-%d', '%Y%m%d'):
+        try:
+            return datetime.strptime(value, fmt)
+        except ValueError:
+            continue
+    try:
+        return datetime.fromisoformat(value.replace('Z', '+00:00')).replace(tzinfo=None)
+    except ValueError:
+        return None
+
+
+async def query_whois(host: str, domain: str, parser: WhoisParser, timeout: float = 10.0,
+                      egress: Optional[Egress] = None) -> str:
+    """
+    Send a WHOIS query over TCP port 43 and return the decoded response.
+
+    Args:
+        host: WHOIS server host name, optionally with a ":port" suffix
+        domain: Domain to look up
+        parser: Parser of the registry (decides the query format)
+        timeout: Overall timeout in seconds
+        egress: Route of the connection (default direct)
+
+    Returns:
+        str: The response text
+    """
+    async def exchange() -> bytes:
+        name, _, port = host.partition(':')
+        reader, writer = await open_connection(name, int(port) if port else WHOIS_PORT, egress)
+        try:
+            writer.write(parser.query(domain))
+            await writer.drain()
+            chunks = []
+            size = 0
+            while size < MAX_RESPONSE_BYTES:
+                chunk = await reader.read(8192)
+                if not chunk:
+                    break
+                chunks.append(chunk)
+                size += len(chunk)
+            return b''.join(chunks)
+        finally:
+            writer.close()
+
+    data = await asyncio.wait_for(exchange(), timeout)
+    return data.decode('utf-8', errors='replace')